@@ -53,6 +53,7 @@ class DataSelection:
         self.simulated_matches = pd.DataFrame()
         self.simulated_innings = pd.DataFrame()
         self.simulated_playing_xi = pd.DataFrame()
+        self.simulated_player_outcomes = None
 
         self.selection_type = DataSelectionType.AND_SELECTION
 
@@ -65,17 +66,21 @@ class DataSelection:
 
     def set_simulated_data(self, matches_df: pd.DataFrame = pd.DataFrame(),
                            innings_df: pd.DataFrame = pd.DataFrame(),
-                           playing_xi_df: pd.DataFrame = pd.DataFrame()):
+                           playing_xi_df: pd.DataFrame = pd.DataFrame(),
+                           player_outcomes_df: pd.DataFrame = None):
         """
         Sets the simulated datasets to be used by this object
         :param matches_df: the simulated matches object
         :param innings_df: the simulated innings object
         :param playing_xi_df: the simulated playing_xi object
+        :param player_outcomes_df: the player outcomes of the simulated innings, accumulated while they were simulated
+        (see ScorecardAccumulator). If None, they are derived from the simulated innings.
         :return None
         """
         self.simulated_matches = matches_df
         self.simulated_innings = innings_df
         self.simulated_playing_xi = playing_xi_df
+        self.simulated_player_outcomes = player_outcomes_df
 
     def get_selected_matches(self, is_testing: bool) -> pd.DataFrame:
         """
@@ -103,6 +108,17 @@ class DataSelection:
 
         return self.historical_data_helper.tournaments.get_selected_playing_xi(is_testing)
 
+    def get_simulated_player_outcomes(self, is_testing: bool) -> pd.DataFrame:
+        """
+        Get the player outcomes of the simulated innings, if they were set along with the simulated innings
+        :param is_testing: Set True if testing data is needed, else set False
+        :return: pd.DataFrame with a row per [match_key, inning, team, player_key], or None if there are none - the
+        player outcomes then need to be derived from the innings
+        """
+        if is_testing and not self.simulated_innings.empty:
+            return self.simulated_player_outcomes
+        return None
+
     def get_innings_for_selected_matches(self, is_testing: bool) -> pd.DataFrame:
         """
         Get ball_by_ball pre-processed innings data from matches in selected tournaments filtered for is_testing
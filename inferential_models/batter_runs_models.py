@@ -1,14 +1,22 @@
 import numpy as np
 import pandas as pd
 import pymc as pm
-from pymc.util import dataset_to_point_list
+from pymc.util import dataset_to_point_list, point_wrapper
+# BatterRunsModel.get_posterior_predictive_sampler() compiles the sampler the way pm.sample_posterior_predictive() does
+# in pymc 4.2.2 (pinned in requirements.txt) - the arguments of compile_forward_sampling_function() & the aesara shared
+# random generators it seeds must be checked against pm.sample_posterior_predictive() when upgrading pymc, see
+# test_sample_posterior_predictive_once()
+from pymc.sampling import compile_forward_sampling_function, get_vars_in_point_list
+from aesara.tensor.random.var import RandomGeneratorSharedVariable, RandomStateSharedVariable
 from sklearn.preprocessing import OneHotEncoder
 from sklearn.ensemble import RandomForestClassifier
 import aesara.tensor as at
 from simulators.perfect_simulator import PerfectSimulator
+from simulators.utils.samplers import CategoricalSampler
 import pickle
 import logging
 from sklearn.metrics import classification_report, confusion_matrix
+import copy
 import os
 
 logging.basicConfig(format='%(levelname)s:%(message)s', level=logging.INFO)
@@ -365,10 +373,13 @@ def get_batter_runs_model_from_idata(idata_trained):
 def get_categorical_column_index_for_df(df,
                                         categories,
                                         column):
-    """Returns the categorical index for df[column] based on categories"""
+    """Returns the categorical index for df[column] based on categories, which can also be a pd.Index built from
+    them once & reused across calls"""
     transformed_column_name = column.split('_')[0] if 'featured_id' in column else column
     if transformed_column_name == 'wickets_fallen' and 'wickets_fallen' not in df:
         transformed_column_name = 'previous_number_of_wickets'
+    if isinstance(categories, pd.Index):
+        return categories.get_indexer(df[transformed_column_name])
     idx = pd.Categorical(df[transformed_column_name],
                          categories).codes
     return idx
@@ -392,12 +403,15 @@ def add_column_to_df(df,
 
 
 def prepare_match_state_df_for_bi(match_state_df,
-                                  idata_trained):
+                                  idata_trained,
+                                  category_indexes=None):
     """
     Restructure a match_state_df generated by a simulator instance into a feature dataframe that will be understood
     by a pymc model that uses idata_trained.posterior as its trace.
     :param match_state_df: DataFrame representing match state before a ball is bowled
     :param idata_trained: InferenceData instance representing the trained model
+    :param category_indexes: Optional dict mapping each dim to a pd.Index of its categories in idata_trained, so the
+    categories are not rebuilt on every call
     :return:
         feature_data_df: DataFrame with all features needed by idata_trained, properly categorized.
     """
@@ -407,7 +421,7 @@ def prepare_match_state_df_for_bi(match_state_df,
                 'venue',
                 'wickets_fallen',
                 'over']:
-        categories = idata_trained.posterior[dim].values
+        categories = category_indexes[dim] if category_indexes is not None else idata_trained.posterior[dim].values
         feature_data[dim] = get_categorical_column_index_for_df(match_state_df,
                                                                 categories,
                                                                 dim)
@@ -501,6 +515,7 @@ class BatterRunsModel:
         self.model_directory_path = model_directory_path
         self.model_type = model_type
         self.model_path = self.construct_model_path()
+        self.reset_prediction_cache()
 
     def __str__(self):
         return f"Inferential Model:  " \
@@ -550,6 +565,7 @@ class BatterRunsModel:
             self.posterior_point_list = dataset_to_point_list(self.idata_trained.posterior)
             self.pymc_model = get_batter_runs_model_from_idata(self.idata_trained)
             self.training_status = True
+            self.reset_prediction_cache()
 
     def initiate_random_forest_model(self, session_type='training'):
         if session_type == 'training':
@@ -577,6 +593,7 @@ class BatterRunsModel:
             self.idata_trained = pm.sample(random_seed=RANDOM_SEED)
         self.posterior_point_list = dataset_to_point_list(self.idata_trained.posterior)
         self.training_status = True
+        self.reset_prediction_cache()
         save_idata_trained(self.idata_trained,
                            self.model_path)
 
@@ -621,13 +638,89 @@ class BatterRunsModel:
         }
         return ret
 
+    def reset_prediction_cache(self):
+        """
+        Drops the state reused across Bayesian inference calls - it is tied to the loaded model & rebuilt on the next
+        call
+        """
+        self.category_indexes = None
+        self.posterior_predictive_sampler = None
+        self.posterior_predictive_rng_states = None
+
+    def get_category_indexes(self):
+        """
+        Returns a dict mapping each categorical dim of the trained model to a pd.Index of its categories
+        """
+        if self.category_indexes is None:
+            self.category_indexes = {dim: pd.Index(self.idata_trained.posterior[dim].values)
+                                     for dim in ['batter', 'bowler', 'venue', 'wickets_fallen', 'over']}
+        return self.category_indexes
+
+    def get_posterior_predictive_sampler(self):
+        """
+        Returns the function sampling the batter runs outcomes from the first posterior point, compiled once in the
+        same way pm.sample_posterior_predictive() does on every call. The compiled function reads the data set by
+        prepare_for_prediction() when it is called, so it is reused across inference calls of any size. The states
+        of its random generators right after seeding with RANDOM_SEED are kept, so every call can start from them -
+        exactly like a freshly compiled function would. The deterministics of the model (like the probability of
+        each outcome) are computed along with the outcomes - they don't draw random numbers, so the outcomes drawn
+        are unchanged.
+        """
+        if self.posterior_predictive_sampler is None:
+            with self.pymc_model:
+                outputs = list(pm.util.get_default_varnames(self.pymc_model.observed_RVs +
+                                                            self.pymc_model.auto_deterministics +
+                                                            self.pymc_model.deterministics,
+                                                            include_transformed=False))
+                sampler_fn, _ = compile_forward_sampling_function(
+                    outputs=outputs,
+                    vars_in_trace=get_vars_in_point_list(self.posterior_point_list, self.pymc_model),
+                    basic_rvs=self.pymc_model.basic_RVs,
+                    givens_dict=None,
+                    random_seed=RANDOM_SEED,
+                    constant_data={},
+                    constant_coords=set(),
+                    allow_input_downcast=True,
+                    accept_inplace=True)
+            rngs = [shared for shared in sampler_fn.get_shared()
+                    if isinstance(shared, (RandomGeneratorSharedVariable, RandomStateSharedVariable))]
+            self.posterior_predictive_rng_states = [(rng, rng.get_value(borrow=False)) for rng in rngs]
+            self.posterior_predictive_sampler = (point_wrapper(sampler_fn), [output.name for output in outputs])
+            logger.info(f"Compiled the posterior predictive sampler for {len(outputs)} outputs")
+        return self.posterior_predictive_sampler
+
+    def sample_posterior_predictive_once(self, var_name='batter_runs_outcome_by_ball_and_innings_rv'):
+        """
+        Draws var_name once from the first posterior point for the data set by prepare_for_prediction(). Gives the
+        same draws as pm.sample_posterior_predictive(samples=1, random_seed=RANDOM_SEED) without recompiling the
+        sampler on every call.
+        """
+        sampler_fn, output_names = self.get_posterior_predictive_sampler()
+        for rng, rng_state in self.posterior_predictive_rng_states:
+            rng.set_value(copy.deepcopy(rng_state), borrow=True)
+        values = sampler_fn(**self.posterior_point_list[0])
+        return values[output_names.index(var_name)]
+
+    def sample_batter_runs_outcomes(self, uniforms, var_name='probability_of_batter_runs_outcome'):
+        """
+        Draws the batter runs outcome of each ball for the data set by prepare_for_prediction() from its probabilities
+        at the first posterior point, using the given uniform random numbers rather than the random generators of the
+        model - so the draw of a ball only depends on its own uniform, & not on the other balls predicted with it.
+        :param uniforms: One uniform random number in [0, 1) per ball
+        :param var_name: The deterministic holding the probability of each outcome, per ball
+        """
+        probabilities = self.sample_posterior_predictive_once(var_name)
+        return CategoricalSampler(probabilities).sample(uniforms, np.arange(len(uniforms)))
+
     def prepare_for_prediction(self,
                                test_combined_df):
-        self.pymc_model.set_dim('ball_ids',
-                                test_combined_df.shape[0],
-                                coord_values=np.arange(self.idata_trained.posterior.ball_ids[-1],
-                                                       self.idata_trained.posterior.ball_ids[-1] +
-                                                       test_combined_df.shape[0]))
+        # The coords of ball_ids only depend on the number of balls, so the dim is only resized when that changes
+        if self.pymc_model.dim_lengths['ball_ids'].get_value() != test_combined_df.shape[0]:
+            self.pymc_model.set_dim('ball_ids',
+                                    test_combined_df.shape[0],
+                                    coord_values=np.arange(self.idata_trained.posterior.ball_ids[-1],
+                                                           self.idata_trained.posterior.ball_ids[-1] +
+                                                           test_combined_df.shape[0]))
         with self.pymc_model:
             pm.set_data({
                 "batter_featured_id_feature_data": test_combined_df['batter'],
@@ -641,23 +734,21 @@ class BatterRunsModel:
 
     def run_bayesian_inference_prediction(self,
                                           match_state_df,
-                                          sample_once=True):
+                                          sample_once=True,
+                                          uniforms=None):
         test_combined_df = prepare_match_state_df_for_bi(match_state_df.reset_index(),
-                                                         self.idata_trained)
+                                                         self.idata_trained,
+                                                         self.get_category_indexes())
         logger.info(f'Received match state with {test_combined_df.shape[0]} balls for inference')
         self.prepare_for_prediction(test_combined_df)
         logger.info(f'Prepared for inference for {test_combined_df.shape[0]} balls')
         with self.pymc_model:
-            if sample_once:
-                idata_predicted = pm.sample_posterior_predictive(
-                    self.posterior_point_list,
-                    samples=1,
-                    keep_size=False,
-                    predictions=True,
-                    extend_inferencedata=False,
-                    random_seed=RANDOM_SEED,
-                    return_inferencedata=False
-                )
+            if sample_once and (uniforms is not None):
+                idata_predicted = {'batter_runs_outcome_by_ball_and_innings_rv':
+                                   [self.sample_batter_runs_outcomes(uniforms)]}
+            elif sample_once:
+                idata_predicted = {'batter_runs_outcome_by_ball_and_innings_rv':
+                                   [self.sample_posterior_predictive_once()]}
             else:
                 idata_predicted = pm.sample_posterior_predictive(
                     self.posterior_point_list,
@@ -691,17 +782,21 @@ class BatterRunsModel:
         return predictions_df
 
     def get_batter_runs_given_match_state(self,
-                                          match_state_df):
+                                          match_state_df,
+                                          uniforms=None):
         """
         Returns the models opinion of batter runs outcomes for the provided match_state_df
         :param match_state_df: DataFrame representing match state before a ball is bowled
+        :param uniforms: One uniform random number in [0, 1) per ball, which the Bayesian inference model draws the
+        outcomes with (see sample_batter_runs_outcomes()). If not specified, the outcomes are drawn with the random
+        generators of the model seeded with RANDOM_SEED. The random forest model is deterministic & ignores them.
         :return:
             predictions_df: DataFrame with the model's predictions.
         """
 
         predictions_df = pd.DataFrame()
         if self.model_type == 'bayesian_inference':
-            predictions_df = self.run_bayesian_inference_prediction(match_state_df)
+            predictions_df = self.run_bayesian_inference_prediction(match_state_df, uniforms=uniforms)
         if self.model_type == 'random_forest':
             predictions_df = self.run_random_forest_prediction(match_state_df)
 
@@ -3,7 +3,7 @@ import utils.page_utils as page_utils
 from utils.config_utils import create_utils_object
 from utils.app_utils import data_selection_instance, rewards_instance, prep_simulator_pages, \
     get_predictive_simulator, show_granularity_metrics, show_stats, write_top_X_to_st, reset_session_states, \
-    calculate_error_metrics
+    calculate_error_metrics, reset_rewards_cache
 from simulators.perfect_simulator import PerfectSimulator
 import pandas as pd
 import logging
@@ -105,7 +105,7 @@ def present_total_rewards_metric(players_df, raw_metrics_to_show_df, key, predic
     historical_test_innings_df = predictive_simulator.data_selection.get_innings_for_selected_matches(is_testing=True)
 
     details_df = update_ball_counts(historical_test_innings_df, details_df, False)
-    details_df = update_ball_counts(predictive_simulator.simulated_innings_df, details_df, True)
+    details_df = update_ball_counts(predictive_simulator.get_simulated_innings(), details_df, True)
 
     details_df['total_rewards_error_pct'] = 0
     mask = details_df['total_rewards_expected'] != 0
@@ -166,8 +166,6 @@ def app():
     config_utils = create_utils_object()
     number_of_scenarios = config_utils.get_predictive_simulator_info()
 
-    st.write(f"Number of scenarios: {number_of_scenarios}")
-
     granularity, metric, metrics, error_metrics = show_granularity_metrics("predictive")
 
     if granularity == 'None':
@@ -179,6 +177,18 @@ def app():
                                                         number_of_scenarios,
                                                         use_inferential_model)
 
+        if predictive_simulator is not None:
+            # Allow users to top up the scenarios for more precision, keeping the scenarios generated so far
+            number_of_scenarios_to_add = st.number_input("Number of scenarios to add", min_value=1,
+                                                         value=number_of_scenarios)
+            if st.button("Add scenarios"):
+                with st.spinner("Calculating Scenarios"):
+                    predictive_simulator.add_scenarios(int(number_of_scenarios_to_add))
+                reset_rewards_cache()
+            number_of_scenarios = predictive_simulator.number_of_scenarios
+
+        st.write(f"Number of scenarios: {number_of_scenarios}")
+
         total_errors_df = calculate_error_metrics(number_of_scenarios,
                                                   granularity,
                                                   perfect_simulator,
@@ -1,13 +1,35 @@
 from data_selection.data_selection import DataSelection
 from inferential_models.batter_runs_models import BatterRunsModel
 from rewards_configuration.rewards_configuration import RewardsConfiguration
-from simulators.utils.predictive_utils import PredictiveUtils, update_match_state
-from simulators.perfect_simulator import PerfectSimulator
-from simulators.utils.predictive_match_state import MatchState
+from simulators.utils.predictive_utils import PredictiveUtils, FIELDER_UNIFORM, get_players_dismissed
+from simulators.perfect_simulator import PerfectSimulator, Granularity
+from simulators.utils.match_state_store import MatchStateStore
+from simulators.utils.playing_xi_index import PlayingXiIndex
+from simulators.utils.ball_log import BallLog, BallLogDataset
+from simulators.utils.random_streams import ScenarioRandomStreams, DeliveryUniforms
+from simulators.utils.innings_kernel import InningsKernel, NUMBA_AVAILABLE
+from simulators.utils.checkpoint import save_checkpoint, load_checkpoint
+from simulators.utils.scenario_keys import encode_scenario_keys, decode_scenario_key_level
+from simulators.utils.convergence import RewardsConvergenceTracker
+from simulators.utils.scenario_views import ScenarioViews
+from simulators.utils.scorecard import ScorecardAccumulator
+from simulators.utils.over_outcomes import OVER_UNIFORM, FIRST_FIELDER_UNIFORM
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 import pandas as pd
 import logging
 import datetime
-import swifter
+import os
+import shutil
+from collections import OrderedDict
+
+# Number of per scenario perfect simulators kept by get_perfect_simulator(), most recently used first - each holds the
+# decoded innings of its scenario
+PERFECT_SIMULATOR_CACHE_SIZE = 8
+
+# Predictive simulator used to play the shards of scenarios in a worker process. Set up once per worker by
+# initialise_worker()
+worker_predictive_simulator = None
 
 
 class PredictiveSimulator:
@@ -21,7 +43,54 @@ class PredictiveSimulator:
                  batter_runs_model: BatterRunsModel,
                  number_of_scenarios,
                  match_columns_to_persist=[],
-                 utils=None):
+                 utils=None,
+                 seed=None,
+                 workers=1,
+                 engine='numpy',
+                 spill_directory=None,
+                 checkpoint_directory=None,
+                 checkpoint_interval=1,
+                 antithetic=False,
+                 nested_group_size=1):
+        """
+        :param seed: Master seed for the random streams of the scenarios. Each scenario draws all its random numbers
+        from its own stream, so the same seed reproduces the same scenarios. If None, a fresh seed is drawn on every
+        call to generate_scenario(), and is available in self.seed afterwards.
+        :param workers: The number of worker processes used to play the innings. If > 1, the scenarios are split into
+        shards which are played in parallel - the results are the same as playing them in this process.
+        :param engine: 'numpy' plays all the matches one delivery at a time with numpy. 'numba' plays whole innings per
+        match with a compiled kernel - this only applies to the statistical model (use_inferential_model = False) &
+        needs numba to be installed, otherwise the numpy engine is used. Both engines give the same results for a seed.
+        'over' is a fast approximate mode for previews - it plays one over at a time, drawing each over whole from the
+        historical overs of its phase & wickets in hand (see OverOutcomesTable) rather than from the outcome models.
+        The innings are recorded ball by ball in the same way, so the rewards are calculated as for the other engines.
+        :param spill_directory: If specified, the simulated balls are written out to a Parquet dataset in this directory
+        as they are played, instead of being held in memory. simulated_innings_df is left empty - the innings of a
+        scenario are read back on demand with get_simulated_innings(), and the rewards & error stats are calculated one
+        scenario at a time. The contents of the directory are replaced on every call to generate_scenario().
+        :param checkpoint_directory: If specified, the progress of generate_scenario() is checkpointed to this directory
+        - the match state, random streams & ball log after every checkpoint_interval blocks of deliveries (see
+        DELIVERY_BLOCK_SIZE), and the simulated matches & innings once done. resume() continues from the checkpoint &
+        gives the same results as an uninterrupted run. Checkpoints are not written when the innings are played by
+        worker processes (workers > 1).
+        :param checkpoint_interval: The number of blocks of deliveries played between checkpoints
+        :param antithetic: If True, the scenarios are played in antithetic pairs - the odd scenario of each pair uses
+        the uniforms 1 - u of the even one (see ScenarioRandomStreams). Averages across an even number of scenarios then
+        have a lower variance.
+        :param nested_group_size: If > 1, the scenarios are played in nested groups of this size (M) - the scenarios of
+        a group share the toss & first innings of each match, which is only played once, and each of them plays its own
+        2nd innings chasing that target. number_of_scenarios = K * M then gives K first innings per match with M chases
+        each, for roughly half the deliveries. Every scenario is still a draw of the whole tournament & carries the same
+        weight, but the scenarios of a group are not independent - the convergence checks & compare_error_stats()
+        treat each group as one sample. Only the numpy engine supports nested groups, and they can't be antithetic.
+        """
+        if engine not in ['numpy', 'numba', 'over']:
+            raise ValueError(f"Unknown engine {engine}, expected one of 'numpy', 'numba' or 'over'")
+        if nested_group_size < 1:
+            raise ValueError(f"The nested group size must be at least 1\nReceived: {nested_group_size}")
+        if antithetic and (nested_group_size > 1):
+            raise ValueError("Antithetic scenarios can't be played in nested groups")
+
         self.data_selection = data_selection
         self.number_of_scenarios = number_of_scenarios
         self.rewards_configuration = rewards_configuration
@@ -32,209 +101,578 @@ class PredictiveSimulator:
         else:
             self.predictive_utils = utils
 
-        self.perfect_simulators = []
         self.simulated_matches_df = pd.DataFrame()
-        self.simulated_innings_df = pd.DataFrame()
 
-        self.match_columns_to_persist = match_columns_to_persist
+        # The BallLog recording the simulated innings in its compact encoding - the innings of a scenario are decoded
+        # on demand, see get_simulated_innings(). None if the innings are not held in memory.
+        self.simulated_innings = None
 
-        # Maintain a perfect simulator for each scenario which allows us to calculate the rewards & error metrics
-        # per scenario easily
-        for i in range(0, number_of_scenarios):
-            perfect_simulator_ds = DataSelection(data_selection.historical_data_helper)
-            self.perfect_simulators.append(PerfectSimulator(perfect_simulator_ds, rewards_configuration))
+        # The player outcomes of the simulated innings, accumulated while the innings are played (see
+        # ScorecardAccumulator) - None if they are not available, in which case they are derived from the innings
+        self.simulated_player_outcomes_df = None
 
-        self.scenario_date_time = None
-        self.max_number_of_scenarios = 100
+        # Views over the matches & innings of each scenario, used to calculate the rewards per scenario, along with
+        # the perfect simulators of the scenarios used most recently
+        self.scenario_views = None
+        self.perfect_simulators = OrderedDict()
 
-    def generate_matches(self):
+        self.match_columns_to_persist = match_columns_to_persist
+
+        self.scenario_date_time = None
+        self.convergence_df = None
+        self.use_inferential_model = False
+
+        # Error stats per granularity, along with the number of scenarios they cover - extended as scenarios are added
+        self.error_stats_cache = {}
+
+        self.requested_seed = seed
+        self.seed = seed
+        self.antithetic = antithetic
+        self.nested_group_size = nested_group_size
+        self.random_streams = ScenarioRandomStreams(seed, antithetic, nested_group_size)
+
+        self.workers = workers
+        self.batter_runs_model = batter_runs_model
+        self.engine = engine
+        self.spill_directory = spill_directory
+        self.checkpoint_directory = checkpoint_directory
+        self.checkpoint_interval = checkpoint_interval
+
+    def generate_matches(self, first_scenario_number=0):
         """
-        Generates the matches dataframe corresponding to the match set to simulate.
+        Generates the matches dataframe corresponding to the match set to simulate, for the scenarios
+        [first_scenario_number, number_of_scenarios)
         """
         matches_df = self.data_selection.get_selected_matches(True)
-        simulated_matches_df = pd.DataFrame()
         number_of_matches = len(matches_df.index)
+        scenario_numbers = np.arange(first_scenario_number, self.number_of_scenarios)
 
-        # Build a list of matches for each scenario
-        for i in range(0, self.number_of_scenarios):
-            scenario = {'scenario_number': i,
-                        'key': matches_df['key'].values.tolist(),
-                        'match_key': matches_df['key'].values.tolist(),
-                        'tournament_key': matches_df['tournament_key'].values.tolist(),
-                        'date': matches_df['date'].values.tolist(),
-                        'stage': matches_df['stage'].values.tolist(),
-                        'venue': matches_df['venue'].values.tolist(),
-                        'team1': matches_df['team1'].values.tolist(),
-                        'team2': matches_df['team2'].values.tolist()
-                        }
-            for column in self.match_columns_to_persist:
-                scenario[column] = matches_df[column].values.tolist()
-            scenario_df = pd.DataFrame(scenario)
-            simulated_matches_df = pd.concat([simulated_matches_df, scenario_df], ignore_index=True)
+        # Tile the matches once per scenario, column by column
+        simulated_matches = {'scenario_number': np.repeat(scenario_numbers, number_of_matches),
+                             'key': np.tile(matches_df['key'].values, len(scenario_numbers)),
+                             'match_key': np.tile(matches_df['key'].values, len(scenario_numbers))}
+        for column in ['tournament_key', 'date', 'stage', 'venue', 'team1', 'team2'] + self.match_columns_to_persist:
+            simulated_matches[column] = np.tile(matches_df[column].values, len(scenario_numbers))
+        simulated_matches_df = pd.DataFrame(simulated_matches)
 
         # Set up the toss results - toss winner & their decision (field or bat)
-        self.predictive_utils.compute_toss_results(simulated_matches_df, self.number_of_scenarios, number_of_matches)
+        self.predictive_utils.compute_toss_results(simulated_matches_df, self.random_streams)
 
         simulated_matches_df.set_index(['scenario_number', 'match_key'], inplace=True, verify_integrity=True)
         return simulated_matches_df
 
-    def initialise_match_state(self, row, match_state_dict, playing_xi_df):
-        """
-        Internal helper function - not to be used outside this class.
-        Iniatialises the match state objects for each match & scenario
-        """
-        scenario = row.name[0]
-        match_key = row.name[1]
-        batting_team = row['batting_team']
-        bowling_team = row['bowling_team']
-        venue = row['venue']
-        batting_playing_xi = playing_xi_df.query(f'match_key == {match_key} and '
-                                                 f'team == "{batting_team}"')['player_key'].to_list()
-        bowling_playing_xi = playing_xi_df.query(f'match_key == {match_key} and '
-                                                 f'team == "{bowling_team}"')['player_key'].to_list()
-        match_state = MatchState(self.predictive_utils, scenario, match_key, bowling_team,
-                                 batting_team, batting_playing_xi, bowling_playing_xi, venue)
-        match_state_dict[(scenario, match_key)] = match_state
-
-    def generate_innings(self, use_inferential_model):
+    def initialise_match_state_store(self) -> MatchStateStore:
+        """
+        Sets up the match state store for all the simulated matches & scenarios
+        """
         logging.debug("Getting playing xi")
         playing_xi_df = self.data_selection.get_playing_xi_for_selected_matches(True)
-        simulated_innings_df = pd.DataFrame()
+        playing_xi_index = PlayingXiIndex(playing_xi_df, self.predictive_utils)
 
         logging.debug("Initialising match state")
-        match_state_dict = {}
-        self.simulated_matches_df.swifter.apply(lambda x: self.initialise_match_state(x, match_state_dict, playing_xi_df),
-                                        axis=1)
+        return MatchStateStore(self.predictive_utils, self.simulated_matches_df, playing_xi_index, self.random_streams)
+
+    def generate_innings(self, use_inferential_model, checkpoint=None) -> (BallLog, ScorecardAccumulator):
+        """
+        Plays both innings of all the simulated matches delivery by delivery and returns the BallLog recording every
+        ball, along with the ScorecardAccumulator holding the player totals of the innings
+        :param checkpoint: If specified, the innings checkpoint to continue from
+        """
+        number_of_scenarios = self.simulated_matches_df.index.get_level_values('scenario_number').nunique()
+        number_of_matches = len(self.simulated_matches_df.index) // max(number_of_scenarios, 1)
+        ball_log = BallLog(number_of_scenarios, number_of_matches, spill_directory=self.spill_directory)
+
+        match_state_store = self.initialise_match_state_store()
+        block_size = match_state_store.delivery_uniforms.block_size
+
+        # The over engine draws the uniforms of a whole over at a time, so its steps (& delivery counters) are overs
+        over_outcomes_table = None
+        if self.engine == 'over':
+            if use_inferential_model:
+                logging.warning("The over engine doesn't use the inferential model")
+            over_outcomes_table = self.predictive_utils.get_over_outcomes_table()
+            match_state_store.delivery_uniforms = DeliveryUniforms(self.random_streams,
+                                                                   match_state_store.scenario_number,
+                                                                   over_outcomes_table.uniforms_per_over)
+
+        deliveries_played = 0
+        if checkpoint is not None:
+            self.random_streams = checkpoint['random_streams']
+            match_state_store.random_streams = self.random_streams
+            match_state_store.delivery_uniforms.random_streams = self.random_streams
+            match_state_store.set_state(checkpoint['match_state_store'])
+            ball_log.set_state(checkpoint['ball_log'])
+            deliveries_played = checkpoint['deliveries_played']
+            logging.debug(f"Resuming after delivery {deliveries_played}")
+
+        if self.use_innings_kernel(use_inferential_model):
+            InningsKernel(self.predictive_utils).play_matches(
+                match_state_store, ball_log, first_block=deliveries_played // block_size,
+                on_block=lambda block_number: self.save_innings_checkpoint(match_state_store,
+                                                                           ball_log,
+                                                                           (block_number + 1) * block_size,
+                                                                           use_inferential_model))
+            logging.debug("Done playing all matches")
+            return ball_log, match_state_store.scorecard
 
         logging.debug(f"Starting to play {len(self.simulated_matches_df.index)} matches")
-        for inning in [1, 2]:
-            over = -1
-            ball = 0
-            while True:
-                ball += 1
-                if (over == -1) or (ball == 7):
-                    over += 1
-                    ball = 1
-                    over_changed = True
-                else:
-                    over_changed = False
-                if over == 20:
-                    break
-                logging.info(f"Playing inning {inning}, over {over}, ball {ball}")
-                for key in match_state_dict.keys():
-                    match_state = match_state_dict[key]
-                    match_state.set_innings(inning)
-                    if over_changed:
-                        match_state.change_over()
-                    else:
-                        match_state.bowl_one_ball()
-
-                simulated_innings_df = self.play_one_ball(match_state_dict,
-                                                          simulated_innings_df,
-                                                          use_inferential_model)
-
-                extras_list_to_consider = match_state_dict
-                while True:
-                    extras_list = {}
-                    for key in extras_list_to_consider.keys():
-                        if match_state_dict[key].was_previous_non_legal_delivery():
-                            extras_list[key] = match_state_dict[key]
-                            match_state_dict[key].bowl_one_ball()
-                    if len(extras_list.keys()) == 0:
-                        break
-                    if extras_list == extras_list_to_consider:
-                        extras_list_to_consider = {}
-                    else:
-                        extras_list_to_consider = extras_list
-
-                    simulated_innings_df = self.play_one_ball(extras_list,
-                                                              simulated_innings_df,
-                                                              use_inferential_model)
+        # Every match advances by its own delivery counter, so each step bowls the next delivery of all the matches
+        # still being played - whatever the innings / over / ball they are at. Extras are re-bowled on the following
+        # step, and matches drop out of the working set as soon as they are complete.
+        positions = np.flatnonzero(~(match_state_store.match_complete | match_state_store.waiting_for_first_innings))
+        step = deliveries_played
+        while True:
+            positions = match_state_store.advance_innings(positions)
+            if len(positions) == 0:
+                break
+
+            step += 1
+            if over_outcomes_table is not None:
+                logging.info(f"Playing over {step} of {len(positions)} matches")
+                self.play_one_over(match_state_store, positions, ball_log, over_outcomes_table)
+            else:
+                logging.info(f"Playing delivery {step} of {len(positions)} matches")
+                match_state_store.bowl_next_delivery(positions)
+                self.play_one_ball(match_state_store,
+                                   positions,
+                                   ball_log,
+                                   use_inferential_model)
+            if step % block_size == 0:
+                self.save_innings_checkpoint(match_state_store, ball_log, step, use_inferential_model)
         logging.debug("Done playing all matches")
-        return simulated_innings_df
+        return ball_log, match_state_store.scorecard
+
+    def save_innings_checkpoint(self, match_state_store, ball_log, deliveries_played, use_inferential_model):
+        """
+        Checkpoints the innings being played after deliveries_played deliveries (a whole number of delivery blocks),
+        if checkpoints are enabled & due
+        """
+        block_size = match_state_store.delivery_uniforms.block_size
+        if (self.checkpoint_directory is None) or ((deliveries_played // block_size) % self.checkpoint_interval != 0):
+            return
+
+        logging.debug(f"Checkpointing after delivery {deliveries_played}")
+        save_checkpoint(self.checkpoint_directory, {
+            'status': 'innings',
+            **self.get_checkpoint_settings(),
+            'use_inferential_model': use_inferential_model,
+            'deliveries_played': deliveries_played,
+            'random_streams': self.random_streams,
+            'match_state_store': match_state_store.get_state(),
+            'ball_log': ball_log.get_state()
+        })
+
+    def get_checkpoint_settings(self) -> dict:
+        """
+        Returns the settings which determine the scenarios, saved with every checkpoint - resume() checks that they
+        match the settings of the predictive simulator
+        """
+        return {
+            'seed': self.seed,
+            'number_of_scenarios': self.number_of_scenarios,
+            'engine': self.engine,
+            'antithetic': self.antithetic,
+            'nested_group_size': self.nested_group_size
+        }
+
+    def use_innings_kernel(self, use_inferential_model) -> bool:
+        """
+        Returns True if the innings should be played with the numba kernel, falling back to the numpy engine when the
+        kernel can't be used
+        """
+        if self.engine != 'numba':
+            return False
+        if use_inferential_model:
+            logging.warning("The numba engine doesn't support the inferential model, using the numpy engine instead")
+            return False
+        if self.random_streams.nested_group_size > 1:
+            logging.warning("The numba engine doesn't support nested scenarios, using the numpy engine instead")
+            return False
+        if not NUMBA_AVAILABLE:
+            logging.warning("numba is not installed, using the numpy engine instead")
+            return False
+        return True
+
+    def generate_innings_in_parallel(self, use_inferential_model) -> (BallLog, pd.DataFrame):
+        """
+        Splits the scenarios into shards & plays the innings of each shard in a pool of worker processes. Returns the
+        ball logs of all the shards merged into one BallLog, along with their player outcomes - the workers send back
+        their ball logs in the compact encoding. When spilling to disk, each worker writes the scenarios of its shard
+        to the spill directory & no ball log is returned.
+        """
+        # Nested groups of scenarios are kept within a shard, so that they share their first innings
+        scenario_numbers = self.simulated_matches_df.index.get_level_values('scenario_number')
+        unique_scenario_numbers = scenario_numbers.unique()
+        group_numbers = unique_scenario_numbers // self.nested_group_size
+        shards = [unique_scenario_numbers[np.isin(group_numbers, groups)]
+                  for groups in np.array_split(np.unique(group_numbers), self.workers) if len(groups) > 0]
+
+        # Workers reload the batter runs model from disk instead of receiving the model loaded in this process
+        batter_runs_model = BatterRunsModel(self.batter_runs_model.perfect_simulator,
+                                            model_directory_path=self.batter_runs_model.model_directory_path,
+                                            model_type=self.batter_runs_model.model_type) \
+            if self.batter_runs_model is not None else None
+
+        logging.debug(f"Playing {scenario_numbers.nunique()} scenarios in {len(shards)} shards")
+        with ProcessPoolExecutor(max_workers=len(shards),
+                                 initializer=initialise_worker,
+                                 initargs=(self.data_selection,
+                                           self.rewards_configuration,
+                                           batter_runs_model,
+                                           use_inferential_model,
+                                           self.engine,
+                                           self.spill_directory)) as executor:
+            futures = [executor.submit(generate_innings_for_shard,
+                                       self.simulated_matches_df[scenario_numbers.isin(shard)],
+                                       self.random_streams,
+                                       use_inferential_model)
+                       for shard in shards]
+            results = [future.result() for future in futures]
+
+        player_outcomes_df = pd.concat([player_outcomes_df for ball_log_state, player_outcomes_df in results])
+        if self.spill_directory is not None:
+            return None, player_outcomes_df
+
+        ball_log = BallLog(0, 0)
+        ball_log.reserve(sum(len(ball_log_state['columns'][BallLog.OUTCOME_COLUMN]) for ball_log_state, _ in results))
+        for ball_log_state, _ in results:
+            ball_log.append_state(ball_log_state)
+        return ball_log, player_outcomes_df
 
     def play_one_ball(self,
-                      match_state_dict,
-                      simulated_innings_df,
+                      match_state_store,
+                      positions,
+                      ball_log,
                       use_inferential_model):
         """
         This function doest the following:
-        - builds out the dataframe representing the current match state for all matches & scenarios
-        - passes the current state df to a predictor which informs what the outcome of that ball is
-        - updates all the match state objects with the status of the ball outcome
-        - appends the ball outcome information to the simulated innings dataframe so we can keep a record
-        """
-
-        # Get a dictionary view of the current state of all the matches
-        match_state_per_scenario_list = []
-        for key in match_state_dict.keys():
-            match_dict = match_state_dict[key].get_dict()
-            if len(match_dict.keys()) != 0:
-                match_state_per_scenario_list.append(match_dict)
-
-        if len(match_state_per_scenario_list) > 0:
-            # Build out the current state dataframe
-            match_state_df = pd.DataFrame(match_state_per_scenario_list)
-            match_state_df.set_index(['scenario_number', 'match_key', 'inning', 'over', 'ball'], inplace=True,
-                                     verify_integrity=True)
-            match_state_df = match_state_df.sample(frac=1)
+        - gathers the current state of the matches at the specified positions of the match state store as arrays
+        - passes the current state to a predictor which informs what the outcome of that ball is
+        - updates the match state store with the status of the ball outcome
+        - records the ball outcome information in the ball log so we can keep a record
+        """
 
-            # Predict ball by ball outcome
-            self.predictive_utils.predict_ball_by_ball_outcome(match_state_df,
-                                                               use_inferential_model)
-            match_state_df['total_runs'] = match_state_df['batter_runs'] + match_state_df['extras']
+        # Only consider the matches which are still being played
+        positions = match_state_store.get_active_positions(positions)
 
-            # Apply the current state outcomes to the match state objects
-            match_state_df['fielder'] = match_state_df.apply(
-                lambda x: update_match_state(x, match_state_dict), axis=1)
+        if len(positions) > 0:
+            # Gather the current state
+            state = match_state_store.get_state_arrays(positions)
 
-            # Keep a record of this ball in innings_df
-            simulated_innings_df = pd.concat([simulated_innings_df, match_state_df])
+            # Draw all the random numbers needed for this ball in one go
+            uniforms = match_state_store.get_delivery_uniforms(positions)
 
-        return simulated_innings_df
+            # Predict ball by ball outcome
+            outcomes = self.predictive_utils.predict_outcomes(state, uniforms, use_inferential_model,
+                                                              match_state_store.get_outcome_buckets(positions))
+            outcomes['total_runs'] = outcomes['batter_runs'] + outcomes['extras']
+            ids = match_state_store.get_ball_log_ids(positions)
+            outcomes['player_dismissed'] = get_players_dismissed(outcomes, ids['batter'], ids['non_striker'],
+                                                                 no_player=-1)
+
+            # Apply the current state outcomes to the match state store
+            outcomes['fielder'] = match_state_store.apply_outcomes(positions, outcomes, uniforms[:, FIELDER_UNIFORM],
+                                                                   fielder_ids=True)
+
+            # Keep a record of this ball in the ball log
+            self.record_ball(match_state_store, positions, {**state, **outcomes, **ids}, ball_log)
+
+    def play_one_over(self,
+                      match_state_store,
+                      positions,
+                      ball_log,
+                      over_outcomes_table):
+        """
+        Plays the next over of the matches at the specified positions for the over engine - draws a whole over for each
+        match from over_outcomes_table & applies its deliveries to the match state store one after the other, stopping
+        early for the matches whose innings ends during the over. The deliveries are recorded in the ball log.
+        """
+        positions = match_state_store.get_active_positions(positions)
+        if len(positions) == 0:
+            return
+
+        match_state_store.change_over(positions)
+        match_state_store.deliveries_bowled[positions] += 1
+        uniforms = match_state_store.get_delivery_uniforms(positions)
+        overs = over_outcomes_table.sample(match_state_store.over[positions],
+                                           match_state_store.previous_num_wickets[positions],
+                                           uniforms[:, OVER_UNIFORM])
+
+        for delivery in range(over_outcomes_table.deliveries_per_over):
+            bowling = (delivery < over_outcomes_table.lengths[overs]) & match_state_store.is_active(positions)
+            if not bowling.any():
+                break
+            bowling_positions = positions[bowling]
+            if delivery > 0:
+                match_state_store.bowl_one_ball(bowling_positions)
+
+            state = match_state_store.get_state_arrays(bowling_positions)
+            ids = match_state_store.get_ball_log_ids(bowling_positions)
+            outcomes = over_outcomes_table.get_deliveries(overs[bowling], delivery)
+            outcomes['total_runs'] = outcomes['batter_runs'] + outcomes['extras']
+            outcomes['player_dismissed'] = get_players_dismissed(outcomes, ids['batter'], ids['non_striker'],
+                                                                 no_player=-1)
+            outcomes['fielder'] = match_state_store.apply_outcomes(
+                bowling_positions, outcomes, uniforms[bowling, FIRST_FIELDER_UNIFORM + delivery], fielder_ids=True)
+            self.record_ball(match_state_store, bowling_positions, {**state, **outcomes, **ids}, ball_log)
+
+    @staticmethod
+    def record_ball(match_state_store, positions, columns, ball_log):
+        """
+        Appends a ball bowled by the matches at the specified positions to the ball log - including for the matches
+        sharing the first innings being played (see nested_group_size). The players & teams in columns must be ids, see
+        MatchStateStore.get_ball_log_ids() - the venue is logged as the match position.
+        """
+        columns = {**columns, 'venue': positions}
+        sharing_positions, source_index = match_state_store.get_first_innings_sharers(positions)
+        if len(sharing_positions) > 0:
+            columns = {column: np.concatenate([values, np.asarray(values)[source_index]])
+                       for column, values in columns.items()}
+            columns['scenario_number'][len(positions):] = match_state_store.scenario_number[sharing_positions]
+        ball_log.append_columns(columns, match_state_store.get_ball_log_key_tables())
 
     def generate_scenario(self,
                           use_inferential_model=False):
         """
-        Generate all the required scenarios
+        Generate all the required scenarios. Returns the simulated matches & innings - the innings are decoded from
+        the ball log for the caller, the simulator itself only holds the compact ball log (see simulated_innings).
+        """
+        self.simulate_scenarios(use_inferential_model)
+        return self.simulated_matches_df, self.simulated_innings_df
+
+    def add_scenarios(self, number_of_scenarios):
+        """
+        Tops up the scenarios generated so far with number_of_scenarios more, using the same seed & model. Only the
+        new scenario numbers are simulated, from their own fresh random streams, and they are appended to the
+        simulated matches & innings. The cached error stats are kept, and extended for the new scenarios on demand.
+        Gives the same scenarios as generating them all in one go.
+        """
+        if self.simulated_matches_df.empty:
+            self.number_of_scenarios = number_of_scenarios
+            self.simulate_scenarios(self.use_inferential_model)
+        else:
+            first_scenario_number = self.number_of_scenarios
+            self.number_of_scenarios += number_of_scenarios
+            logging.debug(f"Adding scenarios {first_scenario_number} to {self.number_of_scenarios - 1}")
+            self.simulate_scenarios(self.use_inferential_model, first_scenario_number=first_scenario_number)
+        return self.simulated_matches_df, self.simulated_innings_df
+
+    def resume(self, checkpoint_directory):
+        """
+        Continues generating the scenarios from the checkpoint in checkpoint_directory, written by an earlier call to
+        generate_scenario() (see checkpoint_directory in the constructor). The predictive simulator must be set up the
+        same way as the one which wrote the checkpoint. Gives the same results as an uninterrupted run. If a seed was
+        specified, it must be the seed of the checkpoint - otherwise the seed of the checkpoint is used.
+        """
+        checkpoint = load_checkpoint(checkpoint_directory)
+        if checkpoint['number_of_scenarios'] != self.number_of_scenarios:
+            raise ValueError(f"The checkpoint is for {checkpoint['number_of_scenarios']} scenarios, "
+                             f"expected {self.number_of_scenarios}")
+        for setting in ['engine', 'antithetic', 'nested_group_size']:
+            if checkpoint[setting] != getattr(self, setting):
+                raise ValueError(f"The checkpoint is for {setting} {checkpoint[setting]}, "
+                                 f"expected {getattr(self, setting)}")
+        if (self.requested_seed is not None) and \
+                (np.random.SeedSequence(self.requested_seed).entropy != checkpoint['seed']):
+            raise ValueError(f"The checkpoint is for seed {checkpoint['seed']}, expected {self.requested_seed}")
+
+        self.checkpoint_directory = checkpoint_directory
+        self.requested_seed = checkpoint['seed']
+        if checkpoint['status'] == 'innings':
+            self.simulate_scenarios(checkpoint['use_inferential_model'], checkpoint)
+            return self.simulated_matches_df, self.simulated_innings_df
+
+        logging.debug("Restoring the completed scenarios from the checkpoint")
+        self.seed = checkpoint['seed']
+        self.use_inferential_model = checkpoint['use_inferential_model']
+        self.error_stats_cache = {}
+        self.simulated_matches_df = checkpoint['simulated_matches_df']
+        self.simulated_innings = None
+        if checkpoint['simulated_innings'] is not None:
+            self.simulated_innings = BallLog(0, 0)
+            self.simulated_innings.set_state(checkpoint['simulated_innings'])
+        self.simulated_player_outcomes_df = checkpoint.get('simulated_player_outcomes_df')
+        self.set_scenario_views()
+        self.scenario_date_time = checkpoint['scenario_date_time']
+        return self.simulated_matches_df, self.simulated_innings_df
+
+    def generate_scenarios_until_converged(self,
+                                           tolerance,
+                                           use_inferential_model=False,
+                                           batch_size=10,
+                                           max_number_of_scenarios=None) -> pd.DataFrame:
+        """
+        Generates scenarios in batches of batch_size until the total rewards of every focus player (see
+        RewardsConfiguration.get_focus_players()) have converged, or max_number_of_scenarios have been generated -
+        whichever comes first. The estimate of a player has converged once the width of the HDI of their total rewards
+        per tournament scenario changes by at most tolerance from one batch to the next (see
+        RewardsConvergenceTracker). With nested groups, the batch size is rounded up to whole groups.
+        Afterwards, number_of_scenarios holds the number of scenarios actually generated, and the scenarios can be used
+        in the same way as after generate_scenario(). Checkpoints are not written in this mode.
+        :param max_number_of_scenarios: The budget of scenarios, defaults to the number_of_scenarios of the constructor
+        :return: The running estimates of the focus players once done, see RewardsConvergenceTracker.get_summary()
+        """
+        if max_number_of_scenarios is None:
+            max_number_of_scenarios = self.number_of_scenarios
+        if batch_size < 1:
+            raise ValueError(f"The batch size must be at least 1\nReceived: {batch_size}")
+
+        batch_size = -(-batch_size // self.nested_group_size) * self.nested_group_size
+
+        focus_players_df = self.rewards_configuration.get_focus_players()
+        tracker = RewardsConvergenceTracker(focus_players_df['player_key'], tolerance,
+                                            group_size=self.nested_group_size)
+
+        # A new batch continues with the next scenario numbers & the same master seed, so that each batch draws from
+        # fresh random streams
+        checkpoint_directory = self.checkpoint_directory
+        self.checkpoint_directory = None
+        try:
+            first_scenario_number = 0
+            while first_scenario_number < max_number_of_scenarios:
+                self.number_of_scenarios = min(first_scenario_number + batch_size, max_number_of_scenarios)
+                logging.debug(f"Generating scenarios {first_scenario_number} to {self.number_of_scenarios - 1}")
+                self.simulate_scenarios(use_inferential_model, first_scenario_number=first_scenario_number)
+
+                for scenario in range(first_scenario_number, self.number_of_scenarios):
+                    tracker.add_scenario(self.get_rewards(scenario, Granularity.TOURNAMENT))
+                first_scenario_number = self.number_of_scenarios
+
+                # The HDI widths are compared between consecutive batches, so the first batch never converges
+                if tracker.has_converged():
+                    break
+        finally:
+            self.checkpoint_directory = checkpoint_directory
+
+        self.convergence_df = tracker.get_summary()
+        logging.info(f"Used {self.number_of_scenarios} scenarios, "
+                     f"{self.convergence_df['converged'].sum()} of {len(self.convergence_df.index)} focus players "
+                     f"converged within {tolerance}")
+        return self.convergence_df
+
+    def simulate_scenarios(self, use_inferential_model, checkpoint=None, first_scenario_number=0):
+        """
+        Internal helper function - generates all the required scenarios, continuing from the innings checkpoint if
+        specified. If first_scenario_number > 0, only the scenarios [first_scenario_number, number_of_scenarios) are
+        generated & added to the scenarios generated so far, using the same seed.
         """
         logging.debug("Setting up scenario state")
 
         self.predictive_utils.setup(use_inferential_model)
+        self.use_inferential_model = use_inferential_model
+        if first_scenario_number == 0:
+            self.error_stats_cache = {}
+
+        # Fresh random streams for every run, so that re-running with the same seed reproduces the same scenarios
+        self.random_streams = ScenarioRandomStreams(self.requested_seed if first_scenario_number == 0 else self.seed,
+                                                    self.antithetic, self.nested_group_size)
+        self.seed = self.random_streams.seed
+        logging.debug(f"Using seed {self.seed}")
+
+        if (self.spill_directory is not None) and (checkpoint is None) and (first_scenario_number == 0):
+            shutil.rmtree(self.spill_directory, ignore_errors=True)
+            os.makedirs(self.spill_directory)
 
         logging.debug("Generating simulated Match data")
 
-        self.simulated_matches_df = self.generate_matches()
+        previous_matches_df = self.simulated_matches_df if first_scenario_number > 0 else pd.DataFrame()
+        previous_innings = self.simulated_innings if first_scenario_number > 0 else None
+        previous_player_outcomes_df = self.simulated_player_outcomes_df if first_scenario_number > 0 else None
+        self.simulated_matches_df = self.generate_matches(first_scenario_number)
 
         logging.debug("Generating simulated Innings data")
-        self.simulated_innings_df = self.generate_innings(use_inferential_model)
+        if (self.workers > 1) and (self.number_of_scenarios - first_scenario_number > 1):
+            if self.checkpoint_directory is not None:
+                logging.warning("Checkpoints are not written when playing the innings in worker processes")
+            self.simulated_innings, self.simulated_player_outcomes_df = \
+                self.generate_innings_in_parallel(use_inferential_model)
+        else:
+            self.simulated_innings, scorecard = self.generate_innings(use_inferential_model, checkpoint)
+            self.simulated_player_outcomes_df = scorecard.to_dataframe()
+        if self.spill_directory is not None:
+            if self.simulated_innings is not None:
+                self.simulated_innings.spill()
+            self.simulated_innings = None
 
         self.calculate_match_winner()
-
-        # Set up the matches & innings in each of the perfect simulators for future counting
-        self.simulated_matches_df = self.simulated_matches_df.reset_index()
-        self.simulated_innings_df = self.simulated_innings_df.reset_index()
-        for i in range(0, self.number_of_scenarios):
-            perfect_simulator = self.perfect_simulators[i]
-            perfect_simulator.data_selection.set_simulated_data(
-                self.simulated_matches_df[self.simulated_matches_df['scenario_number'] == i],
-                self.simulated_innings_df[self.simulated_innings_df['scenario_number'] == i])
-
-        self.simulated_matches_df.set_index(['scenario_number', 'match_key'], inplace=True, verify_integrity=True)
-        self.simulated_innings_df.set_index(['scenario_number', 'match_key', 'inning', 'over', 'ball'], inplace=True,
-                                            verify_integrity=True)
+        if first_scenario_number > 0:
+            self.simulated_matches_df = pd.concat([previous_matches_df, self.simulated_matches_df])
+            if previous_innings is not None:
+                previous_innings.append_state(self.simulated_innings.get_state())
+                self.simulated_innings = previous_innings
+            if previous_player_outcomes_df is not None:
+                self.simulated_player_outcomes_df = pd.concat([previous_player_outcomes_df,
+                                                               self.simulated_player_outcomes_df])
+            else:
+                self.simulated_player_outcomes_df = None
+        if self.simulated_innings is not None:
+            self.simulated_innings.trim()
+        self.set_scenario_views()
 
         self.scenario_date_time = datetime.datetime.now()
 
+        if self.checkpoint_directory is not None:
+            save_checkpoint(self.checkpoint_directory, {
+                'status': 'complete',
+                **self.get_checkpoint_settings(),
+                'use_inferential_model': use_inferential_model,
+                'simulated_matches_df': self.simulated_matches_df,
+                'simulated_innings': self.simulated_innings.get_state() if self.simulated_innings is not None
+                else None,
+                'simulated_player_outcomes_df': self.simulated_player_outcomes_df,
+                'scenario_date_time': self.scenario_date_time
+            })
+
         logging.debug("Done Generating Match & Innings data")
 
-        return self.simulated_matches_df, self.simulated_innings_df
+    def set_scenario_views(self):
+        """
+        Set up the views over the matches, innings & player outcomes of each scenario for future counting. When
+        spilling to disk, the innings of a scenario are read back on demand instead.
+        """
+        self.scenario_views = ScenarioViews(self.simulated_matches_df, self.simulated_innings,
+                                            self.simulated_player_outcomes_df)
+        self.perfect_simulators = OrderedDict()
+
+    def get_perfect_simulator(self, scenario) -> PerfectSimulator:
+        """
+        Returns a perfect simulator over the matches & innings of the scenario, which allows us to calculate the
+        rewards & error metrics of the scenario. The simulator is built on demand from the scenario views, along with
+        the player outcomes accumulated while the scenario was played - so they are not derived from the innings again.
+        The simulators of the last PERFECT_SIMULATOR_CACHE_SIZE scenarios asked for are reused.
+        """
+        if scenario in self.perfect_simulators:
+            self.perfect_simulators.move_to_end(scenario, last=False)
+            return self.perfect_simulators[scenario]
+
+        if self.spill_directory is None:
+            innings_df = self.scenario_views.get_balls(scenario)
+        else:
+            innings_df = BallLogDataset(self.spill_directory).read_scenario(scenario)
+
+        data_selection = DataSelection(self.data_selection.historical_data_helper)
+        data_selection.set_simulated_data(self.scenario_views.get_matches(scenario), innings_df,
+                                          player_outcomes_df=self.scenario_views.get_player_outcomes(scenario))
+        perfect_simulator = PerfectSimulator(data_selection, self.rewards_configuration)
+
+        self.perfect_simulators[scenario] = perfect_simulator
+        self.perfect_simulators.move_to_end(scenario, last=False)
+        if len(self.perfect_simulators) > PERFECT_SIMULATOR_CACHE_SIZE:
+            self.perfect_simulators.popitem()
+        return perfect_simulator
 
     def calculate_match_winner(self):
         """
         Calculate the winner & loser for a match, and update the innings
         """
-        winner_df = self.simulated_innings_df.reset_index().groupby(['scenario_number', 'match_key']).last()
+        if self.spill_directory is None:
+            winner_df = self.simulated_innings.get_last_balls()
+        else:
+            # Only keep the last ball of each match while reading the scenarios back
+            dataset = BallLogDataset(self.spill_directory)
+            winner_df = pd.concat([dataset.read_scenario(scenario).groupby(['scenario_number', 'match_key']).last()
+                                   for scenario in self.simulated_matches_df.index.get_level_values(
+                                       'scenario_number').unique()])
 
         # TODO: Update with logic for ties. Currently the bowling team wins if the scores are tied
         winner_df['winner'] = winner_df['bowling_team']
@@ -257,9 +695,37 @@ class PredictiveSimulator:
         @param columns_to_persist: The list of columns to persist in the output dataframes
         @return The rewards dataframe corresponding to the expected scenario
         """
-        return self.perfect_simulators[scenario].get_simulation_evaluation_metrics_by_granularity(
+        return self.get_perfect_simulator(scenario).get_simulation_evaluation_metrics_by_granularity(
             True, granularity, columns_to_persist=columns_to_persist)
 
+    @property
+    def simulated_innings_df(self) -> pd.DataFrame:
+        """
+        The simulated innings of all the scenarios, decoded from the ball log on every access - use
+        get_simulated_innings() to decode one scenario at a time. Empty if the innings are not held in memory.
+        """
+        if self.simulated_innings is None:
+            return pd.DataFrame()
+        return self.simulated_innings.to_dataframe()
+
+    def get_simulated_innings(self, scenario=None) -> pd.DataFrame:
+        """
+        Returns the simulated innings of the scenario (or of all the scenarios if scenario is None), indexed by
+        [scenario_number, match_key, inning, over, ball]. When spilling to disk, the innings are read back from the
+        spill directory.
+        """
+        if self.spill_directory is None:
+            if self.simulated_innings is None:
+                return pd.DataFrame()
+            if scenario is None:
+                return self.simulated_innings.to_dataframe()
+            return self.scenario_views.get_innings(scenario)
+
+        dataset = BallLogDataset(self.spill_directory)
+        innings_df = dataset.read_all() if scenario is None else dataset.read_scenario(scenario)
+        innings_df.set_index(BallLog.INDEX_COLUMNS, inplace=True, verify_integrity=True)
+        return innings_df
+
     def __str__(self):
         """String representation of this class, can be used with print, st.write etc"""
         return f"Predictive Simulator:  " \
@@ -270,46 +736,60 @@ class PredictiveSimulator:
         """
         Generate the error metrics between the predicted matches & the perfect simulator, across all possible
         scenarios of the predictive simulator. This function is designed to be more performant than the others.
+        The error stats are cached per granularity, and only calculated for the scenarios added since the last call.
         """
-        data_selection_combined = DataSelection(self.data_selection.historical_data_helper)
-        perfect_simulator_combined = PerfectSimulator(data_selection_combined, self.rewards_configuration)
-
-        matches_df = self.simulated_matches_df.copy()
-        innings_df = self.simulated_innings_df.copy()
-
-        matches_df = matches_df.reset_index()
-        innings_df = innings_df.reset_index()
-
-        # Setup the key to a unique number across scenarios
-        matches_df["key"] = (matches_df["key"] * self.max_number_of_scenarios) + matches_df['scenario_number']
-        matches_df["match_key"] = (matches_df["match_key"] * self.max_number_of_scenarios) + matches_df['scenario_number']
-        innings_df["match_key"] = (innings_df["match_key"] * self.max_number_of_scenarios) + innings_df['scenario_number']
+        cached_number_of_scenarios, cached_error_df = self.error_stats_cache.get(granularity, (0, None))
+        if cached_number_of_scenarios == self.number_of_scenarios:
+            return cached_error_df
+
+        error_df = self.calculate_error_stats(granularity, cached_number_of_scenarios)
+        if cached_error_df is not None:
+            error_df = pd.concat([cached_error_df, error_df])
+        self.error_stats_cache[granularity] = (self.number_of_scenarios, error_df)
+        return error_df
 
-        # Get metrics for the simulated matches
-        perfect_simulator_combined.data_selection.set_simulated_data(matches_df, innings_df)
+    def calculate_error_stats(self, granularity, first_scenario_number=0) -> pd.DataFrame:
+        """
+        Internal helper function - calculates the error metrics of the scenarios [first_scenario_number,
+        number_of_scenarios)
+        """
         columns_to_persist = ['scenario_number']
-        metrics_df = perfect_simulator_combined.get_simulation_evaluation_metrics_by_granularity(
-            True, granularity, columns_to_persist=columns_to_persist)
+        scenario_numbers = np.arange(first_scenario_number, self.number_of_scenarios)
+
+        # Get metrics for the simulated matches - all the scenarios in one go, or one scenario at a time when the
+        # innings are spilled to disk
+        matches_df = self.simulated_matches_df.reset_index()
+        matches_df = matches_df[matches_df['scenario_number'] >= first_scenario_number]
+        player_outcomes_df = self.simulated_player_outcomes_df
+        if player_outcomes_df is not None:
+            player_outcomes_df = player_outcomes_df.reset_index()
+            player_outcomes_df = player_outcomes_df[player_outcomes_df['scenario_number'] >= first_scenario_number]
+        if self.spill_directory is None:
+            innings_df = self.simulated_innings.to_dataframe(scenario_numbers=scenario_numbers).reset_index()
+            metrics_df = self.get_combined_metrics(matches_df, innings_df, player_outcomes_df, granularity,
+                                                   columns_to_persist)
+        else:
+            dataset = BallLogDataset(self.spill_directory)
+            metrics_df = pd.concat([self.get_combined_metrics(
+                matches_df[matches_df['scenario_number'] == scenario],
+                dataset.read_scenario(scenario),
+                player_outcomes_df[player_outcomes_df['scenario_number'] == scenario]
+                if player_outcomes_df is not None else None,
+                granularity,
+                columns_to_persist) for scenario in scenario_numbers])
 
         # Get metrics for historical data
         perfect_simulator = PerfectSimulator(self.data_selection, self.rewards_configuration)
         perfect_metrics_df = perfect_simulator.get_simulation_evaluation_metrics_by_granularity(
             True, granularity)
 
-        # Duplicate metrics for historical data so that they can be used to compare across scenarios
+        # Duplicate metrics for historical data so that they can be used to compare across scenarios, with the
+        # scenario number as an extra index level
         perfect_metrics_index = list(perfect_metrics_df.index.names)
         perfect_metrics_df = perfect_metrics_df.reset_index()
-        # This duplicates perfect metrics and also sets up a rolling scenario count
-        perfect_metrics_df = (perfect_metrics_df.loc[perfect_metrics_df.index.repeat(self.number_of_scenarios)]
-                              .assign(scenario_number=lambda d: d.groupby(level=0).cumcount())
-                              .reset_index(drop=True)
-                              )
-
-        # Make match key unique across scenarios
-        if 'match_key' in perfect_metrics_index:
-            perfect_metrics_df['match_key'] = (perfect_metrics_df['match_key'] * self.max_number_of_scenarios) \
-                                              + perfect_metrics_df['scenario_number']
-
+        perfect_metrics_df = perfect_metrics_df.loc[perfect_metrics_df.index.repeat(len(scenario_numbers))]
+        perfect_metrics_df['scenario_number'] = np.tile(scenario_numbers,
+                                                        len(perfect_metrics_df.index) // len(scenario_numbers))
         perfect_metrics_df.set_index(perfect_metrics_index + ['scenario_number'], inplace=True, verify_integrity=True)
 
         # Calculate the error metrics
@@ -317,15 +797,68 @@ class PredictiveSimulator:
                                                         perfect_simulator_rewards_ref=perfect_metrics_df,
                                                         columns_to_persist=columns_to_persist)
 
-        # Bring back the match key to its original number if required
-        indices = list(error_df.index.names)
-        error_df = error_df.reset_index()
-        if 'match_key' in indices:
-            error_df['match_key'] = \
-                (error_df['match_key'] - (error_df['match_key'] % self.max_number_of_scenarios)) / self.max_number_of_scenarios
-            error_df['match_key'] = error_df['match_key'].astype(int)
-        error_df.set_index(indices, inplace=True, verify_integrity=True)
-
         return error_df
 
+    def get_combined_metrics(self, matches_df, innings_df, player_outcomes_df, granularity,
+                             columns_to_persist) -> pd.DataFrame:
+        """
+        Internal helper function - calculates the metrics of the simulated matches of several scenarios in one go, by
+        making the match keys unique across the scenarios. The match keys in the metrics are the original ones, with
+        the scenario number persisted as a separate index level. The player outcomes accumulated while the innings
+        were played are used if specified (not None), rather than being derived from the innings again.
+        """
+        data_selection_combined = DataSelection(self.data_selection.historical_data_helper)
+        perfect_simulator_combined = PerfectSimulator(data_selection_combined, self.rewards_configuration)
+
+        matches_df = matches_df.copy()
+        innings_df = innings_df.copy()
+
+        # Setup the key to a unique number across scenarios
+        matches_df["key"] = encode_scenario_keys(matches_df["key"], matches_df['scenario_number'])
+        matches_df["match_key"] = encode_scenario_keys(matches_df["match_key"], matches_df['scenario_number'])
+        innings_df["match_key"] = encode_scenario_keys(innings_df["match_key"], innings_df['scenario_number'])
+        if player_outcomes_df is not None:
+            player_outcomes_df = player_outcomes_df.copy()
+            player_outcomes_df["match_key"] = encode_scenario_keys(player_outcomes_df["match_key"],
+                                                                   player_outcomes_df['scenario_number'])
+            player_outcomes_df.drop('scenario_number', axis=1, inplace=True)
+
+        perfect_simulator_combined.data_selection.set_simulated_data(matches_df, innings_df,
+                                                                     player_outcomes_df=player_outcomes_df)
+        metrics_df = perfect_simulator_combined.get_simulation_evaluation_metrics_by_granularity(
+            True, granularity, columns_to_persist=columns_to_persist)
+        return decode_scenario_key_level(metrics_df)
+
 
+def initialise_worker(data_selection, rewards_configuration, batter_runs_model, use_inferential_model, engine,
+                      spill_directory):
+    """
+    Internal helper function - not to be used outside this module.
+    Runs once in each worker process to set up the predictive simulator which plays the shards, so that the historical
+    data & batter runs model are only loaded once per worker.
+    """
+    global worker_predictive_simulator
+    worker_predictive_simulator = PredictiveSimulator(data_selection,
+                                                      rewards_configuration,
+                                                      batter_runs_model,
+                                                      number_of_scenarios=0,
+                                                      engine=engine,
+                                                      spill_directory=spill_directory)
+    worker_predictive_simulator.predictive_utils.setup(use_inferential_model)
+
+
+def generate_innings_for_shard(simulated_matches_df, random_streams, use_inferential_model) -> (dict, pd.DataFrame):
+    """
+    Internal helper function - not to be used outside this module.
+    Plays the innings of the shard of simulated matches in a worker process & returns the state of its ball log (None
+    if the innings are spilled to disk) along with their player outcomes
+    """
+    simulator = worker_predictive_simulator
+    simulator.simulated_matches_df = simulated_matches_df
+    simulator.number_of_scenarios = simulated_matches_df.index.get_level_values('scenario_number').nunique()
+    simulator.random_streams = random_streams
+    ball_log, scorecard = simulator.generate_innings(use_inferential_model)
+    if simulator.spill_directory is not None:
+        ball_log.spill()
+        return None, scorecard.to_dataframe()
+    return ball_log.get_state(), scorecard.to_dataframe()
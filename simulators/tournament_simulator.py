@@ -2,9 +2,14 @@ from inferential_models.batter_runs_models import BatterRunsModel
 from utils.config_utils import ConfigUtils
 from data_selection.data_selection import DataSelection
 from rewards_configuration.rewards_configuration import RewardsConfiguration
+import numpy as np
 import pandas as pd
 import logging
+import os
+import shutil
 from simulators.predictive_simulator import PredictiveSimulator
+from simulators.utils.checkpoint import save_checkpoint, load_checkpoint, has_checkpoint
+from simulators.utils.scenario_keys import encode_scenario_keys, decode_scenario_keys
 from datetime import datetime
 
 
@@ -18,10 +23,6 @@ class TournamentSimulator:
         """
         Validates the configuration files & also setup all the data for simulations
         """
-        # Ensure the number of scenarios is within the limit
-        if self.number_of_scenarios >= self.max_number_of_scenarios:
-            raise ValueError(f"The number of scenarios must be lesser than {self.max_number_of_scenarios}\n"
-                             f"Received: {self.number_of_scenarios}")
         number_of_matches = len(self.source_matches_df.index)
 
         matches_df = self.data_selection.get_all_matches()
@@ -85,7 +86,17 @@ class TournamentSimulator:
     def __init__(self, data_selection: DataSelection,
                  rewards_configuration: RewardsConfiguration,
                  batter_runs_model: BatterRunsModel,
-                 config_utils: ConfigUtils):
+                 config_utils: ConfigUtils,
+                 seed=None,
+                 checkpoint_directory=None):
+        """
+        :param seed: Master seed for the tournament. Each stage is simulated with its own seed derived from it, so the
+        same seed reproduces the same tournament. If None, a fresh seed is drawn on every call to generate_scenarios(),
+        and is available in self.seed afterwards.
+        :param checkpoint_directory: If specified, generate_scenarios() checkpoints to this directory - the tournament
+        seed, and the predictive simulator of each stage to its own sub-directory (see PredictiveSimulator). resume()
+        skips the stages which are complete & continues the stage in progress from its last checkpoint.
+        """
         self.number_of_scenarios, self.matches_file_name, self.playing_xi_file_name = \
             config_utils.get_tournament_simulator_info()
         self.data_selection = data_selection
@@ -112,7 +123,9 @@ class TournamentSimulator:
 
         self.scenario_date_time = None
 
-        self.max_number_of_scenarios = 100
+        self.requested_seed = seed
+        self.seed = seed
+        self.checkpoint_directory = checkpoint_directory
 
     def get_group_stage_matches(self):
         mask_for_stage = self.source_matches_df['stage'].isin(self.non_group_stages)
@@ -146,7 +159,7 @@ class TournamentSimulator:
 
             # Make sure the match key is unique per scenario so that the predictive simulator is able to treat each
             # match uniquely
-            matches_to_add_df['key'] = (matches_to_add_df['key'] * self.max_number_of_scenarios) + scenario
+            matches_to_add_df['key'] = encode_scenario_keys(matches_to_add_df['key'], scenario)
             matches_df = pd.concat([matches_df, matches_to_add_df])
 
             # Build the playing xi for the match
@@ -154,7 +167,7 @@ class TournamentSimulator:
 
             # Make sure the match key is unique per scenario so that the predictive simulator is able to treat each
             # match uniquely
-            players_to_add_df['match_key'] = (players_to_add_df['match_key'] * self.max_number_of_scenarios) + scenario
+            players_to_add_df['match_key'] = encode_scenario_keys(players_to_add_df['match_key'], scenario)
             playing_xi_df = pd.concat((playing_xi_df, players_to_add_df))
 
         return matches_df, playing_xi_df
@@ -183,7 +196,7 @@ class TournamentSimulator:
 
             # Make sure the match key is unique per scenario so that the predictive simulator is able to treat each
             # match uniquely
-            matches_to_add_df['key'] = (matches_to_add_df['key'] * self.max_number_of_scenarios) + scenario
+            matches_to_add_df['key'] = encode_scenario_keys(matches_to_add_df['key'], scenario)
             matches_df = pd.concat([matches_df, matches_to_add_df])
 
             # Build the playing xi for the match
@@ -226,7 +239,7 @@ class TournamentSimulator:
 
             # Make sure the match key is unique per scenario so that the predictive simulator is able to treat each
             # match uniquely
-            matches_to_add_df['key'] = (matches_to_add_df['key'] * self.max_number_of_scenarios) + scenario
+            matches_to_add_df['key'] = encode_scenario_keys(matches_to_add_df['key'], scenario)
             matches_df = pd.concat([matches_df, matches_to_add_df])
 
             # Build the playing xi for the match
@@ -258,7 +271,7 @@ class TournamentSimulator:
 
             # Make sure the match key is unique per scenario so that the predictive simulator is able to treat each
             # match uniquely
-            matches_to_add_df['key'] = (matches_to_add_df['key'] * self.max_number_of_scenarios) + scenario
+            matches_to_add_df['key'] = encode_scenario_keys(matches_to_add_df['key'], scenario)
             matches_df = pd.concat([matches_df, matches_to_add_df])
 
             # Build the playing xi for the match
@@ -270,9 +283,13 @@ class TournamentSimulator:
     def get_match_results(self,
                           input_matches_df,
                           input_playing_xi_df,
-                          use_inferential_model):
+                          use_inferential_model,
+                          stage,
+                          resume=False):
         """
-        Utility function to simulate a set of matches using the predictive simulator
+        Utility function to simulate a set of matches using the predictive simulator. The stage number is used to
+        derive the seed of the predictive simulator from the tournament seed. If resume is True & the stage has a
+        checkpoint, the stage is continued from the checkpoint.
         """
         # Set up the input matches & playing XI
         data_selection_for_simulations = DataSelection(self.data_selection.historical_data_helper)
@@ -280,14 +297,22 @@ class TournamentSimulator:
                                                           playing_xi_df=input_playing_xi_df)
 
         # Setup the predictive simulator
+        stage_checkpoint_directory = os.path.join(self.checkpoint_directory, f"stage-{stage}") \
+            if self.checkpoint_directory is not None else None
         predictive_simulator = PredictiveSimulator(data_selection_for_simulations,
                                                    self.rewards_configuration,
                                                    self.batter_runs_model,
                                                    number_of_scenarios=1,
-                                                   match_columns_to_persist=['tournament_scenario'])
+                                                   match_columns_to_persist=['tournament_scenario'],
+                                                   seed=[self.seed, stage],
+                                                   checkpoint_directory=stage_checkpoint_directory)
 
         # Generate the matches & innings
-        matches_df, innings_df = predictive_simulator.generate_scenario(use_inferential_model)
+        if resume and has_checkpoint(stage_checkpoint_directory):
+            logging.debug(f"Resuming stage {stage} from its checkpoint")
+            matches_df, innings_df = predictive_simulator.resume(stage_checkpoint_directory)
+        else:
+            matches_df, innings_df = predictive_simulator.generate_scenario(use_inferential_model)
 
         # Calculate the top winners per group scenario
         winners_df = matches_df.groupby(['winner', 'tournament_scenario'])['key'].count().unstack()
@@ -298,7 +323,32 @@ class TournamentSimulator:
         """
         Generate the tournament scenarios
         """
+        return self.simulate_tournament(use_inferential_model)
+
+    def resume(self, checkpoint_directory):
+        """
+        Continues generating the tournament scenarios from the checkpoint in checkpoint_directory, written by an earlier
+        call to generate_scenarios(). Gives the same results as an uninterrupted run.
+        """
+        checkpoint = load_checkpoint(checkpoint_directory)
+        self.checkpoint_directory = checkpoint_directory
+        self.requested_seed = checkpoint['seed']
+        return self.simulate_tournament(checkpoint['use_inferential_model'], resume=True)
+
+    def simulate_tournament(self, use_inferential_model, resume=False):
+        """
+        Internal helper function - generates the tournament scenarios, continuing from the checkpoints of the stages if
+        resume is True
+        """
         self.validate_and_setup()
+        self.seed = np.random.SeedSequence(self.requested_seed).entropy
+        logging.debug(f"Using seed {self.seed}")
+
+        if (self.checkpoint_directory is not None) and not resume:
+            # Start from a clean directory, so that stale stage checkpoints are never resumed
+            shutil.rmtree(self.checkpoint_directory, ignore_errors=True)
+            save_checkpoint(self.checkpoint_directory, {'seed': self.seed,
+                                                        'use_inferential_model': use_inferential_model})
 
         # Play all the group stage matches
         group_input_matches_df, group_input_playing_xi_df = self.prepare_group_matches_and_players()
@@ -306,7 +356,9 @@ class TournamentSimulator:
         self.group_matches_predictive_simulator, group_winners_df, group_matches_df, group_innings_df = \
             self.get_match_results(group_input_matches_df,
                                    group_input_playing_xi_df,
-                                   use_inferential_model)
+                                   use_inferential_model,
+                                   stage=0,
+                                   resume=resume)
 
         # Play the Q1 & Eliminator matches
         first_non_group_input_matches_df, first_non_group_input_playing_xi_df = \
@@ -315,14 +367,16 @@ class TournamentSimulator:
                       f"{first_non_group_input_matches_df.shape[0]} matches")
         self.first_non_group_matches_predictive_simulator, first_non_group_winner_df, first_non_group_matches_df, \
         first_non_group_innings_df = self.get_match_results(first_non_group_input_matches_df,
-                                                            first_non_group_input_playing_xi_df, use_inferential_model)
+                                                            first_non_group_input_playing_xi_df, use_inferential_model,
+                                                            stage=1, resume=resume)
         # Play the Q2 matches
         second_non_group_input_matches_df, second_non_group_input_playing_xi_df = \
             self.prepare_q2_matches_and_players(first_non_group_matches_df)
         logging.debug(f"Playing Qualifier 2: {second_non_group_input_matches_df.shape[0]} matches")
         self.second_non_group_matches_predictive_simulator, second_non_group_winner_df, second_non_group_matches_df, \
         second_non_group_innings_df = self.get_match_results(second_non_group_input_matches_df,
-                                                             second_non_group_input_playing_xi_df, use_inferential_model)
+                                                             second_non_group_input_playing_xi_df, use_inferential_model,
+                                                             stage=2, resume=resume)
 
         # Play all the Final matches
         final_input_matches_df, final_input_playing_xi_df = \
@@ -330,7 +384,7 @@ class TournamentSimulator:
         logging.debug(f"Playing Finals: {final_input_matches_df.shape[0]} matches")
         self.finals_predictive_simulator, final_winner_df, final_matches_df, final_innings_df \
             = self.get_match_results(final_input_matches_df, final_input_playing_xi_df,
-                                     use_inferential_model)
+                                     use_inferential_model, stage=3, resume=resume)
 
         # Put together all the matches in one go
         all_matches = pd.concat([group_matches_df, first_non_group_matches_df, second_non_group_matches_df,
@@ -372,10 +426,7 @@ class TournamentSimulator:
         rewards_df = self.data_selection.merge_with_players(rewards_df, 'player_key')
 
         if 'match_key' in indices:
-            rewards_df['match_key'] = \
-                (rewards_df['match_key'] - (
-                        rewards_df['match_key'] % self.max_number_of_scenarios)) / self.max_number_of_scenarios
-            rewards_df['match_key'] = rewards_df['match_key'].astype(int)
+            rewards_df['match_key'] = decode_scenario_keys(rewards_df['match_key'])
 
         rewards_df.set_index(indices, inplace=True, verify_integrity=True)
 
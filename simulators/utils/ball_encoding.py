@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+
+from simulators.utils.dismissal_kinds import NO_DISMISSAL
+
+# Fields of the packed outcome of a ball, from the lowest bit up, with their width in bits. Dismissal kinds are packed
+# as code - NO_DISMISSAL, so that a ball without a dismissal is 0 like the other fields.
+OUTCOME_FIELDS = [('batter_runs', 4), ('extras', 4), ('legal_delivery', 1), ('is_wicket', 1), ('dismissal_kind', 4),
+                  ('non_striker_dismissed', 1), ('is_direct_runout', 1), ('noballs', 1), ('wides', 1)]
+OUTCOME_DTYPE = np.uint32
+
+OUTCOME_SHIFTS = dict(zip([column for column, _ in OUTCOME_FIELDS],
+                          np.cumsum([0] + [bits for _, bits in OUTCOME_FIELDS[:-1]]).tolist()))
+OUTCOME_MASKS = {column: (1 << bits) - 1 for column, bits in OUTCOME_FIELDS}
+
+# Ids of the keys (players, teams & venues) of the balls
+KEY_ID_DTYPE = np.int32
+
+
+def pack_outcomes(columns: dict) -> np.ndarray:
+    """
+    Packs the outcome columns of the balls (see OUTCOME_FIELDS) into one word per ball. The dismissal kinds must be
+    codes (see dismissal_kinds.py).
+    """
+    words = np.zeros(len(columns['batter_runs']), dtype=OUTCOME_DTYPE)
+    for column, _ in OUTCOME_FIELDS:
+        values = np.asarray(columns[column]).astype(np.int64)
+        if column == 'dismissal_kind':
+            values = values - NO_DISMISSAL
+        if (values.min(initial=0) < 0) or (values.max(initial=0) > OUTCOME_MASKS[column]):
+            raise ValueError(f"{column} doesn't fit in the packed ball outcome")
+        words |= (values << OUTCOME_SHIFTS[column]).astype(OUTCOME_DTYPE)
+    return words
+
+
+def unpack_outcomes(words) -> dict:
+    """
+    Returns the outcome columns packed into words by pack_outcomes(), with the dismissal kinds as codes
+    """
+    words = np.asarray(words, dtype=np.int64)
+    columns = {column: (words >> OUTCOME_SHIFTS[column]) & OUTCOME_MASKS[column] for column, _ in OUTCOME_FIELDS}
+    columns['legal_delivery'] = columns['legal_delivery'].astype(bool)
+    columns['dismissal_kind'] += NO_DISMISSAL
+    return columns
+
+
+class KeyIds:
+    """
+    Integer ids of keys, given out in the order the keys are first seen - so the ids of keys already seen never change.
+    """
+
+    def __init__(self, keys=()):
+        """
+        :param keys: The keys already given ids, in id order
+        """
+        self.keys = pd.Index(np.asarray(keys, dtype=object))
+
+    def get_ids(self, keys) -> np.ndarray:
+        """
+        Returns the id of each key, giving new ids to the keys not seen before
+        """
+        keys = np.asarray(keys, dtype=object)
+        ids = self.keys.get_indexer(keys)
+        new = ids < 0
+        if new.any():
+            self.keys = self.keys.append(pd.Index(pd.unique(keys[new])))
+            ids[new] = self.keys.get_indexer(keys[new])
+        return ids.astype(KEY_ID_DTYPE)
+
+    def get_keys(self, ids) -> np.ndarray:
+        """
+        Returns the key of each id
+        """
+        return self.keys.values.astype(object)[np.asarray(ids, dtype=np.int64)]
@@ -0,0 +1,433 @@
+import os
+import glob
+import numpy as np
+import pandas as pd
+
+from simulators.utils.dismissal_kinds import encode_dismissal_kinds, decode_dismissal_kinds
+from simulators.utils.ball_encoding import OUTCOME_DTYPE, KEY_ID_DTYPE, KeyIds, pack_outcomes, unpack_outcomes
+
+# Upper bound used to size the ball log for a match: 2 innings of 20 overs, allowing for 1 extra per over. The log
+# grows if this bound is exceeded.
+DELIVERIES_PER_MATCH_BOUND = 2 * 20 * 7
+
+# Number of balls a ball log which spills to disk holds in memory before writing them out
+SPILL_THRESHOLD = 500000
+
+
+class BallLog:
+    """
+    Columnar record of every ball simulated by the predictive simulator. Columns are preallocated as typed numpy arrays
+    and filled in as balls are bowled, instead of concatenating a dataframe per ball. The log is kept as the record of
+    the simulated innings once the simulation is done, and the balls of a scenario are only converted into the
+    simulated innings dataframe when asked for.
+
+    If a spill directory is specified, the log holds at most spill_threshold balls in memory. Whenever the buffer is
+    full, the buffered balls are written out to a Parquet dataset in the spill directory, partitioned by scenario (see
+    BallLogDataset), and the buffer is reused. The balls are written out in the same compact encoding.
+
+    The balls are held in a compact encoding, and only decoded to the columns of the simulated innings dataframe
+    (COLUMNS) for the balls asked for - see get_balls():
+    - the outcome of a ball (runs, extras, wicket, dismissal kind, runout & extras flags) is packed into one word, see
+    ball_encoding.py
+    - players, teams & venues are held as integer ids of their keys (see KeyIds), given out by the log
+    - the other columns are held in the narrowest integer type their values fit in
+    """
+    INDEX_COLUMNS = ['scenario_number', 'match_key', 'inning', 'over', 'ball']
+
+    COLUMNS = {
+        'scenario_number': np.int64,
+        'match_key': np.int64,
+        'inning': np.int64,
+        'over': np.int64,
+        'ball': np.int64,
+        'venue': object,
+        'bowling_team': object,
+        'batting_team': object,
+        'previous_total': np.int64,
+        'previous_number_of_wickets': np.int64,
+        'bowler': object,
+        'batter': object,
+        'non_striker': object,
+        'target_runs': np.int64,
+        'target_balls': np.int64,
+        'legal_delivery': bool,
+        'batter_runs': np.int64,
+        'extras': np.int64,
+        'is_wicket': np.int64,
+        'dismissal_kind': np.int64,
+        'non_striker_dismissed': np.int64,
+        'player_dismissed': object,
+        'is_direct_runout': np.int64,
+        'noballs': np.int64,
+        'wides': np.int64,
+        'total_runs': np.int64,
+        'fielder': object
+    }
+
+    # Columns held as they are, with the type they are held in
+    STORED_COLUMNS = {
+        'scenario_number': np.int64,
+        'match_key': np.int64,
+        'inning': np.int8,
+        'over': np.int8,
+        'ball': np.int8,
+        'previous_total': np.int16,
+        'previous_number_of_wickets': np.int8,
+        'target_runs': np.int16,
+        'target_balls': np.int16
+    }
+
+    # Columns held as key ids, with the keys they share their ids with
+    KEY_COLUMNS = {
+        'venue': 'venue',
+        'bowling_team': 'team',
+        'batting_team': 'team',
+        'bowler': 'player',
+        'batter': 'player',
+        'non_striker': 'player',
+        'player_dismissed': 'player',
+        'fielder': 'player'
+    }
+
+    OUTCOME_COLUMN = 'outcome'
+
+    def __init__(self, number_of_scenarios, number_of_matches, deliveries_per_match=DELIVERIES_PER_MATCH_BOUND,
+                 spill_directory=None, spill_threshold=SPILL_THRESHOLD):
+        """
+        :param number_of_scenarios: The number of scenarios being simulated
+        :param number_of_matches: The number of matches per scenario
+        :param deliveries_per_match: The expected upper bound on the number of deliveries per match
+        :param spill_directory: If specified, the directory of the Parquet dataset the balls are spilled to
+        :param spill_threshold: The maximum number of balls held in memory when spilling to disk
+        """
+        self.capacity = max(number_of_scenarios * number_of_matches * deliveries_per_match, 1)
+        self.spill_directory = spill_directory
+        if spill_directory is not None:
+            self.capacity = min(self.capacity, spill_threshold)
+        self.number_of_spills = 0
+        self.size = 0
+        self.key_ids = {keys: KeyIds() for keys in set(self.KEY_COLUMNS.values())}
+        # The last key table seen for each kind of key & the ids of its keys, see append_columns()
+        self.key_table_ids = {}
+
+        dtypes = {**self.STORED_COLUMNS, **{column: KEY_ID_DTYPE for column in self.KEY_COLUMNS},
+                  self.OUTCOME_COLUMN: OUTCOME_DTYPE}
+        self.columns = {column: np.empty(self.capacity, dtype=dtype) for column, dtype in dtypes.items()}
+
+    def __len__(self):
+        return self.size
+
+    def reserve(self, number_of_balls):
+        """
+        Makes sure there is space for another number_of_balls, growing the columns geometrically if required
+        """
+        required_capacity = self.size + number_of_balls
+        if required_capacity <= self.capacity:
+            return
+
+        new_capacity = max(2 * self.capacity, required_capacity)
+        for column, values in self.columns.items():
+            new_values = np.empty(new_capacity, dtype=values.dtype)
+            new_values[:self.size] = values[:self.size]
+            self.columns[column] = new_values
+        self.capacity = new_capacity
+
+    def append(self, balls_df: pd.DataFrame):
+        """
+        Records the balls in balls_df. balls_df must contain all the log columns, either as columns or index levels,
+        with the dismissal kinds as labels.
+        """
+        columns = {column: balls_df.index.get_level_values(column) for column in self.INDEX_COLUMNS}
+        for column in self.COLUMNS.keys():
+            if column not in self.INDEX_COLUMNS:
+                columns[column] = balls_df[column].values
+        columns['dismissal_kind'] = encode_dismissal_kinds(columns['dismissal_kind'])
+        self.append_columns(columns)
+
+    def append_columns(self, columns: dict, key_tables=None):
+        """
+        Records the balls in columns - a dict of equal length arrays, one for each of the log columns, with the
+        dismissal kinds as codes
+        :param key_tables: If specified, maps key columns given as positions in an array of keys (rather than as the
+        keys) to that array - e.g. player ids & the player keys. Positions of -1 refer to the last key. The ids of the
+        keys of a table are only worked out again when the table changes, so the tables should be reused across calls.
+        """
+        number_of_balls = len(columns['scenario_number'])
+        if number_of_balls == 0:
+            return
+
+        if (self.spill_directory is not None) and (self.size + number_of_balls > self.capacity):
+            self.spill()
+        self.reserve(number_of_balls)
+        start = self.size
+        end = start + number_of_balls
+        for column in self.STORED_COLUMNS.keys():
+            self.columns[column][start:end] = columns[column]
+        key_tables = {} if key_tables is None else key_tables
+        for column, keys in self.KEY_COLUMNS.items():
+            if column in key_tables:
+                self.columns[column][start:end] = self.get_key_table_ids(keys, key_tables[column])[columns[column]]
+            else:
+                self.columns[column][start:end] = self.key_ids[keys].get_ids(columns[column])
+        self.columns[self.OUTCOME_COLUMN][start:end] = pack_outcomes(columns)
+        self.size = end
+
+    def append_state(self, state: dict):
+        """
+        Records the balls of another log, from its get_state() - e.g. the log of a shard played in a worker process.
+        The key ids of the other log are mapped to the ids of this log.
+        """
+        number_of_balls = len(state['columns'][self.OUTCOME_COLUMN])
+        if number_of_balls == 0:
+            return
+
+        if (self.spill_directory is not None) and (self.size + number_of_balls > self.capacity):
+            self.spill()
+        self.reserve(number_of_balls)
+        start = self.size
+        end = start + number_of_balls
+        ids = {keys: self.key_ids[keys].get_ids(other_keys) for keys, other_keys in state['keys'].items()}
+        for column, values in state['columns'].items():
+            if column in self.KEY_COLUMNS:
+                values = ids[self.KEY_COLUMNS[column]][values]
+            self.columns[column][start:end] = values
+        self.size = end
+
+    def trim(self):
+        """
+        Releases the capacity of the columns beyond the balls logged, once no more balls are going to be logged
+        """
+        self.capacity = max(self.size, 1)
+        self.columns = {column: values[:self.capacity].copy() for column, values in self.columns.items()}
+
+    def get_key_table_ids(self, keys, key_table) -> np.ndarray:
+        """
+        Returns the ids of the keys in key_table, reusing the ids worked out for the last table of the kind of keys
+        """
+        last_key_table, ids = self.key_table_ids.get(keys, (None, None))
+        if last_key_table is not key_table:
+            ids = self.key_ids[keys].get_ids(key_table)
+            self.key_table_ids[keys] = (key_table, ids)
+        return ids
+
+    def get_state(self) -> dict:
+        """
+        Returns the state of the log, for checkpointing. When spilling to disk, the buffered balls are spilled first &
+        the state records how many spills make up the log.
+        """
+        if self.spill_directory is not None:
+            self.spill()
+        return {'columns': {column: values[:self.size].copy() for column, values in self.columns.items()},
+                'keys': {keys: key_ids.keys.copy() for keys, key_ids in self.key_ids.items()},
+                'number_of_spills': self.number_of_spills}
+
+    def set_state(self, state: dict):
+        """
+        Restores the state saved by get_state(). When spilling to disk, spilled files written after the state was
+        saved are removed.
+        """
+        self.size = 0
+        self.number_of_spills = state['number_of_spills']
+        if self.spill_directory is not None:
+            for file in glob.glob(os.path.join(self.spill_directory, "scenario_number=*", "*.parquet")):
+                if BallLogDataset.get_spill_number(file) >= self.number_of_spills:
+                    os.remove(file)
+        self.key_ids = {keys: KeyIds(values) for keys, values in state['keys'].items()}
+        self.key_table_ids = {}
+        number_of_balls = len(state['columns'][self.OUTCOME_COLUMN])
+        self.reserve(number_of_balls)
+        for column, values in state['columns'].items():
+            self.columns[column][:number_of_balls] = values
+        self.size = number_of_balls
+
+    def spill(self):
+        """
+        Writes the buffered balls out to the spill directory, as one Parquet file per scenario, and empties the buffer.
+        The balls are written out in their compact encoding, along with the keys of the ids they use (see
+        BallLogDataset).
+        """
+        if self.size == 0:
+            return
+
+        scenario_numbers = self.columns['scenario_number'][:self.size]
+        rows = np.argsort(scenario_numbers, kind='stable')
+        scenarios, starts = np.unique(scenario_numbers[rows], return_index=True)
+        for scenario_number, scenario_rows in zip(scenarios, np.split(rows, starts[1:])):
+            scenario_directory = BallLogDataset.get_scenario_directory(self.spill_directory, scenario_number)
+            os.makedirs(scenario_directory, exist_ok=True)
+            columns = {column: values[scenario_rows] for column, values in self.columns.items()}
+            pd.DataFrame(columns).to_parquet(
+                BallLogDataset.get_file_path(scenario_directory, 'part', self.number_of_spills), index=False)
+            for keys, key_ids in self.key_ids.items():
+                ids = np.unique(np.concatenate([columns[column] for column, column_keys in self.KEY_COLUMNS.items()
+                                                if column_keys == keys]))
+                pd.DataFrame({'id': ids, 'key': key_ids.get_keys(ids)}).to_parquet(
+                    BallLogDataset.get_file_path(scenario_directory, keys, self.number_of_spills), index=False)
+        self.number_of_spills += 1
+        self.size = 0
+
+    @classmethod
+    def decode_balls(cls, columns: dict, keys: dict) -> pd.DataFrame:
+        """
+        Decodes balls held in the compact encoding of the log into a dataframe with the log COLUMNS (not indexed)
+        :param columns: The encoded columns of the balls
+        :param keys: Maps each kind of key to an array of its keys, indexed by id
+        """
+        outcomes = unpack_outcomes(columns[cls.OUTCOME_COLUMN])
+        balls = {}
+        for column, dtype in cls.COLUMNS.items():
+            if column in cls.STORED_COLUMNS:
+                balls[column] = np.asarray(columns[column]).astype(dtype)
+            elif column in cls.KEY_COLUMNS:
+                balls[column] = keys[cls.KEY_COLUMNS[column]][np.asarray(columns[column], dtype=np.int64)]
+            elif column == 'total_runs':
+                balls[column] = outcomes['batter_runs'] + outcomes['extras']
+            else:
+                balls[column] = outcomes[column].astype(dtype)
+        balls['dismissal_kind'] = decode_dismissal_kinds(balls['dismissal_kind'])
+        return pd.DataFrame(balls)
+
+    def get_balls(self, rows) -> pd.DataFrame:
+        """
+        Decodes the balls at the specified rows of the log (in the order they were logged, since the last spill) into a
+        dataframe with the log COLUMNS (not indexed)
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        return self.decode_balls({column: values[rows] for column, values in self.columns.items()},
+                                 {keys: key_ids.keys.values.astype(object) for keys, key_ids in self.key_ids.items()})
+
+    def get_scenario_rows(self) -> (np.ndarray, np.ndarray, np.ndarray):
+        """
+        Returns the rows of the log grouped by scenario (in the order they were logged within a scenario), along with
+        the scenario numbers logged & the position of the first of their rows (and the end of the last one)
+        """
+        scenario_numbers = self.columns['scenario_number'][:self.size]
+        rows = np.argsort(scenario_numbers, kind='stable')
+        scenarios, starts = np.unique(scenario_numbers[rows], return_index=True)
+        return rows, scenarios, np.append(starts, self.size)
+
+    def get_last_balls(self) -> pd.DataFrame:
+        """
+        Decodes the last ball logged for each match of each scenario, indexed by [scenario_number, match_key]. Only
+        covers the balls held in memory.
+        """
+        rows_df = pd.DataFrame({'scenario_number': self.columns['scenario_number'][:self.size],
+                                'match_key': self.columns['match_key'][:self.size],
+                                'row': np.arange(self.size)})
+        last_rows = rows_df.groupby(['scenario_number', 'match_key'])['row'].max().values
+        return self.get_balls(last_rows).set_index(['scenario_number', 'match_key'])
+
+    def to_dataframe(self, scenario_numbers=None) -> pd.DataFrame:
+        """
+        Converts the balls recorded so far into the simulated innings dataframe, indexed by
+        [scenario_number, match_key, inning, over, ball]. The balls are grouped by scenario, in the order they were
+        logged within a scenario. When spilling to disk, this reads the dataset back - use BallLogDataset to read
+        it one scenario at a time instead.
+        :param scenario_numbers: If specified, only the balls of these scenarios are decoded
+        """
+        if self.spill_directory is not None:
+            self.spill()
+            dataset = BallLogDataset(self.spill_directory)
+            if scenario_numbers is None:
+                innings_df = dataset.read_all()
+            else:
+                scenario_dfs = [dataset.read_scenario(scenario_number)
+                                for scenario_number in np.unique(scenario_numbers)]
+                innings_df = pd.concat(scenario_dfs, ignore_index=True) if len(scenario_dfs) > 0 \
+                    else dataset.read_scenario(0).iloc[0:0]
+        else:
+            logged_scenario_numbers = self.columns['scenario_number'][:self.size]
+            rows = np.arange(self.size)
+            if scenario_numbers is not None:
+                rows = rows[np.isin(logged_scenario_numbers, scenario_numbers)]
+            innings_df = self.get_balls(rows[np.argsort(logged_scenario_numbers[rows], kind='stable')])
+        innings_df.set_index(self.INDEX_COLUMNS, inplace=True)
+        return innings_df
+
+
+class BallLogDataset:
+    """
+    Reads back the balls spilled to disk by a BallLog. The dataset has a directory per scenario
+    (scenario_number=<n>) holding the Parquet files written by each spill, so a scenario can be read on its own
+    without loading the rest of the dataset. The balls of a scenario are returned in the order they were logged.
+
+    Each spill writes the balls of a scenario in the compact encoding of the BallLog (part-<spill>.parquet), along with
+    the keys of the ids used by those balls (<kind of key>-<spill>.parquet). The balls are only decoded when read.
+    """
+
+    def __init__(self, directory):
+        """
+        :param directory: The spill directory of the BallLog
+        """
+        self.directory = directory
+
+    @staticmethod
+    def get_scenario_directory(directory, scenario_number) -> str:
+        """
+        Returns the partition directory of the scenario in the dataset at directory
+        """
+        return os.path.join(directory, f"scenario_number={int(scenario_number)}")
+
+    @staticmethod
+    def get_file_path(scenario_directory, name, spill_number) -> str:
+        """
+        Returns the path of the file of a spill in the partition directory of a scenario - name is 'part' for the
+        balls, or the kind of key for the keys
+        """
+        return os.path.join(scenario_directory, f"{name}-{spill_number:05d}.parquet")
+
+    @staticmethod
+    def get_spill_number(path) -> int:
+        """
+        Returns the number of the spill which wrote the file at path
+        """
+        return int(os.path.basename(path)[:-len(".parquet")].split('-')[-1])
+
+    def get_scenario_numbers(self) -> list:
+        """
+        Returns the sorted list of scenario numbers in the dataset
+        """
+        scenario_directories = glob.glob(os.path.join(self.directory, "scenario_number=*"))
+        return sorted(int(os.path.basename(path).split('=')[1]) for path in scenario_directories)
+
+    @staticmethod
+    def read_keys(path) -> np.ndarray:
+        """
+        Returns the keys written out to path, as an array indexed by id
+        """
+        keys_df = pd.read_parquet(path)
+        keys = np.empty(keys_df['id'].max() + 1 if len(keys_df.index) > 0 else 0, dtype=object)
+        keys[keys_df['id'].values] = keys_df['key'].values
+        return keys
+
+    def read_scenario(self, scenario_number) -> pd.DataFrame:
+        """
+        Returns the balls of the scenario as a dataframe with the BallLog columns (not indexed). Returns an empty
+        dataframe if the scenario has no balls.
+        """
+        scenario_directory = self.get_scenario_directory(self.directory, scenario_number)
+        files = sorted(glob.glob(os.path.join(scenario_directory, "part-*.parquet")))
+        if len(files) == 0:
+            return BallLog.decode_balls({column: np.empty(0, dtype=np.int64)
+                                         for column in [*BallLog.STORED_COLUMNS, *BallLog.KEY_COLUMNS,
+                                                        BallLog.OUTCOME_COLUMN]},
+                                        {keys: np.empty(0, dtype=object) for keys in BallLog.KEY_COLUMNS.values()})
+
+        scenario_dfs = []
+        for file in files:
+            spill_number = self.get_spill_number(file)
+            columns_df = pd.read_parquet(file)
+            keys = {keys: self.read_keys(self.get_file_path(scenario_directory, keys, spill_number))
+                    for keys in set(BallLog.KEY_COLUMNS.values())}
+            scenario_dfs.append(BallLog.decode_balls({column: columns_df[column].values
+                                                      for column in columns_df.columns}, keys))
+        return pd.concat(scenario_dfs, ignore_index=True)
+
+    def read_all(self) -> pd.DataFrame:
+        """
+        Returns the balls of all the scenarios as one dataframe with the BallLog columns (not indexed)
+        """
+        scenario_dfs = [self.read_scenario(scenario_number) for scenario_number in self.get_scenario_numbers()]
+        if len(scenario_dfs) == 0:
+            return self.read_scenario(0)
+        return pd.concat(scenario_dfs, ignore_index=True)
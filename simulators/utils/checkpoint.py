@@ -0,0 +1,41 @@
+import os
+import pickle
+
+CHECKPOINT_FILE_NAME = "checkpoint.pkl"
+
+
+def get_checkpoint_path(checkpoint_directory) -> str:
+    """
+    Returns the path of the checkpoint file in checkpoint_directory
+    """
+    return os.path.join(checkpoint_directory, CHECKPOINT_FILE_NAME)
+
+
+def has_checkpoint(checkpoint_directory) -> bool:
+    """
+    Returns True if checkpoint_directory holds a checkpoint
+    """
+    return (checkpoint_directory is not None) and os.path.exists(get_checkpoint_path(checkpoint_directory))
+
+
+def save_checkpoint(checkpoint_directory, state: dict):
+    """
+    Pickles state into the checkpoint file of checkpoint_directory. The file is written under a temporary name &
+    then renamed, so an interrupted save leaves the previous checkpoint in place.
+    """
+    os.makedirs(checkpoint_directory, exist_ok=True)
+    path = get_checkpoint_path(checkpoint_directory)
+    with open(f"{path}.tmp", 'wb') as buff:
+        pickle.dump(state, buff)
+    os.replace(f"{path}.tmp", path)
+
+
+def load_checkpoint(checkpoint_directory) -> dict:
+    """
+    Loads the state saved in the checkpoint file of checkpoint_directory
+    """
+    path = get_checkpoint_path(checkpoint_directory)
+    if not os.path.exists(path):
+        raise ValueError(f"Couldn't find a checkpoint in {checkpoint_directory}")
+    with open(path, 'rb') as buff:
+        return pickle.load(buff)
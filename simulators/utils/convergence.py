@@ -0,0 +1,109 @@
+import arviz as az
+import numpy as np
+import pandas as pd
+
+# Probability mass of the highest density intervals of the rewards, matching the arviz default
+HDI_PROB = 0.94
+
+
+class RewardsConvergenceTracker:
+    """
+    Tracks the total rewards of a set of players across the scenarios simulated so far, to decide when enough
+    scenarios have been simulated. The estimate of a player's rewards is the running mean & HDI (see arviz.hdi) of their
+    total rewards over the scenarios. It is taken to have converged once the width of the HDI changes by at most the
+    tolerance between two checks (see has_converged()) - i.e. adding scenarios no longer changes the spread of the
+    rewards. The Monte Carlo standard error of the mean is reported alongside.
+    When the scenarios are played in nested groups sharing their first innings, the scenarios of a group are not
+    independent, so the standard error is taken from the spread of the group means over the number of groups instead.
+    """
+
+    def __init__(self, player_keys, tolerance, hdi_prob=HDI_PROB, group_size=1):
+        """
+        :param player_keys: The players whose estimates must converge
+        :param tolerance: The largest acceptable change in the width of the HDI of the total rewards of a player
+        between two checks
+        :param hdi_prob: The probability mass of the HDI
+        :param group_size: The number of consecutive scenarios in each nested group, 1 if the scenarios are independent
+        """
+        self.player_keys = pd.Index(player_keys, name='player_key').unique()
+        self.tolerance = tolerance
+        self.hdi_prob = hdi_prob
+        self.group_size = group_size
+        self.total_rewards = np.empty((0, len(self.player_keys)), dtype=np.float64)
+
+        # The HDI widths at the last check, and how much they changed since the check before
+        self.checked_hdi_widths = None
+        self.hdi_width_changes = np.full(len(self.player_keys), np.nan)
+
+    def add_scenario(self, rewards_df: pd.DataFrame):
+        """
+        Adds the rewards of one scenario - a dataframe indexed by player_key (possibly with other index levels) with a
+        total_rewards column. The rewards of a player are summed across the other levels, and players without any
+        rewards in the scenario get 0.
+        """
+        total_rewards = rewards_df.groupby('player_key')['total_rewards'].sum() \
+            .reindex(self.player_keys, fill_value=0)
+        self.total_rewards = np.vstack([self.total_rewards, total_rewards.values])
+
+    @property
+    def number_of_scenarios(self) -> int:
+        return self.total_rewards.shape[0]
+
+    def get_group_means(self) -> np.ndarray:
+        """
+        Returns the mean total rewards of each group of scenarios, of shape (number of groups, number of players). The
+        last group may not be complete yet.
+        """
+        if self.group_size == 1:
+            return self.total_rewards
+        groups = np.arange(self.number_of_scenarios) // self.group_size
+        group_sizes = np.bincount(groups)
+        group_totals = np.zeros((len(group_sizes), len(self.player_keys)), dtype=np.float64)
+        np.add.at(group_totals, groups, self.total_rewards)
+        return group_totals / group_sizes[:, np.newaxis]
+
+    def get_hdis(self) -> np.ndarray:
+        """
+        Returns the (lower, upper) bounds of the HDI of the total rewards of each player, of shape
+        (number of players, 2)
+        """
+        if self.number_of_scenarios == 0:
+            return np.full((len(self.player_keys), 2), np.nan)
+        return np.array([az.hdi(self.total_rewards[:, i], hdi_prob=self.hdi_prob)
+                         for i in range(len(self.player_keys))]).reshape(-1, 2)
+
+    def get_summary(self) -> pd.DataFrame:
+        """
+        Returns the running estimates per player - indexed by player_key with the columns total_rewards_mean,
+        total_rewards_sd, total_rewards_standard_error, total_rewards_hdi_lower, total_rewards_hdi_upper,
+        total_rewards_hdi_width, total_rewards_hdi_width_change (since the check before last) & converged (as of the
+        last check)
+        """
+        number_of_scenarios = self.number_of_scenarios
+        summary_df = pd.DataFrame(index=self.player_keys)
+        summary_df['total_rewards_mean'] = self.total_rewards.mean(axis=0) if number_of_scenarios > 0 else np.nan
+        summary_df['total_rewards_sd'] = self.total_rewards.std(axis=0, ddof=1) if number_of_scenarios > 1 else np.nan
+        group_means = self.get_group_means()
+        number_of_groups = group_means.shape[0]
+        summary_df['total_rewards_standard_error'] = \
+            (group_means.std(axis=0, ddof=1) if number_of_groups > 1 else np.nan) / np.sqrt(max(number_of_groups, 1))
+        hdis = self.get_hdis()
+        summary_df['total_rewards_hdi_lower'] = hdis[:, 0]
+        summary_df['total_rewards_hdi_upper'] = hdis[:, 1]
+        summary_df['total_rewards_hdi_width'] = summary_df['total_rewards_hdi_upper'] \
+                                                - summary_df['total_rewards_hdi_lower']
+        summary_df['total_rewards_hdi_width_change'] = self.hdi_width_changes
+        summary_df['converged'] = self.hdi_width_changes <= self.tolerance
+        return summary_df
+
+    def has_converged(self) -> bool:
+        """
+        Checks the HDI widths of the players against the last check, and returns True if none of them changed by more
+        than the tolerance - the first check never converges
+        """
+        hdis = self.get_hdis()
+        hdi_widths = hdis[:, 1] - hdis[:, 0]
+        if self.checked_hdi_widths is not None:
+            self.hdi_width_changes = np.abs(hdi_widths - self.checked_hdi_widths)
+        self.checked_hdi_widths = hdi_widths
+        return bool((self.hdi_width_changes <= self.tolerance).all())
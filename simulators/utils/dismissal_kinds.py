@@ -0,0 +1,54 @@
+import numpy as np
+
+# Dismissal kinds which can happen on a legal & non-legal delivery respectively
+LEGAL_WICKET_TYPES = ["caught", "bowled", "run out", "lbw", "caught and bowled", "stumped", "others"]
+NON_LEGAL_WICKET_TYPES = ["stumped", "run out"]
+
+# Dismissal kinds are coded by their position in the legal wicket types followed by the non-legal wicket types, so a
+# code also tells which distribution the dismissal kind was drawn from. Deliveries without a dismissal have the code
+# NO_DISMISSAL, which is labelled 'nan' like in the historical data.
+DISMISSAL_KINDS = LEGAL_WICKET_TYPES + NON_LEGAL_WICKET_TYPES
+NON_LEGAL_DISMISSAL_OFFSET = len(LEGAL_WICKET_TYPES)
+NO_DISMISSAL = -1
+DISMISSAL_KIND_LABELS = np.asarray(DISMISSAL_KINDS + ['nan'], dtype=object)
+
+# Dismissal kinds which involve a fielder from the bowling team
+FIELDING_DISMISSAL_KINDS = ['run out', 'caught', 'stumped']
+
+IS_RUN_OUT = np.asarray(DISMISSAL_KINDS) == 'run out'
+NEEDS_FIELDER = np.isin(DISMISSAL_KINDS, FIELDING_DISMISSAL_KINDS)
+
+
+def decode_dismissal_kinds(codes) -> np.ndarray:
+    """
+    Returns the dismissal kind label of each code, 'nan' for NO_DISMISSAL
+    """
+    return DISMISSAL_KIND_LABELS[np.asarray(codes, dtype=np.int64)]
+
+
+def encode_dismissal_kinds(labels) -> np.ndarray:
+    """
+    Returns the code of each dismissal kind label, NO_DISMISSAL for 'nan'. Labels which are both legal & non-legal
+    dismissal kinds get the legal code.
+    """
+    labels = np.asarray(labels, dtype=object)
+    codes = np.full(len(labels), NO_DISMISSAL, dtype=np.int64)
+    for code in reversed(range(len(DISMISSAL_KINDS))):
+        codes[labels == DISMISSAL_KINDS[code]] = code
+    return codes
+
+
+def is_run_out(codes) -> np.ndarray:
+    """
+    Returns True for the codes of run outs
+    """
+    codes = np.asarray(codes, dtype=np.int64)
+    return (codes != NO_DISMISSAL) & IS_RUN_OUT[codes]
+
+
+def needs_fielder(codes) -> np.ndarray:
+    """
+    Returns True for the codes of dismissal kinds which involve a fielder
+    """
+    codes = np.asarray(codes, dtype=np.int64)
+    return (codes != NO_DISMISSAL) & NEEDS_FIELDER[codes]
@@ -0,0 +1,366 @@
+import logging
+
+import numpy as np
+
+from simulators.utils.predictive_utils import LEGAL_DELIVERY_UNIFORM, WICKET_UNIFORM, WICKET_TYPE_UNIFORM, \
+    WICKET_SINGLE_UNIFORM, DIRECT_RUNOUT_UNIFORM, NON_STRIKER_DISMISSED_UNIFORM, BATTER_RUNS_UNIFORM, \
+    EXTRAS_UNIFORM, NON_LEGAL_DELIVERY_TYPE_UNIFORM, FIELDER_UNIFORM
+from simulators.utils.dismissal_kinds import NON_LEGAL_DISMISSAL_OFFSET, IS_RUN_OUT, NEEDS_FIELDER, is_run_out
+from simulators.utils.scorecard import BATTING_SIDE, BOWLING_SIDE
+
+# numba is optional - without it the kernel runs as plain python, which gives the same results but is much slower
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda function: function
+
+# Integer columns of the per-block delivery record written by the kernel, in order
+DELIVERY_RECORD_COLUMNS = ['inning', 'over', 'ball', 'previous_total', 'previous_number_of_wickets', 'bowler',
+                           'batter', 'non_striker', 'target_runs', 'target_balls', 'legal_delivery', 'batter_runs',
+                           'extras', 'is_wicket', 'dismissal_kind', 'non_striker_dismissed', 'player_dismissed',
+                           'is_direct_runout', 'noballs', 'wides', 'fielder']
+(INNING, OVER, BALL, PREVIOUS_TOTAL, PREVIOUS_NUMBER_OF_WICKETS, BOWLER, BATTER, NON_STRIKER, TARGET_RUNS,
+ TARGET_BALLS, LEGAL_DELIVERY, BATTER_RUNS, EXTRAS, IS_WICKET, DISMISSAL_KIND, NON_STRIKER_DISMISSED,
+ PLAYER_DISMISSED, IS_DIRECT_RUNOUT, NOBALLS, WIDES, FIELDER) = range(len(DELIVERY_RECORD_COLUMNS))
+
+# Order of the cumulative probability tables passed to the kernel
+(LEGAL_DELIVERY_TABLE, BATTER_RUNS_TABLE, EXTRAS_IF_LEGAL_NO_RUN_TABLE, LEGAL_WICKETS_TABLE, LEGAL_WICKET_TYPES_TABLE,
+ LEGAL_WICKET_SINGLE_TABLE, DIRECT_RUN_OUT_TABLE, NON_STRIKER_DISMISSED_TABLE, NON_LEGAL_DELIVERIES_TABLE,
+ NON_LEGAL_EXTRAS_TABLE, NON_LEGAL_BATTER_RUNS_TABLE, NON_LEGAL_WICKETS_TABLE, NON_LEGAL_WICKET_TYPES_TABLE,
+ NON_LEGAL_WICKET_SINGLE_TABLE, NON_LEGAL_WICKET_EXTRAS_TABLE) = range(15)
+
+
+class InningsKernel:
+    """
+    Plays whole innings of the matches in a MatchStateStore with a compiled (numba) kernel, for the statistical model
+    (use_inferential_model = False). The kernel loops over matches & deliveries on integer state - player ids, category
+    codes & cumulative probability tables, looked up by the bucket of the outcome tables of each delivery - and
+    decodes the deliveries back to keys once per block of deliveries.
+    It consumes the same per-delivery uniforms & bowling plans as the numpy engine in PredictiveSimulator, so for a
+    given seed both engines produce the same innings.
+    """
+
+    def __init__(self, predictive_utils):
+        """
+        :param predictive_utils: The PredictiveUtils instance holding the outcome distributions & player ids
+        """
+        self.predictive_utils = predictive_utils
+
+        samplers = [predictive_utils.legal_delivery_distribution,
+                    predictive_utils.batter_runs_distribution,
+                    predictive_utils.extras_if_legal_no_run_distribution,
+                    predictive_utils.legal_wickets_distribution,
+                    predictive_utils.legal_wicket_types_distribution,
+                    predictive_utils.legal_wicket_single_distribution,
+                    predictive_utils.direct_run_out_probability,
+                    predictive_utils.non_striker_dismissed_on_runout,
+                    predictive_utils.non_legal_deliveries_distribution,
+                    predictive_utils.non_legal_extras_distribution,
+                    predictive_utils.non_legal_batter_runs_distribution,
+                    predictive_utils.non_legal_wickets_distribution,
+                    predictive_utils.non_legal_wicket_types_distribution,
+                    predictive_utils.non_legal_wicket_single_distribution,
+                    predictive_utils.non_legal_wicket_extras_distribution]
+
+        # Pack the cumulative tables into one padded 3-d array of [table, bucket, category], padding with 1s so that
+        # they are never drawn - the fixed distributions have the same table for every bucket
+        self.table_sizes = np.array([sampler.number_of_categories for sampler in samplers], dtype=np.int64)
+        number_of_buckets = max(len(sampler.cumulative_probabilities) if sampler.is_bucketed else 1
+                                for sampler in samplers)
+        self.tables = np.ones((len(samplers), number_of_buckets, self.table_sizes.max()), dtype=np.float64)
+        for i, sampler in enumerate(samplers):
+            self.tables[i, :, :sampler.number_of_categories] = sampler.cumulative_probabilities
+        self.over_wickets_buckets = predictive_utils.get_over_wickets_buckets()
+
+        # Dismissal kinds are coded as in dismissal_kinds.py, the kernel records -1 (NO_DISMISSAL) when there is none
+        self.non_legal_dismissal_offset = NON_LEGAL_DISMISSAL_OFFSET
+        self.is_run_out = IS_RUN_OUT
+        self.needs_fielder = NEEDS_FIELDER
+
+    def play_matches(self, match_state_store, ball_log, first_block=0, on_block=None):
+        """
+        Plays all the matches in match_state_store to completion, recording every delivery in ball_log
+        :param first_block: The delivery block to start from - all the deliveries of the earlier blocks must have been
+        played already
+        :param on_block: If specified, called with the block number after each block of deliveries is played
+        """
+        store = match_state_store
+        delivery_uniforms = store.delivery_uniforms
+        block_size = delivery_uniforms.block_size
+        block_number = first_block
+        logging.debug(f"Playing {store.size} matches with the innings kernel (numba available: {NUMBA_AVAILABLE})")
+
+        while not store.match_complete.all():
+            uniforms = delivery_uniforms.get_block(block_number)
+            inning_before = store.inning.copy()
+            record = np.zeros((len(DELIVERY_RECORD_COLUMNS), block_size, store.size), dtype=np.int64)
+            played = np.zeros((block_size, store.size), dtype=np.bool_)
+
+            play_block(uniforms, block_number * block_size, self.tables, self.table_sizes, store.venue_offsets,
+                       self.over_wickets_buckets, self.non_legal_dismissal_offset, self.is_run_out, self.needs_fielder,
+                       store.batting_playing_xi_ids, store.bowling_playing_xi_ids,
+                       store.batting_playing_xi_size, store.bowling_playing_xi_size, store.bowling_plans,
+                       store.inning, store.target_runs, store.target_balls, store.over, store.ball,
+                       store.legal_deliveries_in_over, store.deliveries_bowled, store.previous_total,
+                       store.previous_num_wickets, store.batter, store.non_striker, store.bowler,
+                       store.batting_position, store.bowling_order, store.previous_non_legal_delivery,
+                       store.match_complete, store.first_innings_complete, record, played)
+
+            # The kernel swaps the playing xi ids of matches which moved on to the 2nd innings - swap the team keys too
+            swapped = np.flatnonzero(store.inning != inning_before)
+            store.batting_team[swapped], store.bowling_team[swapped] = \
+                store.bowling_team[swapped], store.batting_team[swapped]
+            store.batting_playing_xi[swapped], store.bowling_playing_xi[swapped] = \
+                store.bowling_playing_xi[swapped], store.batting_playing_xi[swapped]
+
+            self.record_deliveries(store, record, played, ball_log)
+            if on_block is not None:
+                on_block(block_number)
+            block_number += 1
+
+    def record_deliveries(self, store, record, played, ball_log):
+        """
+        Appends the deliveries played in a block to the ball log, in the order the numpy engine records them - delivery
+        by delivery, and by match position within each delivery. The players, teams & venues are handed over to the ball
+        log as ids, see MatchStateStore.get_ball_log_key_tables().
+        """
+        steps, positions = np.nonzero(played)
+        if len(positions) == 0:
+            return
+        values = record[:, steps, positions]
+        inning = values[INNING]
+        # The store holds the playing xi of the current innings of each match - they are the other way round for
+        # deliveries of the 1st innings of matches which are now in the 2nd innings
+        current_innings = inning == store.inning[positions]
+
+        columns = {
+            'scenario_number': store.scenario_number[positions],
+            'match_key': store.match_key[positions],
+            'inning': inning,
+            'over': values[OVER],
+            'ball': values[BALL],
+            'venue': positions,
+            'bowling_team': store.get_team_ids(positions, inning, BOWLING_SIDE),
+            'batting_team': store.get_team_ids(positions, inning, BATTING_SIDE),
+            'previous_total': values[PREVIOUS_TOTAL],
+            'previous_number_of_wickets': values[PREVIOUS_NUMBER_OF_WICKETS],
+            'bowler': values[BOWLER],
+            'batter': values[BATTER],
+            'non_striker': values[NON_STRIKER],
+            'target_runs': values[TARGET_RUNS],
+            'target_balls': values[TARGET_BALLS],
+            'legal_delivery': values[LEGAL_DELIVERY].astype(bool),
+            'batter_runs': values[BATTER_RUNS],
+            'extras': values[EXTRAS],
+            'is_wicket': values[IS_WICKET],
+            'dismissal_kind': values[DISMISSAL_KIND],
+            'non_striker_dismissed': values[NON_STRIKER_DISMISSED],
+            'player_dismissed': values[PLAYER_DISMISSED],
+            'is_direct_runout': values[IS_DIRECT_RUNOUT],
+            'noballs': values[NOBALLS],
+            'wides': values[WIDES],
+            'total_runs': values[BATTER_RUNS] + values[EXTRAS],
+            'fielder': values[FIELDER]
+        }
+        ball_log.append_columns(columns, store.get_ball_log_key_tables())
+
+        # The kernel records player ids - add the deliveries to the player totals by playing xi position
+        batting_playing_xi_ids = np.where(current_innings[:, None], store.batting_playing_xi_ids[positions],
+                                          store.bowling_playing_xi_ids[positions])
+        bowling_playing_xi_ids = np.where(current_innings[:, None], store.bowling_playing_xi_ids[positions],
+                                          store.batting_playing_xi_ids[positions])
+        store.scorecard.add_deliveries(positions, inning,
+                                       get_playing_xi_positions(batting_playing_xi_ids, values[BATTER]),
+                                       get_playing_xi_positions(batting_playing_xi_ids, values[NON_STRIKER]),
+                                       get_playing_xi_positions(bowling_playing_xi_ids, values[BOWLER]),
+                                       get_playing_xi_positions(bowling_playing_xi_ids, values[FIELDER]),
+                                       values[BATTER_RUNS], columns['total_runs'], values[IS_WICKET],
+                                       is_run_out(values[DISMISSAL_KIND]).astype(np.int64))
+
+
+def get_playing_xi_positions(playing_xi_ids, player_ids) -> np.ndarray:
+    """
+    Returns the position of each player id in the corresponding row of playing_xi_ids, -1 for ids < 0
+    """
+    return np.where(player_ids >= 0, (playing_xi_ids == player_ids[:, None]).argmax(axis=1), -1)
+
+
+@njit(cache=True)
+def sample(tables, table_sizes, table, bucket, uniform):
+    """
+    Draws the category code of uniform from the cumulative table of the bucket - the same as CategoricalSampler.sample()
+    """
+    code = 0
+    while code < table_sizes[table] - 1 and tables[table, bucket, code] <= uniform:
+        code += 1
+    return code
+
+
+@njit(cache=True)
+def play_block(uniforms, first_delivery, tables, table_sizes, venue_offsets, over_wickets_buckets,
+               non_legal_dismissal_offset, is_run_out, needs_fielder,
+               batting_ids, bowling_ids, batting_size, bowling_size, bowling_plans,
+               inning, target_runs, target_balls, over, ball, legal_deliveries_in_over, deliveries_bowled,
+               previous_total, previous_num_wickets, batter, non_striker, bowler, batting_position, bowling_order,
+               previous_non_legal_delivery, match_complete, first_innings_complete, record, played):
+    """
+    Plays the deliveries [first_delivery, first_delivery + block size) of every match which is still being played,
+    updating the state arrays of the store in place. Each delivery played is written to record[:, step, match] &
+    flagged in played[step, match]. Mirrors MatchStateStore.advance_innings(), bowl_next_delivery() &
+    apply_outcomes() and PredictiveUtils.predict_ball_by_ball_outcome() for a single match.
+    """
+    number_of_matches, block_size, _ = uniforms.shape
+    for m in range(number_of_matches):
+        for step in range(block_size):
+            if match_complete[m]:
+                break
+            # Deliveries are numbered across the whole match - a match only reaches here at its next delivery
+            if deliveries_bowled[m] != first_delivery + step:
+                break
+
+            # Move on to the 2nd innings, or complete the match, once the innings is over
+            overs_bowled = (over[m] == 19) and (legal_deliveries_in_over[m] == 6)
+            if inning[m] == 1 and (overs_bowled or first_innings_complete[m]):
+                inning[m] = 2
+                target_runs[m] = previous_total[m] + 1
+                target_balls[m] = 20 * 6
+                for i in range(batting_ids.shape[1]):
+                    batting_ids[m, i], bowling_ids[m, i] = bowling_ids[m, i], batting_ids[m, i]
+                batting_size[m], bowling_size[m] = bowling_size[m], batting_size[m]
+                over[m] = -1
+                ball[m] = 1
+                legal_deliveries_in_over[m] = 0
+                previous_total[m] = 0
+                previous_num_wickets[m] = 0
+                batter[m] = 1
+                non_striker[m] = 0
+                bowler[m] = -1
+                batting_position[m] = 2
+                previous_non_legal_delivery[m] = False
+                for i in range(20):
+                    bowling_order[m, i] = bowling_plans[m, 1, i]
+            elif inning[m] == 2 and overs_bowled:
+                match_complete[m] = True
+                break
+
+            # Bowl the next delivery
+            if over[m] == -1 or legal_deliveries_in_over[m] == 6:
+                over[m] += 1
+                ball[m] = 1
+                legal_deliveries_in_over[m] = 0
+                bowler[m] = bowling_order[m, over[m]]
+                batter[m], non_striker[m] = non_striker[m], batter[m]
+            else:
+                ball[m] += 1
+            deliveries_bowled[m] += 1
+
+            u = uniforms[m, step]
+            record[INNING, step, m] = inning[m]
+            record[OVER, step, m] = over[m]
+            record[BALL, step, m] = ball[m]
+            record[PREVIOUS_TOTAL, step, m] = previous_total[m]
+            record[PREVIOUS_NUMBER_OF_WICKETS, step, m] = previous_num_wickets[m]
+            record[BOWLER, step, m] = bowling_ids[m, bowler[m]]
+            record[BATTER, step, m] = batting_ids[m, batter[m]]
+            record[NON_STRIKER, step, m] = batting_ids[m, non_striker[m]]
+            record[TARGET_RUNS, step, m] = target_runs[m]
+            record[TARGET_BALLS, step, m] = target_balls[m]
+            played[step, m] = True
+            bucket = venue_offsets[m] + over_wickets_buckets[over[m], previous_num_wickets[m]]
+
+            # Predict the outcome of the delivery
+            legal_delivery = sample(tables, table_sizes, LEGAL_DELIVERY_TABLE, bucket, u[LEGAL_DELIVERY_UNIFORM]) == 1
+            batter_runs = 0
+            extras = 0
+            is_wicket = 0
+            dismissal_kind = -1
+            non_striker_dismissed = 0
+            is_direct_runout = 0
+            noballs = 0
+            wides = 0
+            if legal_delivery:
+                is_wicket = sample(tables, table_sizes, LEGAL_WICKETS_TABLE, bucket, u[WICKET_UNIFORM])
+                if is_wicket == 1:
+                    dismissal_kind = sample(tables, table_sizes, LEGAL_WICKET_TYPES_TABLE, bucket,
+                                            u[WICKET_TYPE_UNIFORM])
+                    batter_runs = sample(tables, table_sizes, LEGAL_WICKET_SINGLE_TABLE, bucket,
+                                         u[WICKET_SINGLE_UNIFORM])
+                else:
+                    batter_runs = sample(tables, table_sizes, BATTER_RUNS_TABLE, bucket, u[BATTER_RUNS_UNIFORM])
+                    if batter_runs == 0:
+                        extras = sample(tables, table_sizes, EXTRAS_IF_LEGAL_NO_RUN_TABLE, bucket, u[EXTRAS_UNIFORM])
+            else:
+                code = sample(tables, table_sizes, NON_LEGAL_DELIVERIES_TABLE, bucket,
+                              u[NON_LEGAL_DELIVERY_TYPE_UNIFORM])
+                wides = 1 if code == 0 else 0
+                noballs = 1 if code == 1 else 0
+                is_wicket = sample(tables, table_sizes, NON_LEGAL_WICKETS_TABLE, bucket, u[WICKET_UNIFORM])
+                if is_wicket == 1:
+                    dismissal_kind = non_legal_dismissal_offset + \
+                        sample(tables, table_sizes, NON_LEGAL_WICKET_TYPES_TABLE, bucket, u[WICKET_TYPE_UNIFORM])
+                    batter_runs = sample(tables, table_sizes, NON_LEGAL_WICKET_SINGLE_TABLE, bucket,
+                                         u[WICKET_SINGLE_UNIFORM])
+                    extras = sample(tables, table_sizes, NON_LEGAL_WICKET_EXTRAS_TABLE, bucket, u[EXTRAS_UNIFORM])
+                else:
+                    extras = sample(tables, table_sizes, NON_LEGAL_EXTRAS_TABLE, bucket, u[EXTRAS_UNIFORM])
+                    batter_runs = sample(tables, table_sizes, NON_LEGAL_BATTER_RUNS_TABLE, bucket,
+                                         u[BATTER_RUNS_UNIFORM])
+
+            player_dismissed = -1
+            fielder = -1
+            if is_wicket == 1:
+                player_dismissed = batting_ids[m, batter[m]]
+                if is_run_out[dismissal_kind]:
+                    is_direct_runout = sample(tables, table_sizes, DIRECT_RUN_OUT_TABLE, bucket,
+                                              u[DIRECT_RUNOUT_UNIFORM])
+                    non_striker_dismissed = sample(tables, table_sizes, NON_STRIKER_DISMISSED_TABLE, bucket,
+                                                   u[NON_STRIKER_DISMISSED_UNIFORM])
+                    if non_striker_dismissed == 1:
+                        player_dismissed = batting_ids[m, non_striker[m]]
+
+            record[LEGAL_DELIVERY, step, m] = 1 if legal_delivery else 0
+            record[BATTER_RUNS, step, m] = batter_runs
+            record[EXTRAS, step, m] = extras
+            record[IS_WICKET, step, m] = is_wicket
+            record[DISMISSAL_KIND, step, m] = dismissal_kind
+            record[NON_STRIKER_DISMISSED, step, m] = non_striker_dismissed
+            record[PLAYER_DISMISSED, step, m] = player_dismissed
+            record[IS_DIRECT_RUNOUT, step, m] = is_direct_runout
+            record[NOBALLS, step, m] = noballs
+            record[WIDES, step, m] = wides
+
+            # Apply the outcome to the match state
+            previous_num_wickets[m] += is_wicket
+            if is_wicket == 1:
+                if needs_fielder[dismissal_kind]:
+                    fielder_index = int(u[FIELDER_UNIFORM] * (bowling_size[m] - 1))
+                    if fielder_index >= bowler[m]:
+                        fielder_index += 1
+                    fielder = bowling_ids[m, fielder_index]
+                if previous_num_wickets[m] < 10:
+                    if non_striker_dismissed == 1:
+                        non_striker[m] = batting_position[m]
+                    else:
+                        batter[m] = batting_position[m]
+                    batting_position[m] += 1
+            record[FIELDER, step, m] = fielder
+
+            if batter_runs == 1 or batter_runs == 3 or batter_runs == 5:
+                batter[m], non_striker[m] = non_striker[m], batter[m]
+
+            previous_total[m] += batter_runs + extras
+            previous_non_legal_delivery[m] = not legal_delivery
+            if legal_delivery:
+                legal_deliveries_in_over[m] += 1
+
+            if inning[m] == 2:
+                if previous_total[m] >= target_runs[m] or previous_num_wickets[m] == 10:
+                    match_complete[m] = True
+            elif previous_num_wickets[m] == 10:
+                first_innings_complete[m] = True
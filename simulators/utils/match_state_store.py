@@ -0,0 +1,512 @@
+import numpy as np
+import pandas as pd
+
+from simulators.utils.predictive_match_state import MatchState
+from simulators.utils.predictive_utils import UNIFORMS_PER_BALL
+from simulators.utils.random_streams import ScenarioRandomStreams, DeliveryUniforms, BOWLING_STREAM
+from simulators.utils.dismissal_kinds import FIELDING_DISMISSAL_KINDS, needs_fielder, is_run_out
+from simulators.utils.scorecard import ScorecardAccumulator, BATTING_SIDE, BOWLING_SIDE
+
+
+# The state a match waiting for a shared first innings takes on from the match which played it (see
+# MatchStateStore.start_shared_second_innings())
+SHARED_FIRST_INNINGS_STATE = ['batting_team', 'bowling_team', 'batting_playing_xi_ids', 'batting_playing_xi_size',
+                              'bowling_playing_xi_ids', 'bowling_playing_xi_size', 'batting_playing_xi',
+                              'bowling_playing_xi', 'inning', 'target_runs', 'target_balls', 'over', 'ball',
+                              'legal_deliveries_in_over', 'deliveries_bowled', 'previous_total', 'previous_num_wickets',
+                              'batter', 'non_striker', 'bowler', 'batting_position', 'previous_non_legal_delivery',
+                              'match_complete', 'first_innings_complete']
+
+
+class MatchStateStore:
+    """
+    Struct-of-arrays representation of the match state for every (scenario, match) being simulated. Each match is a
+    row position in a set of parallel numpy arrays which are advanced in place, ball by ball. This replaces keeping one
+    MatchState object per (scenario, match) - use get_match_state() to get a MatchState view of a row for debugging.
+    """
+
+    def __init__(self, predictive_utils, simulated_matches_df, playing_xi_index, random_streams=None):
+        """
+        :param predictive_utils: The PredictiveUtils instance used to set up the bowling order & map player ids
+        :param simulated_matches_df: The matches to simulate, indexed by [scenario_number, match_key], with the
+        batting_team, bowling_team & venue columns populated
+        :param playing_xi_index: The PlayingXiIndex used to look up the playing xi of both teams in each match
+        :param random_streams: The ScenarioRandomStreams which all the random draws for a match are made from. A fresh
+        unseeded instance is used if not specified.
+        """
+        self.predictive_utils = predictive_utils
+        self.random_streams = ScenarioRandomStreams() if random_streams is None else random_streams
+        self.size = len(simulated_matches_df.index)
+
+        self.index = simulated_matches_df.index
+        self.scenario_number = simulated_matches_df.index.get_level_values('scenario_number').values
+        self.match_key = simulated_matches_df.index.get_level_values('match_key').values
+        self.venue = simulated_matches_df['venue'].values.astype(object)
+        self.batting_team = simulated_matches_df['batting_team'].values.astype(object)
+        self.bowling_team = simulated_matches_df['bowling_team'].values.astype(object)
+
+        # The playing xi of both teams as player ids (padded with -1) & player keys (padded with ''). Players are
+        # referred to by their position in the playing xi everywhere else in the store.
+        self.batting_playing_xi_ids, self.batting_playing_xi_size = \
+            playing_xi_index.get_playing_xi(self.match_key, self.batting_team)
+        self.bowling_playing_xi_ids, self.bowling_playing_xi_size = \
+            playing_xi_index.get_playing_xi(self.match_key, self.bowling_team)
+        self.batting_playing_xi = predictive_utils.get_player_keys(self.batting_playing_xi_ids)
+        self.bowling_playing_xi = predictive_utils.get_player_keys(self.bowling_playing_xi_ids)
+
+        # The first bucket of the venue of each match in the outcome probability tables
+        self.venue_offsets = predictive_utils.get_venue_offsets(self.venue)
+
+        # Running player totals of the deliveries applied to the store, for the player outcomes table
+        self.scorecard = ScorecardAccumulator(self.scenario_number, self.match_key, self.batting_team,
+                                              self.bowling_team, self.batting_playing_xi, self.bowling_playing_xi)
+
+        # The key tables of the players & teams, which the engines log as ids - see get_ball_log_key_tables(). Player
+        # ids index the player keys, with the 'nan' of an id of -1 last, and teams are logged by their position in the
+        # teams of each [match position, inning - 1, side] of the scorecard.
+        self.player_key_table = np.append(predictive_utils.player_keys.values.astype(object), 'nan')
+        self.team_key_table = self.scorecard.teams.reshape(-1)
+
+        self.inning = np.ones(self.size, dtype=np.int64)
+        self.target_runs = np.full(self.size, -1, dtype=np.int64)
+        self.target_balls = np.full(self.size, -1, dtype=np.int64)
+
+        self.over = np.zeros(self.size, dtype=np.int64)
+        self.ball = np.zeros(self.size, dtype=np.int64)
+        # Each match advances by its own delivery counters - legal deliveries bowled in the current over (6 ends the
+        # over) & deliveries bowled in the match so far
+        self.legal_deliveries_in_over = np.zeros(self.size, dtype=np.int64)
+        self.deliveries_bowled = np.zeros(self.size, dtype=np.int64)
+        self.previous_total = np.zeros(self.size, dtype=np.int64)
+        self.previous_num_wickets = np.zeros(self.size, dtype=np.int64)
+        self.batter = np.zeros(self.size, dtype=np.int64)
+        self.non_striker = np.zeros(self.size, dtype=np.int64)
+        self.bowler = np.zeros(self.size, dtype=np.int64)
+        self.batting_position = np.zeros(self.size, dtype=np.int64)
+        self.bowling_order = np.zeros((self.size, 20), dtype=np.int64)
+        self.previous_non_legal_delivery = np.zeros(self.size, dtype=bool)
+
+        self.match_complete = np.zeros(self.size, dtype=bool)
+        self.first_innings_complete = np.zeros(self.size, dtype=bool)
+
+        # In nested mode, the matches of a nested group of scenarios share the first innings played by the match of the
+        # first scenario of the group present in the store. The other matches wait until that first innings is over &
+        # then start their own 2nd innings from its state.
+        group_numbers = pd.DataFrame({'group': self.scenario_number // self.random_streams.nested_group_size,
+                                      'match_key': self.match_key}).groupby(['group', 'match_key'], sort=False).ngroup()
+        _, first_positions = np.unique(group_numbers.values, return_index=True)
+        self.first_innings_source = first_positions[group_numbers.values] if self.size > 0 \
+            else np.zeros(0, dtype=np.int64)
+        self.waiting_for_first_innings = self.first_innings_source != np.arange(self.size)
+
+        # The bowling plans of both innings are decided up front, from the bowling stream of each scenario - the team
+        # bowling in the 2nd innings is the one batting in the 1st
+        uniforms = self.random_streams.random(self.scenario_number, (2, 20), stream=BOWLING_STREAM)
+        self.bowling_plans = np.zeros((self.size, 2, 20), dtype=np.int64)
+        if self.size > 0:
+            self.bowling_plans[:, 0] = predictive_utils.generate_bowling_plans(
+                self.bowling_playing_xi_ids, self.bowling_playing_xi_size, uniforms[:, 0])
+            self.bowling_plans[:, 1] = predictive_utils.generate_bowling_plans(
+                self.batting_playing_xi_ids, self.batting_playing_xi_size, uniforms[:, 1])
+
+        # The uniforms used for each delivery, drawn from the delivery stream of each scenario
+        self.delivery_uniforms = DeliveryUniforms(self.random_streams, self.scenario_number, UNIFORMS_PER_BALL)
+
+        self.initialise_for_innings()
+
+        # Lookup from (scenario_number, match_key) to the row position in the store
+        self.position_index = pd.MultiIndex.from_arrays([self.scenario_number, self.match_key])
+
+    def get_state(self) -> dict:
+        """
+        Returns the state arrays of the store (including the delivery uniforms drawn so far), for checkpointing
+        """
+        state = {name: value.copy() for name, value in vars(self).items() if isinstance(value, np.ndarray)}
+        state['delivery_uniforms'] = {'block_number': self.delivery_uniforms.block_number,
+                                      'block': self.delivery_uniforms.block.copy()}
+        state['scorecard'] = self.scorecard.get_state()
+        return state
+
+    def set_state(self, state: dict):
+        """
+        Restores the state arrays saved by get_state(). The store must have been set up for the same matches.
+        """
+        for name, value in state.items():
+            if name == 'delivery_uniforms':
+                self.delivery_uniforms.block_number = value['block_number']
+                self.delivery_uniforms.block = value['block']
+            elif name == 'scorecard':
+                self.scorecard.set_state(value)
+            else:
+                setattr(self, name, value)
+
+    def get_all_positions(self, positions=None) -> np.ndarray:
+        """
+        Returns the specified positions as an array, or the positions of all the matches if positions is None
+        """
+        if positions is None:
+            return np.arange(self.size)
+        return np.asarray(positions)
+
+    def initialise_for_innings(self, positions=None):
+        """
+        Reset the per-innings state of all the matches (or the ones at the specified positions) & set up the bowling
+        order for the new innings
+        """
+        positions = self.get_all_positions(positions)
+        self.over[positions] = -1
+        self.ball[positions] = 1
+        self.legal_deliveries_in_over[positions] = 0
+        self.previous_total[positions] = 0
+        self.previous_num_wickets[positions] = 0
+        self.batter[positions] = 1
+        self.non_striker[positions] = 0
+        self.bowler[positions] = -1
+        self.batting_position[positions] = 2
+        self.previous_non_legal_delivery[positions] = False
+        self.setup_bowler_per_over(positions)
+
+    def setup_bowler_per_over(self, positions=None):
+        """
+        Set up the bowling order for the whole innings from the bowling plan of the innings, for all the matches (or the
+        ones at the specified positions)
+        """
+        positions = self.get_all_positions(positions)
+        self.bowling_order[positions] = self.bowling_plans[positions, self.inning[positions] - 1]
+
+    def set_innings(self, inning, positions=None):
+        """
+        Switch all the matches (or the ones at the specified positions) from innings 1 to 2
+        """
+        positions = self.get_all_positions(positions)
+        positions = positions[self.inning[positions] != inning]
+        if len(positions) == 0:
+            return
+
+        self.inning[positions] = inning
+
+        # Set target details for the 2nd innings
+        self.target_runs[positions] = self.previous_total[positions] + 1
+        self.target_balls[positions] = 20 * 6
+
+        # Swap the batting & bowling teams
+        self.batting_team[positions], self.bowling_team[positions] = \
+            self.bowling_team[positions], self.batting_team[positions]
+        self.batting_playing_xi[positions], self.bowling_playing_xi[positions] = \
+            self.bowling_playing_xi[positions], self.batting_playing_xi[positions]
+        self.batting_playing_xi_size[positions], self.bowling_playing_xi_size[positions] = \
+            self.bowling_playing_xi_size[positions], self.batting_playing_xi_size[positions]
+        self.batting_playing_xi_ids[positions], self.bowling_playing_xi_ids[positions] = \
+            self.bowling_playing_xi_ids[positions], self.batting_playing_xi_ids[positions]
+
+        self.initialise_for_innings(positions)
+
+    def change_over(self, positions=None):
+        """
+        Step up the over number, pick the bowler for the over, swap the batter & non-striker and set ball count = 1,
+        for all the matches or the ones at the specified positions
+        """
+        positions = self.get_all_positions(positions)
+        self.over[positions] += 1
+        self.ball[positions] = 1
+        self.legal_deliveries_in_over[positions] = 0
+        self.bowler[positions] = self.bowling_order[positions, self.over[positions]]
+        self.batter[positions], self.non_striker[positions] = self.non_striker[positions], self.batter[positions]
+
+    def advance_innings(self, positions) -> np.ndarray:
+        """
+        Moves the matches at the specified positions whose first innings is over (all out, or 20 overs bowled) to the
+        second innings, and marks the matches whose second innings is over after 20 overs as complete. In nested mode,
+        the matches waiting for one of these first innings start their 2nd innings along with it.
+        :return: The positions of the matches which are still being played
+        """
+        positions = np.asarray(positions)
+        overs_bowled = (self.over[positions] == 19) & (self.legal_deliveries_in_over[positions] == 6)
+        first_innings = self.inning[positions] == 1
+
+        first_innings_over = first_innings & (overs_bowled | self.first_innings_complete[positions])
+        self.set_innings(2, positions[first_innings_over])
+        self.match_complete[positions[~first_innings & overs_bowled]] = True
+
+        started_positions = self.start_shared_second_innings(positions[first_innings_over])
+        positions = positions[~self.match_complete[positions]]
+        if len(started_positions) > 0:
+            positions = np.sort(np.concatenate([positions, started_positions]))
+        return positions
+
+    def start_shared_second_innings(self, source_positions) -> np.ndarray:
+        """
+        Starts the 2nd innings of the matches waiting for the first innings of the matches at source_positions, which
+        have just moved on to their 2nd innings. The waiting matches take on the state of their source match, and bowl
+        the 2nd innings with their own bowling plan & deliveries.
+        :return: The positions of the matches which were started
+        """
+        waiting_positions = np.flatnonzero(self.waiting_for_first_innings)
+        started_positions = waiting_positions[np.isin(self.first_innings_source[waiting_positions],
+                                                      source_positions)]
+        if len(started_positions) == 0:
+            return started_positions
+
+        sources = self.first_innings_source[started_positions]
+        for name in SHARED_FIRST_INNINGS_STATE:
+            values = getattr(self, name)
+            values[started_positions] = values[sources]
+        self.setup_bowler_per_over(started_positions)
+        self.scorecard.copy_innings(sources, started_positions, inning=1)
+        self.waiting_for_first_innings[started_positions] = False
+        return started_positions
+
+    def get_first_innings_sharers(self, positions) -> (np.ndarray, np.ndarray):
+        """
+        Returns the matches waiting for the first innings being played at the specified positions, as the positions of
+        the waiting matches along with the index into positions of the match they wait for
+        """
+        waiting_positions = np.flatnonzero(self.waiting_for_first_innings)
+        index = np.full(self.size, -1, dtype=np.int64)
+        index[positions] = np.arange(len(positions))
+        source_index = index[self.first_innings_source[waiting_positions]]
+        sharing = source_index >= 0
+        return waiting_positions[sharing], source_index[sharing]
+
+    def bowl_next_delivery(self, positions):
+        """
+        Sets up the next delivery for the matches at the specified positions - matches which have completed an over
+        (6 legal deliveries) or are yet to start the innings change over, while the others bowl the next ball of the
+        over. A delivery following a non-legal one is the re-bowl of that ball.
+        """
+        positions = np.asarray(positions)
+        over_complete = (self.over[positions] == -1) | (self.legal_deliveries_in_over[positions] == 6)
+        self.change_over(positions[over_complete])
+        self.bowl_one_ball(positions[~over_complete])
+        self.deliveries_bowled[positions] += 1
+
+    def bowl_one_ball(self, positions=None):
+        """
+        Progress ball count by 1 in the same over, for all matches or the ones at the specified positions
+        """
+        if positions is None:
+            self.ball += 1
+        else:
+            self.ball[positions] += 1
+
+    def get_delivery_uniforms(self, positions) -> np.ndarray:
+        """
+        Returns the uniforms for the delivery being bowled by each of the matches at the specified positions, of shape
+        (len(positions), UNIFORMS_PER_BALL)
+        """
+        positions = np.asarray(positions)
+        return self.delivery_uniforms.get(positions, self.deliveries_bowled[positions] - 1)
+
+    def get_outcome_buckets(self, positions) -> np.ndarray:
+        """
+        Returns the bucket of the outcome probability tables for the delivery being bowled by each of the matches at the
+        specified positions
+        """
+        positions = np.asarray(positions)
+        return self.predictive_utils.get_outcome_buckets(None, self.over[positions],
+                                                         self.previous_num_wickets[positions],
+                                                         venue_offsets=self.venue_offsets[positions])
+
+    def get_active_positions(self, positions=None) -> np.ndarray:
+        """
+        Returns the row positions of matches which still need a ball to be bowled. Completed matches, matches whose
+        first innings is complete (while still in the first innings) & matches waiting for a shared first innings are
+        not active.
+        :param positions: If specified, only consider these positions
+        """
+        active = self.is_active()
+        if positions is None:
+            return np.flatnonzero(active)
+        return positions[active[positions]]
+
+    def is_active(self, positions=None) -> np.ndarray:
+        """
+        Returns True for the matches (or the ones at the specified positions) which still need a ball to be bowled, see
+        get_active_positions()
+        """
+        active = ~(self.match_complete | (self.first_innings_complete & (self.inning == 1))
+                   | self.waiting_for_first_innings)
+        return active if positions is None else active[positions]
+
+    def get_positions(self, index: pd.MultiIndex) -> np.ndarray:
+        """
+        Maps an index whose first 2 levels are [scenario_number, match_key] to row positions in the store
+        """
+        keys = pd.MultiIndex.from_arrays([index.get_level_values(0), index.get_level_values(1)])
+        return self.position_index.get_indexer(keys)
+
+    def get_state_arrays(self, positions) -> dict:
+        """
+        Returns the current state of the matches at the specified positions as a dict of arrays, one entry per match
+        """
+        return {
+            'scenario_number': self.scenario_number[positions],
+            'match_key': self.match_key[positions],
+            'venue': self.venue[positions],
+            'bowling_team': self.bowling_team[positions],
+            'batting_team': self.batting_team[positions],
+            'inning': self.inning[positions],
+            'over': self.over[positions],
+            'ball': self.ball[positions],
+            'previous_total': self.previous_total[positions],
+            'previous_number_of_wickets': self.previous_num_wickets[positions],
+            'bowler': self.bowling_playing_xi[positions, self.bowler[positions]],
+            'batter': self.batting_playing_xi[positions, self.batter[positions]],
+            'non_striker': self.batting_playing_xi[positions, self.non_striker[positions]],
+            'target_runs': self.target_runs[positions],
+            'target_balls': self.target_balls[positions]
+        }
+
+    def get_ball_log_ids(self, positions) -> dict:
+        """
+        Returns the teams, bowler, batter & non striker of the matches at the specified positions as ids into their key
+        tables, see get_ball_log_key_tables()
+        """
+        return {
+            'bowling_team': self.get_team_ids(positions, self.inning[positions], BOWLING_SIDE),
+            'batting_team': self.get_team_ids(positions, self.inning[positions], BATTING_SIDE),
+            'bowler': self.bowling_playing_xi_ids[positions, self.bowler[positions]],
+            'batter': self.batting_playing_xi_ids[positions, self.batter[positions]],
+            'non_striker': self.batting_playing_xi_ids[positions, self.non_striker[positions]]
+        }
+
+    def get_team_ids(self, positions, inning, side) -> np.ndarray:
+        """
+        Returns the ids of the teams on a side of an innings of the matches at the specified positions, in the team key
+        table
+        """
+        return np.ravel_multi_index((positions, np.asarray(inning) - 1, np.full(len(positions), side)),
+                                    self.scorecard.teams.shape)
+
+    def get_ball_log_key_tables(self) -> dict:
+        """
+        Returns the key tables (see BallLog.append_columns()) of the ball log columns which the engines record as ids
+        - the players, the teams & the venue (as the match position)
+        """
+        return {'venue': self.venue,
+                'bowling_team': self.team_key_table,
+                'batting_team': self.team_key_table,
+                **{column: self.player_key_table for column in ['bowler', 'batter', 'non_striker', 'player_dismissed',
+                                                                'fielder']}}
+
+    def get_state_df(self, positions) -> pd.DataFrame:
+        """
+        Builds out the dataframe representing the current state of the matches at the specified positions, indexed by
+        [scenario_number, match_key, inning, over, ball]
+        """
+        state_df = pd.DataFrame(self.get_state_arrays(positions))
+        state_df.set_index(['scenario_number', 'match_key', 'inning', 'over', 'ball'], inplace=True,
+                           verify_integrity=True)
+        return state_df
+
+    def apply_outcomes(self, positions, outcomes, fielder_draws=None, fielder_ids=False) -> np.ndarray:
+        """
+        Called after the outcome of the current ball is known (by the predictive / inferential model) for the matches
+        at the specified positions. Updates the state of all these matches with the outcome of the ball in one go and
+        preps them for the next ball.
+        :param positions: The row positions of the matches, one per outcome
+        :param outcomes: A dataframe or dict of arrays with the batter_runs, extras, is_wicket, dismissal_kind,
+        non_striker_dismissed & legal_delivery outcomes, aligned with positions. The dismissal kinds may be labels or
+        codes (see dismissal_kinds.py).
+        :param fielder_draws: Uniform random numbers in [0, 1) aligned with positions, used to choose the fielder on
+        dismissals which involve one. Drawn from the scenario streams if not specified.
+        :param fielder_ids: Set True to return the fielders as player ids, -1 if there was no fielder
+        :return: The fielder involved in each dismissal - 'nan' if there was no fielder, and '' for matches which are
+        no longer active
+        """
+        positions = np.asarray(positions)
+        fielders = np.full(len(positions), -1) if fielder_ids else np.full(len(positions), '', dtype=object)
+        if fielder_draws is None:
+            fielder_draws = self.random_streams.random(self.scenario_number[positions])
+
+        active = ~(self.match_complete[positions] | (self.first_innings_complete[positions]
+                                                     & (self.inning[positions] == 1)))
+        positions = positions[active]
+        is_wicket = np.asarray(outcomes['is_wicket'])[active]
+        dismissal_kind = np.asarray(outcomes['dismissal_kind'])[active]
+        non_striker_dismissed = np.asarray(outcomes['non_striker_dismissed'])[active]
+        batter_runs = np.asarray(outcomes['batter_runs'])[active]
+        extras = np.asarray(outcomes['extras'])[active]
+        legal_delivery = np.asarray(outcomes['legal_delivery'])[active].astype(bool)
+        fielder_draws = np.asarray(fielder_draws)[active]
+
+        # Calculate wicket details - count, fielder etc
+        self.previous_num_wickets[positions] += is_wicket
+        wicket_mask = is_wicket == 1
+
+        # For these dismissal kinds, choose a random fielder from the bowling team (except the bowler)
+        active_fielders = np.full(len(positions), -1) if fielder_ids \
+            else np.full(len(positions), 'nan', dtype=object)
+        if np.issubdtype(dismissal_kind.dtype, np.integer):
+            fielding_mask = wicket_mask & needs_fielder(dismissal_kind)
+        else:
+            fielding_mask = wicket_mask & np.isin(dismissal_kind, FIELDING_DISMISSAL_KINDS)
+        fielding_positions = positions[fielding_mask]
+        fielder_index = (fielder_draws[fielding_mask]
+                         * (self.bowling_playing_xi_size[fielding_positions] - 1)).astype(np.int64)
+        fielder_index += fielder_index >= self.bowler[fielding_positions]
+        bowling_playing_xi = self.bowling_playing_xi_ids if fielder_ids else self.bowling_playing_xi
+        active_fielders[fielding_mask] = bowling_playing_xi[fielding_positions, fielder_index]
+        fielders[active] = active_fielders
+
+        # Add the delivery to the player totals, before the batters change over
+        fielder_positions = np.full(len(positions), -1, dtype=np.int64)
+        fielder_positions[fielding_mask] = fielder_index
+        runouts = is_run_out(dismissal_kind) if np.issubdtype(dismissal_kind.dtype, np.integer) \
+            else dismissal_kind == 'run out'
+        self.scorecard.add_deliveries(positions, self.inning[positions], self.batter[positions],
+                                      self.non_striker[positions], self.bowler[positions], fielder_positions,
+                                      batter_runs, batter_runs + extras, is_wicket, runouts.astype(np.int64),
+                                      unique_positions=True)
+
+        # Identify the next batter who will replace the player dismissed (either batter or non_striker)
+        replacement_mask = wicket_mask & (self.previous_num_wickets[positions] < 10)
+        next_player = self.batting_position[positions]
+        self.batting_position[positions] += replacement_mask
+        non_striker_mask = replacement_mask & (non_striker_dismissed == 1)
+        batter_mask = replacement_mask & (non_striker_dismissed != 1)
+        self.non_striker[positions[non_striker_mask]] = next_player[non_striker_mask]
+        self.batter[positions[batter_mask]] = next_player[batter_mask]
+
+        # Swap batter / non_striker for odd runs
+        swap_positions = positions[np.isin(batter_runs, [1, 3, 5])]
+        self.batter[swap_positions], self.non_striker[swap_positions] = \
+            self.non_striker[swap_positions], self.batter[swap_positions]
+
+        # Calculate the total runs scored
+        self.previous_total[positions] += batter_runs + extras
+
+        # Set the legality of the previous delivery
+        self.previous_non_legal_delivery[positions] = ~legal_delivery
+        self.legal_deliveries_in_over[positions] += legal_delivery
+
+        # Check if the match is complete - either the team batting second met the target or they ran out of wickets
+        second_innings = self.inning[positions] == 2
+        all_out = self.previous_num_wickets[positions] == 10
+        target_met = self.previous_total[positions] >= self.target_runs[positions]
+        self.match_complete[positions[second_innings & (target_met | all_out)]] = True
+
+        # Check if the first innings is complete because the team is bowled out
+        self.first_innings_complete[positions[~second_innings & all_out]] = True
+
+        return fielders
+
+    def get_batting_playing_xi(self, position) -> list:
+        """
+        Returns the playing xi (list of player keys) of the batting team for the match at position
+        """
+        return self.batting_playing_xi[position, :self.batting_playing_xi_size[position]].tolist()
+
+    def get_bowling_playing_xi(self, position) -> list:
+        """
+        Returns the playing xi (list of player keys) of the bowling team for the match at position
+        """
+        return self.bowling_playing_xi[position, :self.bowling_playing_xi_size[position]].tolist()
+
+    def get_match_state(self, position) -> MatchState:
+        """
+        Returns a MatchState view of the match at position. Changes to the view are not reflected in the store - this
+        is meant to be used for debugging.
+        """
+        return MatchState.from_store(self, position)
+
@@ -0,0 +1,149 @@
+import numpy as np
+import pandas as pd
+
+from simulators.utils.dismissal_kinds import LEGAL_WICKET_TYPES, NON_LEGAL_WICKET_TYPES
+from simulators.utils.over_outcomes import OVER_PHASES, NUMBER_OF_PHASES, WICKETS_BUCKETS
+
+# Weight of the parent distribution when a bucket's counts are smoothed, in deliveries - a bucket with this many
+# deliveries is half its own counts & half its parent
+PRIOR_STRENGTH = 50
+
+# The delivery outcome distributions of PredictiveUtils estimated by the tables - along with the deliveries each is
+# counted on & the category of a delivery (see OutcomeProbabilityTables.get_delivery_categories())
+OUTCOME_DISTRIBUTIONS = ['legal_delivery_distribution', 'batter_runs_distribution',
+                         'extras_if_legal_no_run_distribution', 'legal_wickets_distribution',
+                         'legal_wicket_types_distribution', 'legal_wicket_single_distribution',
+                         'direct_run_out_probability', 'non_striker_dismissed_on_runout',
+                         'non_legal_deliveries_distribution', 'non_legal_extras_distribution',
+                         'non_legal_batter_runs_distribution', 'non_legal_wickets_distribution',
+                         'non_legal_wicket_types_distribution', 'non_legal_wicket_single_distribution',
+                         'non_legal_wicket_extras_distribution']
+
+
+class OutcomeProbabilityTables:
+    """
+    Empirical probability tables of the delivery outcome distributions of PredictiveUtils, bucketed by venue, phase of
+    the innings (see OVER_PHASES) & wickets fallen, and counted from the training innings. Each distribution is a dense
+    array of shape (number of buckets, number of categories), so the distribution of a delivery is found by indexing
+    with its bucket - see get_buckets().
+
+    The counts are sparse, so each bucket is smoothed towards its parent - the venue bucket towards the phase & wickets
+    bucket across all the venues, which is smoothed towards the distribution across all the buckets, which in turn is
+    smoothed towards the prior (the fixed distributions of PredictiveUtils). Venues without any training innings use
+    the phase & wickets buckets.
+    """
+
+    def __init__(self, innings_df: pd.DataFrame, priors: dict, prior_strength=PRIOR_STRENGTH):
+        """
+        :param innings_df: The training innings ball by ball, with the venue of the match of each delivery
+        :param priors: The prior probabilities of each of the OUTCOME_DISTRIBUTIONS
+        :param prior_strength: The weight of the parent distribution of a bucket, in deliveries
+        """
+        innings_df = innings_df[innings_df['inning'].isin([1, 2]) & (innings_df['over'] >= 0)
+                                & (innings_df['over'] < len(OVER_PHASES))]
+        innings_df = innings_df.sort_values(['match_key', 'inning', 'over', 'ball'], kind='stable')
+
+        self.venues = pd.Index(innings_df['venue'].unique())
+        self.buckets_per_venue = NUMBER_OF_PHASES * WICKETS_BUCKETS
+        self.number_of_buckets = (len(self.venues) + 1) * self.buckets_per_venue
+
+        # The bucket of each over (0 to 19) & wickets fallen (0 to 10), within a venue
+        self.over_wickets_buckets = OVER_PHASES[:, np.newaxis] * WICKETS_BUCKETS \
+            + np.minimum(np.arange(11), WICKETS_BUCKETS - 1)[np.newaxis, :]
+
+        is_wicket = innings_df['is_wicket'].fillna(0).values.astype(np.int64)
+        innings_keys = innings_df.groupby(['match_key', 'inning'], sort=False).ngroup().values
+        wickets_before = pd.Series(is_wicket).groupby(innings_keys).cumsum().values - is_wicket
+        buckets = self.get_buckets(innings_df['venue'].values, innings_df['over'].values, wickets_before)
+
+        self.number_of_deliveries = len(innings_df.index)
+        self.probabilities = {}
+        for name, (mask, categories) in self.get_delivery_categories(innings_df).items():
+            # The fixed distributions don't all add up to exactly 1
+            prior = np.asarray(priors[name], dtype=np.float64)
+            prior = prior / prior.sum()
+            counts = np.bincount(buckets[mask] * len(prior) + categories[mask],
+                                 minlength=self.number_of_buckets * len(prior)).reshape(-1, len(prior))
+            self.probabilities[name] = self.smooth(counts, prior, prior_strength)
+
+    def smooth(self, counts, prior, prior_strength) -> np.ndarray:
+        """
+        Returns the smoothed probabilities of the counts of each bucket, of shape (number of buckets, categories)
+        """
+        def shrink(bucket_counts, parent):
+            return (bucket_counts + prior_strength * parent) \
+                / (bucket_counts.sum(axis=-1, keepdims=True) + prior_strength)
+
+        venue_counts = counts.reshape(len(self.venues) + 1, self.buckets_per_venue, -1)
+        phase_wickets_counts = venue_counts.sum(axis=0)
+        overall = shrink(phase_wickets_counts.sum(axis=0), prior)
+        phase_wickets = shrink(phase_wickets_counts, overall)
+        probabilities = shrink(venue_counts, phase_wickets)
+
+        # The last venue is the one for venues without training innings
+        probabilities[-1] = phase_wickets
+        return probabilities.reshape(self.number_of_buckets, -1)
+
+    @staticmethod
+    def get_delivery_categories(innings_df) -> dict:
+        """
+        Returns the deliveries each of the OUTCOME_DISTRIBUTIONS is counted on (as a mask) & the category of each
+        delivery, the way the outcomes are predicted in PredictiveUtils.predict_outcomes()
+        """
+        wides = innings_df['wides'].fillna(0).values > 0
+        noballs = innings_df['noballs'].fillna(0).values > 0
+        legal = ~(wides | noballs)
+        wicket = innings_df['is_wicket'].fillna(0).values == 1
+        batter_runs = innings_df['batter_runs'].fillna(0).values.astype(np.int64)
+        extras = innings_df['extras'].fillna(0).values.astype(np.int64)
+        dismissal_kind = innings_df['dismissal_kind'].values
+        run_out = wicket & (dismissal_kind == 'run out')
+
+        # Dismissal kinds which are not simulated fall under 'others'
+        legal_wicket_type = pd.Index(LEGAL_WICKET_TYPES).get_indexer(dismissal_kind)
+        legal_wicket_type[legal_wicket_type < 0] = LEGAL_WICKET_TYPES.index('others')
+        non_legal_wicket_type = pd.Index(NON_LEGAL_WICKET_TYPES).get_indexer(dismissal_kind)
+
+        no_wicket_legal = legal & ~wicket
+        no_wicket_non_legal = ~legal & ~wicket
+        return {
+            'legal_delivery_distribution': (np.ones(len(legal), dtype=bool), legal.astype(np.int64)),
+            'batter_runs_distribution': (no_wicket_legal, np.minimum(batter_runs, 6)),
+            'extras_if_legal_no_run_distribution': (no_wicket_legal & (batter_runs == 0),
+                                                    (extras > 0).astype(np.int64)),
+            'legal_wickets_distribution': (legal, wicket.astype(np.int64)),
+            'legal_wicket_types_distribution': (legal & wicket, legal_wicket_type),
+            'legal_wicket_single_distribution': (legal & wicket, (batter_runs > 0).astype(np.int64)),
+            'direct_run_out_probability': (run_out,
+                                           (innings_df['is_direct_runout'].fillna(0).values == 1).astype(np.int64)),
+            'non_striker_dismissed_on_runout': (run_out, (innings_df['player_dismissed'].values
+                                                          == innings_df['non_striker'].values).astype(np.int64)),
+            'non_legal_deliveries_distribution': (~legal, noballs.astype(np.int64)),
+            'non_legal_extras_distribution': (no_wicket_non_legal, np.minimum(extras, 5)),
+            'non_legal_batter_runs_distribution': (no_wicket_non_legal, np.minimum(batter_runs, 6)),
+            'non_legal_wickets_distribution': (~legal, wicket.astype(np.int64)),
+            'non_legal_wicket_types_distribution': (~legal & wicket & (non_legal_wicket_type >= 0),
+                                                    non_legal_wicket_type),
+            'non_legal_wicket_single_distribution': (~legal & wicket, (batter_runs > 0).astype(np.int64)),
+            'non_legal_wicket_extras_distribution': (~legal & wicket, np.minimum(extras, 5))
+        }
+
+    def get_venue_offsets(self, venues) -> np.ndarray:
+        """
+        Returns the first bucket of each venue - the buckets of venues without training innings are at the end
+        """
+        venue_index = self.venues.get_indexer(np.asarray(venues, dtype=object))
+        venue_index[venue_index < 0] = len(self.venues)
+        return venue_index * self.buckets_per_venue
+
+    def get_buckets(self, venues, over, wickets, venue_offsets=None) -> np.ndarray:
+        """
+        Returns the bucket of each delivery
+        :param venues: The venue of each delivery - not needed if venue_offsets is specified
+        :param over: The 0 based over of each delivery
+        :param wickets: The wickets fallen before each delivery
+        :param venue_offsets: The first bucket of the venue of each delivery, see get_venue_offsets()
+        """
+        if venue_offsets is None:
+            venue_offsets = self.get_venue_offsets(venues)
+        return venue_offsets + self.over_wickets_buckets[np.asarray(over), np.minimum(wickets, 10)]
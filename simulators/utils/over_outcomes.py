@@ -0,0 +1,131 @@
+import numpy as np
+import pandas as pd
+
+from simulators.utils.dismissal_kinds import DISMISSAL_KINDS, NO_DISMISSAL, encode_dismissal_kinds
+
+# Phase of the innings each over (0 based) falls in - the powerplay, the middle overs & the death overs
+OVER_PHASES = np.array([0] * 6 + [1] * 9 + [2] * 5, dtype=np.int64)
+NUMBER_OF_PHASES = 3
+
+# Overs are bucketed by the wickets fallen at the start of the over, 0 to 9
+WICKETS_BUCKETS = 10
+
+# Historical dismissal kinds which are not simulated (e.g. hit wicket) are coded as 'others'
+OTHER_DISMISSAL = DISMISSAL_KINDS.index('others')
+
+# Columns of the uniforms drawn for each over - one to pick the over & one per delivery to pick the fielder
+OVER_UNIFORM = 0
+FIRST_FIELDER_UNIFORM = 1
+
+
+class OverOutcomesTable:
+    """
+    Empirical joint distribution of the outcomes of a whole over, by phase of the innings & wickets fallen at the start
+    of the over, built from the complete overs (6 legal deliveries) of the historical innings. An over is drawn by
+    picking one of the historical overs of its bucket, so its runs, extras, wickets & dismissal kinds come together -
+    along with the order of its deliveries, which is how they are shared out between the batters.
+
+    The deliveries of the overs are held in dense arrays of shape (number of overs, deliveries_per_over), padded past
+    the length of each over, with the overs of each bucket stored next to each other. Buckets without any historical
+    overs borrow the overs of the nearest bucket, preferring the same phase.
+    """
+    COLUMNS = ['legal_delivery', 'batter_runs', 'extras', 'is_wicket', 'dismissal_kind', 'non_striker_dismissed',
+               'is_direct_runout', 'noballs', 'wides']
+
+    def __init__(self, innings_df: pd.DataFrame):
+        """
+        :param innings_df: The historical innings, ball by ball - e.g. Tournaments.all_innings
+        """
+        innings_df = innings_df[innings_df['inning'].isin([1, 2])]
+        innings_df = innings_df.sort_values(['match_key', 'inning', 'over', 'ball'], kind='stable')
+
+        wides = innings_df['wides'].fillna(0).values > 0
+        noballs = innings_df['noballs'].fillna(0).values > 0
+        legal_delivery = ~(wides | noballs)
+        is_wicket = innings_df['is_wicket'].fillna(0).values.astype(np.int64)
+
+        dismissal_kind = np.where(is_wicket == 1, encode_dismissal_kinds(innings_df['dismissal_kind'].values),
+                                  NO_DISMISSAL)
+        dismissal_kind[(is_wicket == 1) & (dismissal_kind == NO_DISMISSAL)] = OTHER_DISMISSAL
+
+        # Wickets fallen before each delivery of the innings
+        innings_keys = innings_df.groupby(['match_key', 'inning'], sort=False).ngroup().values
+        wickets_before = pd.Series(is_wicket).groupby(innings_keys).cumsum().values - is_wicket
+
+        # Keep the complete overs of the first 20
+        over_keys = innings_df.groupby(['match_key', 'inning', 'over'], sort=False).ngroup().values
+        _, first_deliveries, lengths = np.unique(over_keys, return_index=True, return_counts=True)
+        over_numbers = innings_df['over'].values[first_deliveries]
+        wickets = wickets_before[first_deliveries]
+        complete = (np.bincount(over_keys, weights=legal_delivery) == 6) & (over_numbers >= 0) \
+            & (over_numbers < len(OVER_PHASES)) & (wickets < WICKETS_BUCKETS)
+        if not complete.any():
+            raise ValueError("Couldn't find any complete overs in the historical innings")
+
+        # Store the overs grouped by bucket
+        buckets = OVER_PHASES[np.where(complete, over_numbers, 0)] * WICKETS_BUCKETS + wickets
+        kept_overs = np.flatnonzero(complete)
+        kept_overs = kept_overs[np.argsort(buckets[kept_overs], kind='stable')]
+        over_rank = np.full(len(complete), -1, dtype=np.int64)
+        over_rank[kept_overs] = np.arange(len(kept_overs))
+
+        self.lengths = lengths[kept_overs]
+        self.deliveries_per_over = int(self.lengths.max())
+        self.uniforms_per_over = FIRST_FIELDER_UNIFORM + self.deliveries_per_over
+
+        rows = np.flatnonzero(over_rank[over_keys] >= 0)
+        over_index = over_rank[over_keys[rows]]
+        delivery_index = np.arange(len(over_keys))[rows] - first_deliveries[over_keys[rows]]
+        values = {
+            'legal_delivery': legal_delivery,
+            'batter_runs': innings_df['batter_runs'].values.astype(np.int64),
+            'extras': innings_df['extras'].values.astype(np.int64),
+            'is_wicket': is_wicket,
+            'dismissal_kind': dismissal_kind,
+            'non_striker_dismissed': ((is_wicket == 1)
+                                      & (innings_df['player_dismissed'].values == innings_df['non_striker'].values)),
+            'is_direct_runout': innings_df['is_direct_runout'].fillna(0).values,
+            'noballs': noballs,
+            'wides': wides
+        }
+        self.deliveries = {}
+        for column in self.COLUMNS:
+            dtype = bool if column == 'legal_delivery' else np.int64
+            self.deliveries[column] = np.zeros((len(kept_overs), self.deliveries_per_over), dtype=dtype)
+            self.deliveries[column][over_index, delivery_index] = values[column][rows]
+
+        self.bucket_counts = np.bincount(buckets[kept_overs], minlength=NUMBER_OF_PHASES * WICKETS_BUCKETS)
+        self.bucket_starts = np.concatenate([[0], np.cumsum(self.bucket_counts)[:-1]])
+
+        # Map every bucket to itself, or to the nearest bucket with overs if it has none
+        self.bucket_source = np.arange(len(self.bucket_counts))
+        filled_buckets = np.flatnonzero(self.bucket_counts > 0)
+        for bucket in np.flatnonzero(self.bucket_counts == 0):
+            distance = np.abs(filled_buckets // WICKETS_BUCKETS - bucket // WICKETS_BUCKETS) * WICKETS_BUCKETS \
+                + np.abs(filled_buckets % WICKETS_BUCKETS - bucket % WICKETS_BUCKETS)
+            self.bucket_source[bucket] = filled_buckets[np.argmin(distance)]
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def sample(self, over, wickets, uniforms) -> np.ndarray:
+        """
+        Draws an over for each (over number, wickets fallen) pair
+        :param over: The 0 based number of each over
+        :param wickets: The wickets fallen at the start of each over
+        :param uniforms: Uniform random numbers in [0, 1), one per over
+        :return: The index of each over drawn, to be passed to get_deliveries()
+        """
+        buckets = self.bucket_source[OVER_PHASES[np.asarray(over)] * WICKETS_BUCKETS
+                                     + np.minimum(np.asarray(wickets), WICKETS_BUCKETS - 1)]
+        counts = self.bucket_counts[buckets]
+        return self.bucket_starts[buckets] + np.minimum((np.asarray(uniforms) * counts).astype(np.int64), counts - 1)
+
+    def get_deliveries(self, overs, delivery) -> dict:
+        """
+        Returns the outcomes of a delivery of each of the overs drawn, as a dict of arrays with the same columns as
+        PredictiveUtils.predict_outcomes()
+        :param overs: The overs drawn by sample()
+        :param delivery: The 0 based number of the delivery within the over
+        """
+        return {column: values[overs, delivery] for column, values in self.deliveries.items()}
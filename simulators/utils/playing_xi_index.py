@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+
+
+class PlayingXiIndex:
+    """
+    Index from (match_key, team) to the ordered playing xi of the team in the match, as an array of integer player ids.
+    The playing xi dataframe is grouped once, so looking up the playing xi of many matches is an array gather.
+    """
+
+    def __init__(self, playing_xi_df: pd.DataFrame, predictive_utils):
+        """
+        :param playing_xi_df: The playing xi dataframe with match_key, team & player_key columns, listing the players
+        of each team in batting order
+        :param predictive_utils: The PredictiveUtils instance which maps player keys to player ids. Players it doesn't
+        know about yet are registered.
+        """
+        groups = playing_xi_df.groupby(['match_key', 'team'], sort=False)
+        group_numbers = groups.ngroup().values
+        positions = groups.cumcount().values
+
+        # The first row of each group, in group number order
+        _, first_rows = np.unique(group_numbers, return_index=True)
+        self.index = pd.MultiIndex.from_arrays([playing_xi_df['match_key'].values[first_rows],
+                                                playing_xi_df['team'].values[first_rows]],
+                                               names=['match_key', 'team'])
+        self.sizes = np.bincount(group_numbers, minlength=len(self.index)).astype(np.int64)
+
+        width = self.sizes.max() if len(self.sizes) > 0 else 0
+        self.player_ids = np.full((len(self.index), width), -1, dtype=np.int64)
+        self.player_ids[group_numbers, positions] = \
+            predictive_utils.get_player_ids(playing_xi_df['player_key'].values, register=True)
+
+    def get_playing_xi(self, match_keys, teams) -> (np.ndarray, np.ndarray):
+        """
+        Returns the playing xi of each (match_key, team) pair as a 2-d array of player ids (one row per pair, padded
+        with -1) and the corresponding playing xi sizes
+        """
+        rows = self.index.get_indexer(pd.MultiIndex.from_arrays([match_keys, teams]))
+        if (rows == -1).any():
+            missing = pd.MultiIndex.from_arrays([match_keys, teams])[rows == -1].unique().tolist()
+            raise ValueError(f"Couldn't find the playing xi for (match_key, team): {missing}")
+
+        return self.player_ids[rows], self.sizes[rows]
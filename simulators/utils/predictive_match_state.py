@@ -1,5 +1,5 @@
-import random
 import logging
+import numpy as np
 
 class MatchState:
     """
@@ -7,8 +7,15 @@ class MatchState:
     innings simulation model.
     """
     def __init__(self, predictive_utils, scenario_number, match_key, bowling_team, batting_team,
-                 batting_playing_xi, bowling_playing_xi, venue):
+                 batting_playing_xi, bowling_playing_xi, venue, bowling_plans, generator=None):
+        """
+        :param bowling_plans: The bowler of each over of both innings, as lists of 20 player keys - see
+        PredictiveUtils.generate_bowling_plans()
+        """
         self.predictive_utils = predictive_utils
+        # Random generator used for the fielder selection
+        self.generator = np.random.default_rng() if generator is None else generator
+        self.bowling_plans = bowling_plans
         self.scenario_number = scenario_number
         self.match_key = match_key
         self.bowling_team = bowling_team
@@ -31,10 +38,57 @@ class MatchState:
         self.match_complete = False
         self.first_innings_complete = False
 
-    def update_state(self, row):
+    @classmethod
+    def from_store(cls, store, position):
+        """
+        Builds a MatchState snapshot of the match at the specified row position of a MatchStateStore. The snapshot
+        does not share any state with the store and is meant to be used for debugging.
+        """
+        match_state = cls.__new__(cls)
+        match_state.predictive_utils = store.predictive_utils
+        match_state.generator = store.random_streams.get_generator(store.scenario_number[position])
+        match_state.scenario_number = store.scenario_number[position]
+        match_state.match_key = store.match_key[position]
+        match_state.bowling_team = store.bowling_team[position]
+        match_state.batting_team = store.batting_team[position]
+        match_state.inning = store.inning[position]
+        match_state.batting_playing_xi = store.get_batting_playing_xi(position)
+        match_state.bowling_playing_xi = store.get_bowling_playing_xi(position)
+        match_state.available_bowlers = match_state.bowling_playing_xi.copy()
+        match_state.venue = store.venue[position]
+
+        match_state.target_runs = store.target_runs[position]
+        match_state.target_balls = store.target_balls[position]
+
+        match_state.over = store.over[position]
+        match_state.ball = store.ball[position]
+        match_state.previous_total = store.previous_total[position]
+        match_state.previous_num_wickets = store.previous_num_wickets[position]
+        # The bowling plan of each innings is held as positions in the playing xi of the team bowling that innings
+        innings_bowling_playing_xis = [match_state.bowling_playing_xi, match_state.batting_playing_xi]
+        if match_state.inning == 2:
+            innings_bowling_playing_xis.reverse()
+        match_state.bowling_plans = [[playing_xi[i] for i in store.bowling_plans[position, innings]]
+                                     for innings, playing_xi in enumerate(innings_bowling_playing_xis)]
+        match_state.bowling_order = match_state.setup_bowler_per_over()
+        bowler = store.bowler[position]
+        match_state.bowler = match_state.bowling_playing_xi[bowler] if bowler >= 0 else ""
+        match_state.previous_bowler = match_state.bowler
+        match_state.batter = match_state.batting_playing_xi[store.batter[position]]
+        match_state.non_striker = match_state.batting_playing_xi[store.non_striker[position]]
+        match_state.batting_position = store.batting_position[position]
+        match_state.bowler_map = {}
+        match_state.previous_non_legal_delivery = store.previous_non_legal_delivery[position]
+
+        match_state.match_complete = store.match_complete[position]
+        match_state.first_innings_complete = store.first_innings_complete[position]
+        return match_state
+
+    def update_state(self, row, fielder_draw=None):
         """
         This function is called after the outcome of the current ball is known (by the predictive / inferential model).
         This function updates the current state with the outcome of the ball and preps it for the next ball.
+        If specified, fielder_draw is a uniform random number in [0, 1) used to choose the fielder on a dismissal.
         """
         fielder = ''
         if self.match_complete:
@@ -53,7 +107,10 @@ class MatchState:
                 # For these dismissal kinds, choose a random fielder from the bowling team (except the bowler)
                 list_of_fielders = self.bowling_playing_xi.copy()
                 list_of_fielders.remove(self.bowler)
-                fielder = random.choice(list_of_fielders)
+                if fielder_draw is None:
+                    fielder = list_of_fielders[self.generator.integers(len(list_of_fielders))]
+                else:
+                    fielder = list_of_fielders[int(fielder_draw * len(list_of_fielders))]
 
             # Identify the next batter who will replace the player dismissed (either batter or non_striker)
             non_striker_dismissed = row['non_striker_dismissed']
@@ -140,27 +197,9 @@ class MatchState:
 
     def setup_bowler_per_over(self):
         """
-        Decide on the bowling playing xi before the match starts
-        """
-        #TODO: Assess if this logic should just be applied per over instead of in one go on initialisation & inning
-        # change due to perf considerations
-        bowling_order = []
-        available_bowlers = self.bowling_playing_xi.copy()
-        bowler_map = {}
-        previous_bowler = ""
-        for i in range(0, 20):
-            bowler = self.predictive_utils.populate_bowler_for_state(self.match_key, self.bowling_team,
-                                                                     i, previous_bowler, available_bowlers)
-            bowling_order.append(bowler)
-            previous_bowler = bowler
-            if bowler in bowler_map.keys():
-                bowler_map[bowler] += 1
-            else:
-                bowler_map[bowler] = 1
-
-            if bowler_map[bowler] == 4:
-                available_bowlers.remove(bowler)
-        return bowling_order
+        Returns the bowler of each over of the current innings, from the bowling plans decided before the match starts
+        """
+        return list(self.bowling_plans[self.inning - 1])
 
     def change_over(self):
         """
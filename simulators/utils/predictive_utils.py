@@ -1,11 +1,41 @@
-import scipy.stats as sps
 import pandas as pd
 import numpy as np
 from data_selection.data_selection import DataSelection
 import logging
 
 from inferential_models.batter_runs_models import BatterRunsModel
-import random
+from simulators.utils.samplers import BernoulliSampler, CategoricalSampler
+from simulators.utils.dismissal_kinds import LEGAL_WICKET_TYPES, NON_LEGAL_WICKET_TYPES, NON_LEGAL_DISMISSAL_OFFSET, \
+    NO_DISMISSAL, decode_dismissal_kinds, is_run_out
+from simulators.utils.over_outcomes import OverOutcomesTable
+from simulators.utils.outcome_tables import OutcomeProbabilityTables, OUTCOME_DISTRIBUTIONS
+
+# Columns of the buffer of uniform random numbers drawn for each ball. Every random decision made on a delivery uses
+# its own column, so the decisions of a ball never share a random number. Legal & non-legal deliveries share the
+# columns of the decisions which are mutually exclusive between them.
+LEGAL_DELIVERY_UNIFORM = 0
+WICKET_UNIFORM = 1
+WICKET_TYPE_UNIFORM = 2
+WICKET_SINGLE_UNIFORM = 3
+DIRECT_RUNOUT_UNIFORM = 4
+NON_STRIKER_DISMISSED_UNIFORM = 5
+BATTER_RUNS_UNIFORM = 6
+EXTRAS_UNIFORM = 7
+NON_LEGAL_DELIVERY_TYPE_UNIFORM = 8
+FIELDER_UNIFORM = 9
+UNIFORMS_PER_BALL = 10
+
+
+def get_players_dismissed(outcomes, batters, non_strikers, no_player='nan') -> np.ndarray:
+    """
+    Returns the player dismissed on each delivery of the outcomes returned by PredictiveUtils.predict_outcomes() -
+    taken from batters or non_strikers (player keys or ids), or no_player if there was no wicket
+    """
+    players_dismissed = np.where(outcomes['non_striker_dismissed'] == 1, non_strikers, batters)
+    if isinstance(no_player, str):
+        players_dismissed = players_dismissed.astype(object)
+    players_dismissed[outcomes['is_wicket'] != 1] = no_player
+    return players_dismissed
 
 
 class PredictiveUtils:
@@ -17,232 +47,266 @@ class PredictiveUtils:
         self.all_matches_df = pd.DataFrame()
         self.featured_player_df = pd.DataFrame()
         self.batter_runs_model = batter_runs_model
-        self.set_of_all_bowlers = None
+        self.toss_winner_action_probability_df = pd.DataFrame()
+        self.player_keys = pd.Index([])
+        self.is_eligible_bowler = np.zeros(0, dtype=bool)
+        self.over_outcomes_table = None
+        self.outcome_tables = None
 
         logging.debug("setting up distributions")
-        # TODO: These distributions will no longer be required once the inferential model comes into play.
+        # These fixed distributions are the priors of the empirical tables which replace them in setup(), see
+        # setup_outcome_tables()
 
         # Probability of a legal delivery
-        self.legal_delivery_distribution = sps.bernoulli(p=0.97)
+        self.legal_delivery_distribution = BernoulliSampler(p=0.97)
         logging.info("***************** Setting legal deliveries = 0.97 ***************** ")
 
 
         # Probability distribution of batting runs on a legal, wicket-less delivery
         legal_batting_distribution = [0.4, 0.35, 0.075, 0.006, 0.125, 0.004, 0.04]
-        self.batter_runs_distribution = sps.multinomial(1, legal_batting_distribution)
+        self.batter_runs_distribution = CategoricalSampler(legal_batting_distribution)
 
         # Probability of getting an extra if there are no batter runs
-        self.extras_if_legal_no_run_distribution = sps.bernoulli(p=.03)
+        self.extras_if_legal_no_run_distribution = BernoulliSampler(p=.03)
 
         # Probability of wickets on a legal delivery
-        self.legal_wickets_distribution = sps.bernoulli(p=.035)
+        self.legal_wickets_distribution = BernoulliSampler(p=.035)
         logging.info("***************** Setting legal_wickets_distribution = 0.035 ***************** ")
 
         # Probability distribution of dismissal kinds
-        self.legal_wicket_types = ["caught", "bowled", "run out", "lbw", "caught and bowled", "stumped", "others"]
+        self.legal_wicket_types = LEGAL_WICKET_TYPES
         legal_wicket_types_distribution_list = [0.6, 0.19, 0.08, 0.07, 0.03, 0.03, 0.06]
-        self.legal_wicket_types_distribution = sps.multinomial(1, legal_wicket_types_distribution_list)
+        self.legal_wicket_types_distribution = CategoricalSampler(legal_wicket_types_distribution_list)
 
         # Probability of a single if a wicket was lost
         # ASSUMPTION: If there was a wicket, at the most 1 batter run could be scored
-        self.legal_wicket_single_distribution = sps.bernoulli(p=0.03)
+        self.legal_wicket_single_distribution = BernoulliSampler(p=0.03)
 
         # Probability of a run out being a runout
-        self.direct_run_out_probability = sps.bernoulli(p=0.5)
+        self.direct_run_out_probability = BernoulliSampler(p=0.5)
 
         # Probability of a non striker being dismissed on a runout
-        self.non_striker_dismissed_on_runout = sps.bernoulli(p=0.5)
+        self.non_striker_dismissed_on_runout = BernoulliSampler(p=0.5)
 
         # Distribution of non-legal deliveries
         self.non_legal_deliveries = ["wides", "noballs"]
         non_legal_deliveries_probability = [0.95, 0.05]
         logging.info("***************** Setting no-ball probability = 0.05 ***************** ")
 
-        self.non_legal_deliveries_distribution = sps.multinomial(1, non_legal_deliveries_probability)
+        self.non_legal_deliveries_distribution = CategoricalSampler(non_legal_deliveries_probability)
 
         # Distribution of extras scored on a non-legal delivery
         non_legal_extras_probability = [0, 0.89, 0.07, 0.01, 0.001, 0.03]
-        self.non_legal_extras_distribution = sps.multinomial(1, non_legal_extras_probability)
+        self.non_legal_extras_distribution = CategoricalSampler(non_legal_extras_probability)
 
         # Distribution of batter runs scored on a non-legal delivery
         non_legal_batter_runs_probability = [0.93, 0.03, 0.008, 0, 0.014, 0, 0.008]
-        self.non_legal_batter_runs_distribution = sps.multinomial(1, non_legal_batter_runs_probability)
+        self.non_legal_batter_runs_distribution = CategoricalSampler(non_legal_batter_runs_probability)
 
         # Probability of a wicket on a non-legal delivery
-        self.non_legal_wickets_distribution = sps.bernoulli(p=.0099)
+        self.non_legal_wickets_distribution = BernoulliSampler(p=.0099)
 
         # Distribution of dismissal kind on a non-legal wicket
-        self.non_legal_wicket_types = ["stumped", "run out"]
+        self.non_legal_wicket_types = NON_LEGAL_WICKET_TYPES
         non_legal_wicket_types_distribution_list = [0.65, 0.35]
-        self.non_legal_wicket_types_distribution = sps.multinomial(1, non_legal_wicket_types_distribution_list)
+        self.non_legal_wicket_types_distribution = CategoricalSampler(non_legal_wicket_types_distribution_list)
 
         # Probability of a single batter_run on a non-legal wicket
-        self.non_legal_wicket_single_distribution = sps.bernoulli(p=0.03)
+        self.non_legal_wicket_single_distribution = BernoulliSampler(p=0.03)
 
         # Probability of an extra on a non-legal wicket
         non_legal_wicket_extras_probability = [0, 0.97, 0.024, 0, 0.001, 0.006]
-        self.non_legal_wicket_extras_distribution = sps.multinomial(1, non_legal_wicket_extras_probability)
+        self.non_legal_wicket_extras_distribution = CategoricalSampler(non_legal_wicket_extras_probability)
 
         self.is_setup = False
 
-    def predict_runout_details(self, matches_df, base_mask):
+    def predict_runout_details(self, outcomes, base_mask, uniforms, buckets):
         """
-        Predicts direct / indirect runouts and which player got dismissed. Updates matches_df directly with the details.
+        Predicts direct / indirect runouts and whether the non striker got dismissed. Updates outcomes directly with the
+        details.
         """
-        matches_df.loc[base_mask, 'player_dismissed'] = matches_df['batter']
-
-        base_mask = base_mask & (matches_df['dismissal_kind'] == 'run out')
-        number_of_balls = len(base_mask[base_mask])
-        if number_of_balls > 0:
-            matches_df.loc[base_mask, 'is_direct_runout'] = self.direct_run_out_probability.rvs(number_of_balls)
-            matches_df.loc[base_mask, 'non_striker_dismissed'] \
-                = self.non_striker_dismissed_on_runout.rvs(number_of_balls)
+        base_mask = base_mask & is_run_out(outcomes['dismissal_kind'])
+        outcomes['is_direct_runout'][base_mask] = \
+            self.direct_run_out_probability.sample(uniforms[base_mask, DIRECT_RUNOUT_UNIFORM], buckets[base_mask])
+        outcomes['non_striker_dismissed'][base_mask] = self.non_striker_dismissed_on_runout.sample(
+            uniforms[base_mask, NON_STRIKER_DISMISSED_UNIFORM], buckets[base_mask])
 
-        base_mask = base_mask & (matches_df['non_striker_dismissed'] == 1)
-        matches_df.loc[base_mask, 'player_dismissed'] = matches_df['non_striker']
-
-    def predict_legal_wickets(self, matches_df):
+    def predict_legal_wickets(self, outcomes, uniforms, buckets):
         """
         Predicts when wickets fall for a legal delivery, the dismissal kind and runs scored.
-        Updates matches_df directly with the details.
+        Updates outcomes directly with the details.
         """
         # Set up details for legal delivery
-        mask = matches_df['legal_delivery']
-
-
-        number_of_balls = len(mask[mask])
+        mask = outcomes['legal_delivery']
 
         # setup legal wicket scenarios
-        matches_df.loc[mask, 'is_wicket'] = self.legal_wickets_distribution.rvs(number_of_balls)
+        outcomes['is_wicket'][mask] = self.legal_wickets_distribution.sample(uniforms[mask, WICKET_UNIFORM],
+                                                                             buckets[mask])
 
-        wicket_mask = mask & (matches_df['is_wicket'] == 1)
-        number_of_balls = len(wicket_mask[wicket_mask])
-        dismissal_kind = self.legal_wicket_types_distribution.rvs(number_of_balls)
-        indices = np.where(dismissal_kind == 1)[1]
-        assert (len(indices) == number_of_balls)
+        wicket_mask = mask & (outcomes['is_wicket'] == 1)
+        outcomes['dismissal_kind'][wicket_mask] = \
+            self.legal_wicket_types_distribution.sample(uniforms[wicket_mask, WICKET_TYPE_UNIFORM],
+                                                        buckets[wicket_mask])
+        outcomes['batter_runs'][wicket_mask] = \
+            self.legal_wicket_single_distribution.sample(uniforms[wicket_mask, WICKET_SINGLE_UNIFORM],
+                                                         buckets[wicket_mask])
 
-        matches_df.loc[wicket_mask, 'dismissal_kind'] = [self.legal_wicket_types[i] for i in indices]
-        matches_df.loc[wicket_mask, 'batter_runs'] = self.legal_wicket_single_distribution.rvs(number_of_balls)
-
-        self.predict_runout_details(matches_df, wicket_mask)
+        self.predict_runout_details(outcomes, wicket_mask, uniforms, buckets)
 
     def predict_legal_outcomes(self,
-                               matches_df,
-                               use_inferential_model):
+                               state,
+                               outcomes,
+                               use_inferential_model,
+                               uniforms,
+                               buckets):
         """
         Predicts outcomes on a legal delivery, including batter_runs, extras and wickets
-        Updates matches_df directly with the details.
+        Updates outcomes directly with the details.
         """
         # Set up details for legal delivery
-        mask = matches_df['legal_delivery']
+        mask = outcomes['legal_delivery']
 
-        self.predict_legal_wickets(matches_df)
+        self.predict_legal_wickets(outcomes, uniforms, buckets)
 
         # Setup legal non-wicket scenarios
-        mask = mask & (matches_df['is_wicket'] == 0)
-        number_of_balls = len(mask[mask])
+        mask = mask & (outcomes['is_wicket'] == 0)
 
         # Set up legal delivery batting runs
 
         if not use_inferential_model:
-            batting_runs = self.batter_runs_distribution.rvs(number_of_balls)
-            matches_df.loc[mask, 'batter_runs'] = np.where(batting_runs == 1)[1]
+            outcomes['batter_runs'][mask] = self.batter_runs_distribution.sample(uniforms[mask, BATTER_RUNS_UNIFORM],
+                                                                                 buckets[mask])
         else:
-            match_state_df = matches_df.loc[mask]
+            match_state_df = pd.DataFrame({column: np.asarray(values)[mask] for column, values in state.items()})
             if not(match_state_df.empty):
-                inferred_batting_runs = self.batter_runs_model.get_batter_runs_given_match_state(match_state_df)
-                matches_df.loc[mask, 'batter_runs'] = inferred_batting_runs['batter_runs'].values
+                # The model draws with the uniforms of the scenario streams, like the statistical model
+                inferred_batting_runs = self.batter_runs_model.get_batter_runs_given_match_state(
+                    match_state_df, uniforms[mask, BATTER_RUNS_UNIFORM])
+                outcomes['batter_runs'][mask] = inferred_batting_runs['batter_runs'].values
             else:
                 logging.debug("Got empty match state df, bypassing inferential model")
 
         # set up extras for legal deliveries
-        extras_mask = mask & (matches_df['batter_runs'] == 0)
-        number_of_balls = len(extras_mask[extras_mask])
-        matches_df.loc[extras_mask, 'extras'] = self.extras_if_legal_no_run_distribution.rvs(number_of_balls)
+        extras_mask = mask & (outcomes['batter_runs'] == 0)
+        outcomes['extras'][extras_mask] = \
+            self.extras_if_legal_no_run_distribution.sample(uniforms[extras_mask, EXTRAS_UNIFORM],
+                                                            buckets[extras_mask])
 
-    def predict_non_legal_wicket_outcomes(self, matches_df):
+    def predict_non_legal_wicket_outcomes(self, outcomes, uniforms, buckets):
         """
         Predicts the probability of a wicket on a non-legal delivery and sets its corresponding outcomes
-        Updates matches_df directly with the details.
+        Updates outcomes directly with the details.
         """
         # Set up details for legal delivery
-        mask = ~matches_df['legal_delivery']
-        number_of_balls = len(mask[mask])
+        mask = ~outcomes['legal_delivery']
 
         # setup legal wicket scenarios
-        matches_df.loc[mask, 'is_wicket'] = self.non_legal_wickets_distribution.rvs(number_of_balls)
-
-        wicket_mask = mask & (matches_df['is_wicket'] == 1)
-        number_of_balls = len(wicket_mask[wicket_mask])
-        dismissal_kind = self.non_legal_wicket_types_distribution.rvs(number_of_balls)
-        indices = np.where(dismissal_kind == 1)[1]
-        assert (len(indices) == number_of_balls)
+        outcomes['is_wicket'][mask] = self.non_legal_wickets_distribution.sample(uniforms[mask, WICKET_UNIFORM],
+                                                                                 buckets[mask])
 
-        matches_df.loc[wicket_mask, 'dismissal_kind'] = [self.non_legal_wicket_types[i] for i in indices]
-        matches_df.loc[wicket_mask, 'batter_runs'] = self.non_legal_wicket_single_distribution.rvs(number_of_balls)
+        wicket_mask = mask & (outcomes['is_wicket'] == 1)
+        outcomes['dismissal_kind'][wicket_mask] = NON_LEGAL_DISMISSAL_OFFSET + \
+            self.non_legal_wicket_types_distribution.sample(uniforms[wicket_mask, WICKET_TYPE_UNIFORM],
+                                                            buckets[wicket_mask])
+        outcomes['batter_runs'][wicket_mask] = \
+            self.non_legal_wicket_single_distribution.sample(uniforms[wicket_mask, WICKET_SINGLE_UNIFORM],
+                                                             buckets[wicket_mask])
 
         # set up extras for non-legal wickets
-        extras = self.non_legal_wicket_extras_distribution.rvs(number_of_balls)
-        matches_df.loc[wicket_mask, 'extras'] = np.where(extras == 1)[1]
+        outcomes['extras'][wicket_mask] = \
+            self.non_legal_wicket_extras_distribution.sample(uniforms[wicket_mask, EXTRAS_UNIFORM],
+                                                             buckets[wicket_mask])
 
-        self.predict_runout_details(matches_df, wicket_mask)
+        self.predict_runout_details(outcomes, wicket_mask, uniforms, buckets)
 
-    def predict_non_legal_outcomes(self, matches_df):
+    def predict_non_legal_outcomes(self, outcomes, uniforms, buckets):
         """
         Predicts outcomes on a legal delivery, including batter_runs, extras and wickets
+        Updates outcomes directly with the details.
         """
-        mask = ~matches_df['legal_delivery']
+        mask = ~outcomes['legal_delivery']
 
-        number_of_balls = len(mask[mask])
-        non_legal_delivery = self.non_legal_deliveries_distribution.rvs(number_of_balls)
-        indices = np.where(non_legal_delivery == 1)[1]
-        assert (len(indices) == number_of_balls)
+        codes = self.non_legal_deliveries_distribution.sample(uniforms[mask, NON_LEGAL_DELIVERY_TYPE_UNIFORM],
+                                                              buckets[mask])
 
-        matches_df.loc[mask, "wides"] = [1 if i == 0 else 0 for i in indices]
-        matches_df.loc[mask, "noballs"] = [1 if i == 1 else 0 for i in indices]
+        outcomes["wides"][mask] = (codes == 0)
+        outcomes["noballs"][mask] = (codes == 1)
 
-        self.predict_non_legal_wicket_outcomes(matches_df)
+        self.predict_non_legal_wicket_outcomes(outcomes, uniforms, buckets)
 
         # Predict extras for non-legal deliveries
-        mask = mask & (matches_df['is_wicket'] == 0)
-        number_of_balls = len(mask[mask])
+        mask = mask & (outcomes['is_wicket'] == 0)
 
         # Set up non-legal delivery extra runs
-        extra_runs = self.non_legal_extras_distribution.rvs(number_of_balls)
-        matches_df.loc[mask, 'extras'] = np.where(extra_runs == 1)[1]
+        outcomes['extras'][mask] = self.non_legal_extras_distribution.sample(uniforms[mask, EXTRAS_UNIFORM],
+                                                                             buckets[mask])
 
         # Set up non-legal delivery batter runs
-        batter_runs = self.non_legal_batter_runs_distribution.rvs(number_of_balls)
-        matches_df.loc[mask, 'batter_runs'] = np.where(batter_runs == 1)[1]
+        outcomes['batter_runs'][mask] = \
+            self.non_legal_batter_runs_distribution.sample(uniforms[mask, BATTER_RUNS_UNIFORM], buckets[mask])
+
+    def predict_outcomes(self, state, uniforms, use_inferential_model=False, buckets=None) -> dict:
+        """
+        Predicts the outcome of the current delivery of a batch of matches.
+        state is a dict of equal length arrays representing the current state of the matches up until the delivery is
+        bowled, one entry per match - the same columns as MatchStateStore.get_state_arrays(). The statistical model
+        doesn't look at the state, the inferential model needs the columns it was trained on.
+        uniforms is the buffer of uniform random numbers for the ball, of shape (number of matches, UNIFORMS_PER_BALL)
+        and aligned with state. Each random decision on a delivery uses its own column of the buffer.
+        buckets is the bucket of the outcome tables for each match (see get_outcome_buckets()), looked up from the
+        venue, over & previous_number_of_wickets of the state if not specified.
+        Returns a dict of outcome arrays - legal_delivery, batter_runs, extras, is_wicket, dismissal_kind,
+        non_striker_dismissed, is_direct_runout, noballs & wides. Dismissal kinds are integer codes (see
+        dismissal_kinds.py), NO_DISMISSAL if there was no wicket. The player dismissed is the non striker if
+        non_striker_dismissed is set, else the batter.
+        """
+        number_of_balls = len(uniforms)
+        if buckets is None:
+            buckets = self.get_outcome_buckets(state['venue'], state['over'], state['previous_number_of_wickets'])
+
+        # Setup defaults before predicting specific
+        outcomes = {
+            'legal_delivery':
+                self.legal_delivery_distribution.sample(uniforms[:, LEGAL_DELIVERY_UNIFORM], buckets) == 1,
+            'batter_runs': np.zeros(number_of_balls, dtype=np.int64),
+            'extras': np.zeros(number_of_balls, dtype=np.int64),
+            'is_wicket': np.zeros(number_of_balls, dtype=np.int64),
+            'dismissal_kind': np.full(number_of_balls, NO_DISMISSAL, dtype=np.int64),
+            'non_striker_dismissed': np.zeros(number_of_balls, dtype=np.int64),
+            'is_direct_runout': np.zeros(number_of_balls, dtype=np.int64),
+            'noballs': np.zeros(number_of_balls, dtype=np.int64),
+            'wides': np.zeros(number_of_balls, dtype=np.int64)
+        }
+
+        self.predict_legal_outcomes(state,
+                                    outcomes,
+                                    use_inferential_model,
+                                    uniforms,
+                                    buckets)
+        self.predict_non_legal_outcomes(outcomes, uniforms, buckets)
+        return outcomes
 
     def predict_ball_by_ball_outcome(self,
                                      matches_df,
-                                     use_inferential_model):
+                                     use_inferential_model,
+                                     uniforms):
         """
         This function assumes that the matches_df represents the current state of the match up until the specified
         ball is bowled, and then predicts the outcome of the current delivery.
         matches_df must contain one row per match, representing a summary of the current match state.
+        uniforms is the buffer of uniform random numbers for the ball, of shape (number of rows, UNIFORMS_PER_BALL) and
+        aligned with the rows of matches_df. Each random decision on a delivery uses its own column of the buffer.
+        DataFrame adapter of predict_outcomes() - the outcomes are added as columns of matches_df, with the dismissal
+        kinds as labels & the player dismissed filled in.
         """
-        match_count = len(matches_df.index)
+        state_df = matches_df.reset_index()
+        state = {column: state_df[column].values for column in state_df.columns}
+        outcomes = self.predict_outcomes(state, uniforms, use_inferential_model)
 
-        is_legal_delivery = self.legal_delivery_distribution.rvs(match_count,
-                                                                 random_state=np.random.randint(low=3)) == 1
-        # Setup defaults before predicting specific
-        matches_df['legal_delivery'] = is_legal_delivery
-
-        matches_df['batter_runs'] = 0
-        matches_df['extras'] = 0
-        matches_df['is_wicket'] = 0
-        matches_df['dismissal_kind'] = 'nan'
-        matches_df['non_striker_dismissed'] = 0
-        matches_df['player_dismissed'] = 'nan'
-        matches_df['is_direct_runout'] = 0
-        matches_df['noballs'] = 0
-        matches_df['wides'] = 0
-
-        self.predict_legal_outcomes(matches_df,
-                                    use_inferential_model)
-        self.predict_non_legal_outcomes(matches_df)
+        outcomes['player_dismissed'] = get_players_dismissed(outcomes, state['batter'], state['non_striker'])
+        outcomes['dismissal_kind'] = decode_dismissal_kinds(outcomes['dismissal_kind'])
+        for column, values in outcomes.items():
+            matches_df[column] = values
 
     def setup(self, use_inferential_model):
         """
@@ -256,8 +320,19 @@ class PredictiveUtils:
         logging.debug("getting all innings and matches")
         self.all_innings_df, self.all_matches_df = self.data_selection.get_all_innings_and_matches()
 
-        self.set_of_all_bowlers = set(self.all_innings_df['bowler'].unique())
+        # Integer player ids - a player's id is its position in player_keys. The eligible bowler table is indexed by
+        # player id, and lists whether the player has bowled in the historical data.
+        logging.debug("building player ids & eligible bowlers")
+        all_player_keys = np.concatenate([self.data_selection.get_all_players()['key'].values,
+                                          self.all_innings_df['bowler'].values])
+        self.player_keys = pd.Index(pd.unique(all_player_keys))
+        self.is_eligible_bowler = self.player_keys.isin(self.all_innings_df['bowler'].unique())
 
+        logging.debug("building the outcome probability tables")
+        self.setup_outcome_tables()
+
+        logging.debug("calculating toss probabilities")
+        self.toss_winner_action_probability_df = self.calculate_probability_toss_winner_fields_first()
 
         logging.debug("getting featured players")
         self.featured_player_df = self.data_selection.get_frequent_players_universe()
@@ -270,29 +345,125 @@ class PredictiveUtils:
         self.is_setup = True
 
 
-    def populate_bowler_for_state(self, match_key: str, bowling_team: str,
-                                  over: int, previous_bowler: str, playing_xi: list) -> str:
+    def setup_outcome_tables(self):
         """
-        Calculate the bowler for the current state of the match using a random selection from available bowlers
+        Replaces the fixed delivery outcome distributions with empirical tables by venue, phase & wickets fallen,
+        counted from the training innings (see OutcomeProbabilityTables) - the fixed distributions are their priors.
+        The fixed distributions are kept if no training tournaments are selected.
         """
-        available_bowlers = playing_xi.copy()
-        if previous_bowler in available_bowlers:
-            available_bowlers.remove(previous_bowler)
+        if len(self.data_selection.historical_data_helper.tournaments.get_selected_training_tournaments()) == 0:
+            logging.warning("No training tournaments are selected, using the fixed outcome distributions")
+            return
+
+        innings_df = self.data_selection.get_innings_for_selected_matches(False)
+        matches_df = self.data_selection.get_selected_matches(False)
+        innings_df = pd.merge(innings_df, matches_df[['key', 'venue']], left_on='match_key', right_on='key')
 
-        bowler_list = list(set(available_bowlers) & self.set_of_all_bowlers)
+        priors = {name: getattr(self, name).probabilities for name in OUTCOME_DISTRIBUTIONS}
+        self.outcome_tables = OutcomeProbabilityTables(innings_df, priors)
+        for name in OUTCOME_DISTRIBUTIONS:
+            setattr(self, name, CategoricalSampler(self.outcome_tables.probabilities[name]))
+        logging.debug(f"Outcome tables built from {self.outcome_tables.number_of_deliveries} deliveries")
+
+    def get_venue_offsets(self, venues) -> np.ndarray:
+        """
+        Returns the first bucket of the outcome tables for each venue, 0 if the fixed distributions are used
+        """
+        if self.outcome_tables is None:
+            return np.zeros(len(venues), dtype=np.int64)
+        return self.outcome_tables.get_venue_offsets(venues)
+
+    def get_over_wickets_buckets(self) -> np.ndarray:
+        """
+        Returns the bucket of the outcome tables within a venue for each over (0 to 19) & wickets fallen (0 to 10),
+        all 0 if the fixed distributions are used
+        """
+        if self.outcome_tables is None:
+            return np.zeros((20, 11), dtype=np.int64)
+        return self.outcome_tables.over_wickets_buckets
 
-        if len(bowler_list) > 0:
-            return random.choice(bowler_list)
+    def get_outcome_buckets(self, venues, over, wickets, venue_offsets=None) -> np.ndarray:
+        """
+        Returns the bucket of the outcome tables for each delivery, given its venue (or the venue offset from
+        get_venue_offsets()), 0 based over & wickets fallen
+        """
+        if venue_offsets is None:
+            venue_offsets = self.get_venue_offsets(venues)
+        return venue_offsets + self.get_over_wickets_buckets()[np.asarray(over), np.minimum(wickets, 10)]
 
-        logging.warning(f"Could not find a bowler randomly {bowling_team} / {over} / {available_bowlers}")
+    def get_over_outcomes_table(self) -> OverOutcomesTable:
+        """
+        Returns the empirical distribution of whole overs used by the over engine, built from all the historical innings
+        on first use. setup() must have been called.
+        """
+        if self.over_outcomes_table is None:
+            logging.debug("building the over outcomes table")
+            self.over_outcomes_table = OverOutcomesTable(self.all_innings_df)
+        return self.over_outcomes_table
 
-        # Catch all if we couldn't find a bowler key yet - this assumes that the playing xi is usually sorted to
-        # list the batters first & then the all-rounders and then the bowlers
-        bowler_key = playing_xi[-1]
-        if bowler_key == previous_bowler:
-            bowler_key = playing_xi[-2]
+    def get_player_ids(self, player_keys, register=False) -> np.ndarray:
+        """
+        Maps player keys to their integer player ids. Players who are not known get an id of -1, unless register is
+        set - in which case they are given new ids (and are not eligible bowlers).
+        """
+        player_keys = np.asarray(player_keys, dtype=object)
+        if register:
+            new_player_keys = pd.Index(pd.unique(player_keys.ravel())).difference(self.player_keys)
+            if len(new_player_keys) > 0:
+                self.player_keys = self.player_keys.append(new_player_keys)
+                self.is_eligible_bowler = np.concatenate([self.is_eligible_bowler,
+                                                          np.zeros(len(new_player_keys), dtype=bool)])
+        return self.player_keys.get_indexer(player_keys.ravel()).reshape(player_keys.shape)
+
+    def get_player_keys(self, player_ids) -> np.ndarray:
+        """
+        Maps integer player ids back to player keys. An id of -1 (used for padding) maps to ''.
+        """
+        player_keys = np.append(self.player_keys.values.astype(object), '')
+        return player_keys[player_ids]
 
-        return bowler_key
+    def generate_bowling_plans(self, playing_xi_ids, playing_xi_size, uniforms) -> np.ndarray:
+        """
+        Generates the bowler of each of the 20 overs of an innings, for many innings in one pass. Each over is bowled by
+        a random eligible bowler from the bowling playing xi, who didn't bowl the previous over and hasn't yet bowled
+        4 overs. If there is no such bowler, the last player of the playing xi who can bowl the over is chosen - this
+        assumes that the playing xi is usually sorted to list the batters first & then the all-rounders and bowlers.
+        :param playing_xi_ids: The player ids of the bowling playing xi, one row per innings, padded with -1
+        :param playing_xi_size: The size of each playing xi
+        :param uniforms: Uniform random numbers in [0, 1) of shape (number of innings, 20), one per over
+        :return: The bowler of each over as a position in the playing xi, of shape (number of innings, 20)
+        """
+        number_of_innings, width = playing_xi_ids.shape
+        rows = np.arange(number_of_innings)
+        columns = np.arange(width)
+
+        in_playing_xi = columns[np.newaxis, :] < playing_xi_size[:, np.newaxis]
+        eligible = in_playing_xi & (playing_xi_ids >= 0) & self.is_eligible_bowler[np.maximum(playing_xi_ids, 0)]
+
+        overs_bowled = np.zeros((number_of_innings, width), dtype=np.int64)
+        previous_bowler = np.full(number_of_innings, -1, dtype=np.int64)
+        bowling_plans = np.zeros((number_of_innings, 20), dtype=np.int64)
+        for over in range(0, 20):
+            can_bowl = in_playing_xi & (overs_bowled < 4) & (columns[np.newaxis, :] != previous_bowler[:, np.newaxis])
+            available = can_bowl & eligible
+            number_available = available.sum(axis=1)
+
+            # Pick the k-th available bowler, for a random k
+            choice = np.minimum((uniforms[:, over] * number_available).astype(np.int64),
+                                np.maximum(number_available - 1, 0))
+            bowler = np.argmax(np.cumsum(available, axis=1) > choice[:, np.newaxis], axis=1)
+
+            # Fallback to the last player who can bowl the over
+            no_bowler = number_available == 0
+            if no_bowler.any():
+                logging.warning(f"Could not find a bowler randomly for {no_bowler.sum()} innings in over {over}")
+                bowler[no_bowler] = width - 1 - np.argmax(can_bowl[no_bowler, ::-1], axis=1)
+
+            bowling_plans[:, over] = bowler
+            overs_bowled[rows, bowler] += 1
+            previous_bowler = bowler
+
+        return bowling_plans
 
     def calculate_probability_toss_winner_fields_first(self) -> pd.DataFrame:
         """
@@ -311,50 +482,37 @@ class PredictiveUtils:
 
         return frequencies_df
 
-    def compute_toss_results(self, scenario_and_match_df, number_of_scenarios, number_of_matches):
+    def compute_toss_results(self, scenario_and_match_df, random_streams):
         """
         For the set of matches (key = scenario & match_key), calculate the toss winners & their actions, and update
-        the scenario_and_match_df.
+        the scenario_and_match_df. The toss for each row is drawn from the stream of its scenario in random_streams.
         """
+        # One uniform for the toss winner & one for their decision, per row. setup() must have been called.
+        uniforms = random_streams.random(scenario_and_match_df['scenario_number'].values, 2)
 
         # 50% probability of either team winning the toss
-        toss_won_by_team1_bernoulli = sps.bernoulli(p=0.5)
-        scenario_and_match_df['toss_winner'] = scenario_and_match_df['team2']
-        scenario_and_match_df['toss_loser'] = scenario_and_match_df['team1']
-        mask = pd.Series(toss_won_by_team1_bernoulli.rvs(number_of_scenarios * number_of_matches,
-                                                         random_state=np.random.randint(low=3)) == 1)
+        toss_won_by_team1_bernoulli = BernoulliSampler(p=0.5)
+        team1 = scenario_and_match_df['team1'].values
+        team2 = scenario_and_match_df['team2'].values
+        toss_won_by_team1 = toss_won_by_team1_bernoulli.sample(uniforms[:, 0]) == 1
+        scenario_and_match_df['toss_winner'] = np.where(toss_won_by_team1, team1, team2)
+        scenario_and_match_df['toss_loser'] = np.where(toss_won_by_team1, team2, team1)
+
+        # Look up the probability of fielding first for the toss winner & venue, using the mean probability for
+        # combinations which haven't been seen before
+        toss_winner_action_probability_df = self.toss_winner_action_probability_df
+        rows = toss_winner_action_probability_df.index.get_indexer(
+            pd.MultiIndex.from_arrays([scenario_and_match_df['toss_winner'], scenario_and_match_df['venue']]))
+        probability_field_first = np.where(rows >= 0,
+                                           toss_winner_action_probability_df['probability'].values[rows],
+                                           toss_winner_action_probability_df['probability'].mean())
+
+        # Calculate the toss action by sampling from the distribution for the venue & toss winner
+        field_first = uniforms[:, 1] < probability_field_first
+        scenario_and_match_df['toss_decision'] = np.where(field_first, 'field', 'bat')
+
+        toss_winner = scenario_and_match_df['toss_winner'].values
+        toss_loser = scenario_and_match_df['toss_loser'].values
+        scenario_and_match_df['bowling_team'] = np.where(field_first, toss_winner, toss_loser)
+        scenario_and_match_df['batting_team'] = np.where(field_first, toss_loser, toss_winner)
 
-        scenario_and_match_df.loc[mask, 'toss_winner'] = scenario_and_match_df['team1']
-        scenario_and_match_df.loc[mask, 'toss_loser'] = scenario_and_match_df['team2']
-
-        toss_winner_action_probability_df = self.calculate_probability_toss_winner_fields_first()
-
-        scenario_and_match_df['toss_decision'] = 'bat'
-
-        # Calculate the toss action by looking at the distribution for the venue & toss winner
-        for g, g_df in scenario_and_match_df.groupby(['toss_winner', 'venue']):
-            if g in toss_winner_action_probability_df.index:
-                probability_field_first = toss_winner_action_probability_df.loc[g]['probability']
-            else:
-                probability_field_first = toss_winner_action_probability_df['probability'].mean()
-            field_first_bernoulli = sps.bernoulli(p=probability_field_first)
-            mask = (field_first_bernoulli.rvs(len(g_df.index), random_state=np.random.randint(low=3)) == 1)
-
-            g_df.loc[mask, 'toss_decision'] = 'field'
-            scenario_and_match_df.loc[g_df.index, 'toss_decision'] = g_df['toss_decision']
-
-        scenario_and_match_df['bowling_team'] = scenario_and_match_df['toss_winner']
-        scenario_and_match_df['batting_team'] = scenario_and_match_df['toss_loser']
-        mask = scenario_and_match_df['toss_decision'] == 'bat'
-        scenario_and_match_df.loc[mask, 'bowling_team'] = scenario_and_match_df['toss_loser']
-        scenario_and_match_df.loc[mask, 'batting_team'] = scenario_and_match_df['toss_winner']
-
-
-
-def update_match_state(row, matches_dict):
-    """
-    Helper function to update the match state corresponding to the row
-    """
-    scenario = row.name[0]
-    key = row.name[1]
-    return matches_dict[(scenario, key)].update_state(row)
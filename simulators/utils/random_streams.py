@@ -0,0 +1,166 @@
+import numpy as np
+
+# A scenario has a separate stream for each kind of random draw, so that the draws of one kind do not shift the draws
+# of another. This lets the engines make the draws in a different order and still see the same random numbers.
+MATCH_STREAM = 0
+BOWLING_STREAM = 1
+DELIVERY_STREAM = 2
+
+# Number of deliveries per match drawn in one go by DeliveryUniforms
+DELIVERY_BLOCK_SIZE = 32
+
+# Largest uniform handed out, so that the antithetic uniforms 1 - u stay in [0, 1)
+MAX_UNIFORM = np.nextafter(1.0, 0.0)
+
+
+class ScenarioRandomStreams:
+    """
+    Maintains independent numpy random Generators per scenario, derived from a master seed. A scenario's seed sequence
+    is the same as the corresponding child of SeedSequence(seed).spawn(), and each of its streams is a child of that,
+    which means the streams only depend on the master seed & the scenario number. All random draws made while
+    simulating a scenario come from its streams, so scenarios can be simulated in any order, or split across threads /
+    processes, and still give the same results for a given seed.
+    Since the random numbers of a scenario only depend on the seed, simulators which share a seed see common random
+    numbers - the same tosses, bowling plans & delivery uniforms per scenario.
+    In antithetic mode, the scenarios are paired up as (0, 1), (2, 3)... and the odd scenario of each pair replays the
+    streams of the even one, flipped to 1 - u. The two scenarios of a pair are negatively correlated, which reduces the
+    variance of averages across scenarios.
+    In nested mode, the scenarios are grouped as [0, M), [M, 2M)... and every scenario of a group replays the match
+    stream of the first scenario of the group, so the scenarios of a group see the same tosses & can share their first
+    innings (see MatchStateStore).
+    """
+
+    def __init__(self, seed=None, antithetic=False, nested_group_size=1):
+        """
+        :param seed: The master seed. If None, fresh entropy is drawn from the OS - the resulting seed is available in
+        self.seed so that the run can be reproduced.
+        :param antithetic: If True, odd scenarios draw the antithetic uniforms of the preceding even scenario
+        :param nested_group_size: The number of scenarios per nested group - 1 if the scenarios are not nested
+        """
+        if antithetic and (nested_group_size > 1):
+            raise ValueError("Antithetic scenarios can't be nested")
+        self.seed_sequence = np.random.SeedSequence(seed)
+        self.seed = self.seed_sequence.entropy
+        self.antithetic = antithetic
+        self.nested_group_size = nested_group_size
+        self.generators = {}
+
+    def is_antithetic_scenario(self, scenario_number) -> bool:
+        """
+        Returns True if the scenario draws the antithetic uniforms of the preceding scenario
+        """
+        return self.antithetic and (int(scenario_number) % 2 == 1)
+
+    def get_source_scenario_number(self, scenario_number, stream) -> int:
+        """
+        Returns the scenario whose stream is replayed for the stream of the scenario - the scenario itself, unless it is
+        an antithetic scenario or a nested scenario sharing the match stream of its group
+        """
+        scenario_number = int(scenario_number)
+        if self.is_antithetic_scenario(scenario_number):
+            return scenario_number - 1
+        if stream == MATCH_STREAM:
+            return scenario_number - scenario_number % self.nested_group_size
+        return scenario_number
+
+    def get_seed_sequence(self, scenario_number, stream=None) -> np.random.SeedSequence:
+        """
+        Returns the seed sequence of the scenario, equivalent to the scenario_number'th child spawned from the master
+        seed sequence. If stream is specified, returns the seed sequence of that stream of the scenario instead.
+        """
+        spawn_key = self.seed_sequence.spawn_key + (int(scenario_number),)
+        if stream is not None:
+            spawn_key += (int(stream),)
+        return np.random.SeedSequence(self.seed_sequence.entropy, spawn_key=spawn_key)
+
+    def get_generator(self, scenario_number, stream=MATCH_STREAM) -> np.random.Generator:
+        """
+        Returns the random Generator for the stream of the scenario, creating it on first use. The generator of an
+        antithetic or nested scenario is a separate replay of the stream of its source scenario (see
+        get_source_scenario_number()).
+        """
+        key = (int(scenario_number), int(stream))
+        if key not in self.generators:
+            source_scenario_number = self.get_source_scenario_number(key[0], key[1])
+            self.generators[key] = np.random.default_rng(self.get_seed_sequence(source_scenario_number, key[1]))
+        return self.generators[key]
+
+    def random(self, scenario_numbers, shape=None, stream=MATCH_STREAM) -> np.ndarray:
+        """
+        Draws uniform random numbers in [0, 1) for each entry of scenario_numbers, from the stream of the
+        corresponding scenario. Entries belonging to the same scenario consume its stream in the order they appear.
+        :param shape: If specified (as an int or tuple), an array of this shape is drawn per entry & the result has the
+        shape (len(scenario_numbers), *shape). Otherwise one uniform is drawn per entry.
+        :param stream: The stream of the scenario to draw from
+        """
+        scenario_numbers = np.asarray(scenario_numbers)
+        if shape is None:
+            shape = ()
+        elif np.isscalar(shape):
+            shape = (shape,)
+        shape = tuple(shape)
+        draws = np.empty((len(scenario_numbers),) + shape, dtype=np.float64)
+        if len(scenario_numbers) == 0:
+            return draws
+
+        order = np.argsort(scenario_numbers, kind='stable')
+        scenarios, starts, counts = np.unique(scenario_numbers[order], return_index=True, return_counts=True)
+        for scenario_number, start, count in zip(scenarios, starts, counts):
+            uniforms = self.get_generator(scenario_number, stream).random((count,) + shape)
+            if self.is_antithetic_scenario(scenario_number):
+                uniforms = np.minimum(1.0 - uniforms, MAX_UNIFORM)
+            draws[order[start:start + count]] = uniforms
+        return draws
+
+
+class DeliveryUniforms:
+    """
+    The uniform random numbers used for each delivery of a set of matches - a row of width uniforms per (match,
+    delivery number). The rows are drawn from the delivery stream of each match's scenario, in blocks of block_size
+    deliveries for all the matches at once. So the random numbers used for a delivery only depend on the seed, the
+    scenario, the position of the match within the scenario & the delivery number - not on the order the engine plays
+    the deliveries in.
+    """
+
+    def __init__(self, random_streams, scenario_numbers, width, block_size=DELIVERY_BLOCK_SIZE):
+        """
+        :param random_streams: The ScenarioRandomStreams to draw from
+        :param scenario_numbers: The scenario number of each match
+        :param width: The number of uniforms per delivery
+        :param block_size: The number of deliveries per block
+        """
+        self.random_streams = random_streams
+        self.scenario_numbers = np.asarray(scenario_numbers)
+        self.width = width
+        self.block_size = block_size
+        self.block_number = -1
+        self.block = np.empty((len(self.scenario_numbers), block_size, width), dtype=np.float64)
+
+    def get_block(self, block_number) -> np.ndarray:
+        """
+        Returns the uniforms for deliveries [block_number * block_size, (block_number + 1) * block_size) of all the
+        matches, of shape (number of matches, block_size, width). Blocks must be requested in increasing order.
+        """
+        if block_number < self.block_number:
+            raise ValueError(f"Block {block_number} was requested after block {self.block_number}")
+
+        while self.block_number < block_number:
+            self.block = self.random_streams.random(self.scenario_numbers, (self.block_size, self.width),
+                                                    stream=DELIVERY_STREAM)
+            self.block_number += 1
+        return self.block
+
+    def get(self, positions, delivery_numbers) -> np.ndarray:
+        """
+        Returns the row of uniforms for each (match position, 0 based delivery number) pair. All the delivery numbers
+        must fall in the same block.
+        """
+        delivery_numbers = np.asarray(delivery_numbers)
+        block_numbers = np.unique(delivery_numbers // self.block_size)
+        if len(block_numbers) == 0:
+            return np.empty((0, self.width), dtype=np.float64)
+        if len(block_numbers) > 1:
+            raise ValueError(f"Deliveries span more than one block: {block_numbers}")
+
+        block = self.get_block(block_numbers[0])
+        return block[positions, delivery_numbers % self.block_size]
@@ -0,0 +1,57 @@
+import numpy as np
+
+
+class CategoricalSampler:
+    """
+    Draws category codes from a fixed categorical distribution. The cumulative probability table is computed once, and
+    each draw maps a uniform random number in [0, 1) to a category by a binary search of the table, so sampling a
+    batch of n balls needs no more than the n uniforms & the n codes returned.
+
+    The sampler may also hold a table of distributions over the same categories, one row per bucket (see
+    OutcomeProbabilityTables) - each draw then looks up the row of its bucket.
+    """
+
+    def __init__(self, probabilities):
+        """
+        :param probabilities: The probability of each category, indexed by category code - or a 2-d array of them, one
+        row per bucket
+        """
+        self.probabilities = np.asarray(probabilities, dtype=np.float64)
+        cumulative_probabilities = np.cumsum(self.probabilities, axis=-1)
+        # Guard against the probabilities not adding up to exactly 1
+        self.cumulative_probabilities = cumulative_probabilities / cumulative_probabilities[..., -1:]
+        self.number_of_categories = self.probabilities.shape[-1]
+
+    @property
+    def is_bucketed(self) -> bool:
+        return self.probabilities.ndim == 2
+
+    def sample(self, uniforms, buckets=None) -> np.ndarray:
+        """
+        Returns the category code drawn for each of the uniform random numbers
+        :param buckets: The bucket of each draw, for a table of distributions - ignored for a single distribution
+        """
+        if not self.is_bucketed:
+            codes = np.searchsorted(self.cumulative_probabilities, uniforms, side='right')
+        else:
+            uniforms = np.asarray(uniforms)
+            codes = (self.cumulative_probabilities[buckets] <= uniforms[:, np.newaxis]).sum(axis=1)
+        return np.minimum(codes, self.number_of_categories - 1)
+
+    def __str__(self):
+        if self.is_bucketed:
+            return f"CategoricalSampler: {len(self.probabilities)} buckets of {self.number_of_categories} categories"
+        return f"CategoricalSampler: {self.probabilities.tolist()}"
+
+
+class BernoulliSampler(CategoricalSampler):
+    """
+    Draws 0 / 1 outcomes with a fixed probability p of drawing 1
+    """
+
+    def __init__(self, p):
+        super().__init__([1 - p, p])
+        self.p = p
+
+    def __str__(self):
+        return f"BernoulliSampler: p = {self.p}"
@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+
+# Number of low bits of a scenario key which hold the scenario number - the rest hold the original key. This is the
+# only bound on the number of scenarios, checked by encode_scenario_keys()
+SCENARIO_KEY_BITS = 20
+MAX_NUMBER_OF_SCENARIOS = 1 << SCENARIO_KEY_BITS
+SCENARIO_NUMBER_MASK = MAX_NUMBER_OF_SCENARIOS - 1
+
+# Keys must be lesser than this to be encoded without overflowing an int64 - scenario keys can themselves be encoded
+# again (e.g. the tournament simulator's matches in the predictive simulator) as long as they stay within it
+MAX_KEY = 1 << (63 - SCENARIO_KEY_BITS)
+
+
+def encode_scenario_keys(keys, scenario_numbers) -> np.ndarray:
+    """
+    Packs (key, scenario number) pairs into compact int64 scenario keys, which are unique across scenarios. This lets
+    the matches of many scenarios be processed together as if they were different matches. scenario_numbers may also
+    be a single scenario number for all the keys.
+    """
+    keys = np.asarray(keys, dtype=np.int64)
+    scenario_numbers = np.asarray(scenario_numbers, dtype=np.int64)
+    if (scenario_numbers.size > 0) and (scenario_numbers.max() >= MAX_NUMBER_OF_SCENARIOS):
+        raise ValueError(f"Scenario numbers must be lesser than {MAX_NUMBER_OF_SCENARIOS}\n"
+                         f"Received: {scenario_numbers.max()}")
+    if (keys.size > 0) and (keys.max() >= MAX_KEY):
+        raise ValueError(f"Keys must be lesser than {MAX_KEY} to be encoded with a scenario number\n"
+                         f"Received: {keys.max()}")
+    return (keys << SCENARIO_KEY_BITS) | scenario_numbers
+
+
+def decode_scenario_keys(scenario_keys) -> np.ndarray:
+    """
+    Returns the original keys of the scenario keys built by encode_scenario_keys()
+    """
+    return np.asarray(scenario_keys, dtype=np.int64) >> SCENARIO_KEY_BITS
+
+
+def get_scenario_numbers(scenario_keys) -> np.ndarray:
+    """
+    Returns the scenario numbers of the scenario keys built by encode_scenario_keys()
+    """
+    return np.asarray(scenario_keys, dtype=np.int64) & SCENARIO_NUMBER_MASK
+
+
+def decode_scenario_key_level(df: pd.DataFrame, level='match_key') -> pd.DataFrame:
+    """
+    Replaces the scenario keys in the index level of df with the original keys, in place, and returns df. The other
+    index levels are left as they are.
+    """
+    if level in df.index.names:
+        df.index = pd.MultiIndex.from_arrays(
+            [decode_scenario_keys(df.index.get_level_values(name)) if name == level
+             else df.index.get_level_values(name) for name in df.index.names],
+            names=df.index.names)
+    return df
@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+
+from simulators.utils.ball_log import BallLog
+
+
+class ScenarioViews:
+    """
+    Per scenario views over the simulated matches, innings & player outcomes of all the scenarios. The rows of each
+    dataframe are grouped by scenario once, so a scenario is the contiguous block of rows between its boundaries & its
+    view is a positional slice of the shared dataframe - no per scenario copies are held.
+
+    The matches & player outcomes are held with their index levels as columns, which is the layout the perfect
+    simulator reads them in (see DataSelection.set_simulated_data()), so the views can be used as they are.
+    """
+
+    def __init__(self, matches_df: pd.DataFrame, ball_log: BallLog = None,
+                 player_outcomes_df: pd.DataFrame = None):
+        """
+        :param matches_df: The simulated matches, indexed by [scenario_number, match_key]
+        :param ball_log: The BallLog holding the simulated innings, or None if the innings are not held in memory. The
+        innings of a scenario are decoded from the log when asked for.
+        :param player_outcomes_df: The player outcomes of the simulated innings, indexed by
+        [scenario_number, match_key, inning, team, player_key], or None if they are not available
+        """
+        self.matches_df = self.group_by_scenario(matches_df).reset_index()
+        self.matches_boundaries = self.get_boundaries(self.get_scenario_numbers(self.matches_df))
+
+        self.ball_log = ball_log
+        self.innings_rows, self.innings_boundaries = None, None
+        if ball_log is not None:
+            self.innings_rows, scenarios, starts = ball_log.get_scenario_rows()
+            self.innings_boundaries = (scenarios, starts)
+
+        # The scenario number is dropped from the player outcomes, as the perfect simulator merges it in from the
+        # matches when it is persisted
+        self.player_outcomes_df, self.player_outcomes_boundaries = None, None
+        if player_outcomes_df is not None:
+            player_outcomes_df = self.group_by_scenario(player_outcomes_df)
+            self.player_outcomes_boundaries = self.get_boundaries(self.get_scenario_numbers(player_outcomes_df))
+            self.player_outcomes_df = player_outcomes_df.reset_index(level='scenario_number', drop=True).reset_index()
+
+    @staticmethod
+    def get_scenario_numbers(df: pd.DataFrame) -> np.ndarray:
+        """
+        Returns the scenario number of each row of df
+        """
+        if 'scenario_number' in df.columns:
+            return df['scenario_number'].values
+        return df.index.get_level_values('scenario_number').values
+
+    @staticmethod
+    def group_by_scenario(df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Returns df with its rows grouped by scenario, keeping the order of the rows within a scenario. df is returned
+        as it is if it is already grouped.
+        """
+        scenario_numbers = ScenarioViews.get_scenario_numbers(df)
+        if (len(scenario_numbers) < 2) or (np.diff(scenario_numbers) >= 0).all():
+            return df
+        return df.iloc[np.argsort(scenario_numbers, kind='stable')]
+
+    @staticmethod
+    def get_boundaries(scenario_numbers: np.ndarray) -> (np.ndarray, np.ndarray):
+        """
+        Returns the scenario numbers present in scenario_numbers (grouped by scenario), along with the position of the
+        first row of each of them (and the end of the last one)
+        """
+        scenarios, starts = np.unique(scenario_numbers, return_index=True)
+        return scenarios, np.append(starts, len(scenario_numbers))
+
+    @staticmethod
+    def get_slice(boundaries, scenario_number) -> slice:
+        """
+        Returns the slice of the positions of the rows of the scenario - an empty slice if there are none
+        """
+        scenarios, starts = boundaries
+        position = np.searchsorted(scenarios, scenario_number)
+        if (position == len(scenarios)) or (scenarios[position] != scenario_number):
+            return slice(0, 0)
+        return slice(starts[position], starts[position + 1])
+
+    def get_matches(self, scenario_number) -> pd.DataFrame:
+        """
+        Returns the view over the simulated matches of the scenario, with scenario_number & match_key as columns
+        """
+        return self.matches_df.iloc[self.get_slice(self.matches_boundaries, scenario_number)]
+
+    def get_balls(self, scenario_number) -> pd.DataFrame:
+        """
+        Returns the balls of the simulated innings of the scenario, decoded from the ball log (not indexed)
+        """
+        if self.ball_log is None:
+            raise ValueError("The simulated innings are not held in memory")
+        return self.ball_log.get_balls(self.innings_rows[self.get_slice(self.innings_boundaries, scenario_number)])
+
+    def get_innings(self, scenario_number) -> pd.DataFrame:
+        """
+        Returns the simulated innings of the scenario, decoded from the ball log & indexed by
+        [scenario_number, match_key, inning, over, ball]
+        """
+        return self.get_balls(scenario_number).set_index(BallLog.INDEX_COLUMNS)
+
+    def get_player_outcomes(self, scenario_number) -> pd.DataFrame:
+        """
+        Returns the view over the player outcomes of the scenario, with match_key, inning, team & player_key as
+        columns, or None if they are not available
+        """
+        if self.player_outcomes_df is None:
+            return None
+        return self.player_outcomes_df.iloc[self.get_slice(self.player_outcomes_boundaries, scenario_number)]
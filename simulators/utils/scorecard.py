@@ -0,0 +1,206 @@
+import numpy as np
+import pandas as pd
+
+# Sides of an innings, as indexed in the scorecard arrays
+BATTING_SIDE = 0
+BOWLING_SIDE = 1
+
+# Player key of the fielder recorded on deliveries which don't involve one, as in the simulated innings
+NO_FIELDER_KEY = 'nan'
+
+PLAYER_OUTCOMES_INDEX = ['scenario_number', 'match_key', 'inning', 'team', 'player_key']
+
+PLAYER_OUTCOMES_COLUMNS = ['total_balls', 'batting_total_balls', 'batting_total_runs',
+                           'batting_total_runs_with_extras', 'strike_rate', 'number_of_bowled_deliveries',
+                           'total_runs', 'bowling_total_runs_with_extras', 'wickets_taken', 'economy_rate',
+                           'number_of_fielding_events', 'non_striker_count']
+
+
+class ScorecardAccumulator:
+    """
+    Running per (scenario, match, innings, player) totals of the simulated deliveries, kept up to date as each
+    delivery is applied. The totals are turned into the player outcomes table of the simulated innings - the table
+    PerfectSimulator.get_outcomes_by_player_and_innings() otherwise derives from the full ball log with groupbys &
+    merges.
+
+    Players are referred to by their position in the playing xi of their side, like in the MatchStateStore. The
+    totals are held in arrays indexed by [match position, inning - 1, playing xi position]. Fielding events have an
+    extra last playing xi position for the deliveries which don't involve a fielder, since the simulated innings record
+    those with the fielder 'nan'.
+    """
+    TOTALS = ['balls_faced', 'batter_runs', 'batter_total_runs', 'non_striker_balls', 'balls_bowled', 'runs_conceded',
+              'wickets', 'runouts', 'fielding_events']
+
+    def __init__(self, scenario_number, match_key, batting_team, bowling_team, batting_playing_xi,
+                 bowling_playing_xi):
+        """
+        :param scenario_number: The scenario number of each match position
+        :param match_key: The match key of each match position
+        :param batting_team: The team batting first in each match
+        :param bowling_team: The team bowling first in each match
+        :param batting_playing_xi: The playing xi of the team batting first as player keys, of shape
+        (matches, playing xi width)
+        :param bowling_playing_xi: The playing xi of the team bowling first, in the same way
+        """
+        self.scenario_number = np.asarray(scenario_number)
+        self.match_key = np.asarray(match_key)
+        size = len(self.scenario_number)
+        playing_xi_width = np.shape(batting_playing_xi)[1] if size > 0 else 0
+
+        # The team & playing xi of both sides in each innings, indexed by [match position, inning - 1, side] - the
+        # sides swap over in the 2nd innings
+        self.teams = np.empty((size, 2, 2), dtype=object)
+        self.teams[:, 0, BATTING_SIDE] = self.teams[:, 1, BOWLING_SIDE] = batting_team
+        self.teams[:, 0, BOWLING_SIDE] = self.teams[:, 1, BATTING_SIDE] = bowling_team
+        self.playing_xi = np.empty((size, 2, 2, playing_xi_width), dtype=object)
+        self.playing_xi[:, 0, BATTING_SIDE] = self.playing_xi[:, 1, BOWLING_SIDE] = batting_playing_xi
+        self.playing_xi[:, 0, BOWLING_SIDE] = self.playing_xi[:, 1, BATTING_SIDE] = bowling_playing_xi
+
+        shape = (size, 2, playing_xi_width)
+        self.balls_faced = np.zeros(shape, dtype=np.int64)
+        self.batter_runs = np.zeros(shape, dtype=np.int64)
+        self.batter_total_runs = np.zeros(shape, dtype=np.int64)
+        self.non_striker_balls = np.zeros(shape, dtype=np.int64)
+        self.balls_bowled = np.zeros(shape, dtype=np.int64)
+        self.runs_conceded = np.zeros(shape, dtype=np.int64)
+        self.wickets = np.zeros(shape, dtype=np.int64)
+        self.runouts = np.zeros(shape, dtype=np.int64)
+        self.fielding_events = np.zeros((size, 2, playing_xi_width + 1), dtype=np.int64)
+
+    def add_deliveries(self, positions, inning, batter, non_striker, bowler, fielder, batter_runs, total_runs,
+                       is_wicket, is_runout, unique_positions=False):
+        """
+        Adds deliveries to the totals. A match position may appear more than once, unless unique_positions is set - the
+        totals are then added with plain indexing, which is much faster than np.add.at.
+        :param positions: The match position of each delivery
+        :param inning: The innings of each delivery
+        :param batter: The playing xi position of the batter (in the batting playing xi)
+        :param non_striker: The playing xi position of the non striker (in the batting playing xi)
+        :param bowler: The playing xi position of the bowler (in the bowling playing xi)
+        :param fielder: The playing xi position of the fielder (in the bowling playing xi), -1 if there was none
+        :param batter_runs: The runs scored by the batter
+        :param total_runs: The runs scored including extras
+        :param is_wicket: 1 if a wicket fell
+        :param is_runout: 1 if the wicket was a run out
+        :param unique_positions: Set True if every match position appears once at most
+        """
+        positions = np.asarray(positions)
+        if len(positions) == 0:
+            return
+        innings = np.asarray(inning) - 1
+        add = add_unique if unique_positions else np.add.at
+
+        batter_index = (positions, innings, np.asarray(batter))
+        add(self.balls_faced, batter_index, 1)
+        add(self.batter_runs, batter_index, batter_runs)
+        add(self.batter_total_runs, batter_index, total_runs)
+        add(self.non_striker_balls, (positions, innings, np.asarray(non_striker)), 1)
+
+        bowler_index = (positions, innings, np.asarray(bowler))
+        add(self.balls_bowled, bowler_index, 1)
+        add(self.runs_conceded, bowler_index, total_runs)
+        add(self.wickets, bowler_index, is_wicket)
+        add(self.runouts, bowler_index, is_runout)
+
+        fielder = np.asarray(fielder)
+        add(self.fielding_events, (positions, innings, np.where(fielder < 0, -1, fielder)), 1)
+
+    def copy_innings(self, source_positions, positions, inning):
+        """
+        Sets the totals of an innings of the matches at positions to the ones of the matches at source_positions - for
+        matches sharing the innings played by another match
+        """
+        for name in self.TOTALS:
+            values = getattr(self, name)
+            values[positions, inning - 1] = values[source_positions, inning - 1]
+
+    def get_state(self) -> dict:
+        """
+        Returns the state arrays of the totals, for checkpointing
+        """
+        return {name: value.copy() for name, value in vars(self).items() if isinstance(value, np.ndarray)}
+
+    def set_state(self, state: dict):
+        """
+        Restores the state arrays saved by get_state()
+        """
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    def get_side_rows(self, side, present) -> dict:
+        """
+        Returns the index columns of the players of a side flagged in present - a boolean array indexed like the totals
+        of the side
+        """
+        positions, innings, players = np.nonzero(present)
+        number_of_players = self.playing_xi.shape[-1]
+        player_keys = np.where(players < number_of_players,
+                               self.playing_xi[positions, innings, side, np.minimum(players, number_of_players - 1)],
+                               NO_FIELDER_KEY)
+        return {'scenario_number': self.scenario_number[positions],
+                'match_key': self.match_key[positions],
+                'inning': innings + 1,
+                'team': self.teams[positions, innings, side],
+                'player_key': player_keys.astype(object)}
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """
+        Returns the player outcomes of all the simulated innings, indexed by
+        [scenario_number, match_key, inning, team, player_key] with the PLAYER_OUTCOMES_COLUMNS. The values are the
+        ones PerfectSimulator.get_outcomes_by_player_and_innings() gets from the simulated innings, so:
+        - a statistic is NaN for players without any deliveries in that role, like after the outer merges there
+        - KNOWN DEFECT, replicated on purpose: wides & noballs are logged (as 0 / 1) on every simulated delivery, so
+        the count() of wides & noballs PerfectSimulator takes away from the balls faced & bowled counts every delivery.
+        total_balls is then 0 for every simulated player, batting_total_balls & number_of_bowled_deliveries minus
+        the number of deliveries, and the strike & economy rates inf, NaN or negative. Both paths must be fixed
+        together, see test_simulated_ball_counts_defect().
+        """
+        batting_present = (self.balls_faced > 0) | (self.non_striker_balls > 0)
+        batting_df = pd.DataFrame(self.get_side_rows(BATTING_SIDE, batting_present))
+        balls_faced = self.balls_faced[batting_present]
+        batted = balls_faced > 0
+        # Replicates the PerfectSimulator count() defect (see above) - not the number of wides & noballs faced
+        defective_wides_count = defective_noballs_count = balls_faced
+        with np.errstate(divide='ignore', invalid='ignore'):
+            batting_df['total_balls'] = np.where(batted, balls_faced - defective_wides_count, np.nan)
+            batting_df['batting_total_balls'] = \
+                np.where(batted, balls_faced - defective_wides_count - defective_noballs_count, np.nan)
+            batting_df['batting_total_runs'] = np.where(batted, self.batter_runs[batting_present], np.nan)
+            batting_df['batting_total_runs_with_extras'] = \
+                np.where(batted, self.batter_total_runs[batting_present], np.nan)
+            batting_df['strike_rate'] = 100 * batting_df['batting_total_runs'] / batting_df['total_balls']
+        non_striker_balls = self.non_striker_balls[batting_present]
+        batting_df['non_striker_count'] = np.where(non_striker_balls > 0, non_striker_balls, np.nan)
+
+        # The fielding events have the extra 'nan' fielder, which doesn't bowl
+        def with_no_fielder(totals):
+            return np.concatenate([totals, np.zeros_like(totals[:, :, -1:])], axis=2)
+
+        bowling_present = (self.fielding_events > 0) | with_no_fielder(self.balls_bowled > 0)
+        bowling_df = pd.DataFrame(self.get_side_rows(BOWLING_SIDE, bowling_present))
+        balls_bowled = with_no_fielder(self.balls_bowled)[bowling_present]
+        bowled = balls_bowled > 0
+        # Replicates the PerfectSimulator count() defect (see above) - not the number of wides & noballs bowled
+        defective_wides_count = defective_noballs_count = balls_bowled
+        with np.errstate(divide='ignore', invalid='ignore'):
+            bowling_df['number_of_bowled_deliveries'] = \
+                np.where(bowled, balls_bowled - defective_wides_count - defective_noballs_count, np.nan)
+            bowling_df['total_runs'] = np.where(bowled, with_no_fielder(self.runs_conceded)[bowling_present], np.nan)
+            bowling_df['bowling_total_runs_with_extras'] = bowling_df['total_runs']
+            bowling_df['wickets_taken'] = \
+                np.where(bowled, with_no_fielder(self.wickets - self.runouts)[bowling_present], np.nan)
+            bowling_df['economy_rate'] = bowling_df['total_runs'] / bowling_df['number_of_bowled_deliveries']
+        fielding_events = self.fielding_events[bowling_present]
+        bowling_df['number_of_fielding_events'] = np.where(fielding_events > 0, fielding_events, np.nan)
+
+        player_outcomes_df = pd.concat([batting_df, bowling_df], ignore_index=True)
+        player_outcomes_df = player_outcomes_df.reindex(columns=PLAYER_OUTCOMES_INDEX + PLAYER_OUTCOMES_COLUMNS)
+        player_outcomes_df.set_index(PLAYER_OUTCOMES_INDEX, inplace=True)
+        return player_outcomes_df
+
+
+def add_unique(totals, index, values):
+    """
+    Adds values to totals at index, like np.add.at - for an index which doesn't repeat any element
+    """
+    totals[index] += values
@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+
+
+def generate_scenarios_with_common_random_numbers(predictive_simulators, use_inferential_models, seed=None) -> int:
+    """
+    Generates the scenarios of several predictive simulators - e.g. one per model configuration - from common random
+    numbers. All the simulators are run with the same master seed, so scenario i of every simulator sees the same
+    tosses, bowling plans & delivery uniforms, and the differences between the simulators are down to the models
+    rather than the randomness. Comparisons across the simulators then need far fewer scenarios, see
+    compare_error_stats().
+    :param predictive_simulators: The predictive simulators to generate the scenarios of
+    :param use_inferential_models: Whether each of the simulators uses the inferential model, or a single value for
+    all of them
+    :param seed: The common master seed. If None, a fresh seed is drawn
+    :return: The common master seed
+    """
+    if np.isscalar(use_inferential_models):
+        use_inferential_models = [use_inferential_models] * len(predictive_simulators)
+    if len(use_inferential_models) != len(predictive_simulators):
+        raise ValueError(f"Expected {len(predictive_simulators)} values for use_inferential_models\n"
+                         f"Received: {len(use_inferential_models)}")
+
+    if seed is None:
+        seed = np.random.SeedSequence().entropy
+    for predictive_simulator, use_inferential_model in zip(predictive_simulators, use_inferential_models):
+        predictive_simulator.requested_seed = seed
+        predictive_simulator.generate_scenario(use_inferential_model=use_inferential_model)
+    return seed
+
+
+def compare_error_stats(error_df, other_error_df, metric, antithetic=False, nested_group_size=1) -> pd.DataFrame:
+    """
+    Compares a metric of the error stats of two predictive simulators (see PredictiveSimulator.get_error_stats()),
+    scenario by scenario. When the simulators were run from common random numbers, the paired differences have a much
+    lower variance than the difference of the independent means.
+    :param error_df: The error stats of the first simulator, with a scenario_number index level
+    :param other_error_df: The error stats of the second simulator, indexed in the same way
+    :param metric: The column of the error stats to compare, e.g. total_rewards_absolute_error
+    :param antithetic: Set True if the scenarios were played in antithetic pairs. The differences of each pair are
+    averaged before the standard error is calculated, since the two scenarios of a pair are not independent.
+    :param nested_group_size: The nested group size the scenarios were played with (see PredictiveSimulator). The
+    differences of each group are averaged in the same way as antithetic pairs.
+    :return: pd.DataFrame indexed like the error stats without the scenario_number level, with the columns
+    mean_difference (first - second), sd_difference, standard_error & number_of_samples - the number of independent
+    differences (scenarios, antithetic pairs or nested groups)
+    """
+    differences = (error_df[metric] - other_error_df[metric]).dropna()
+    index_names = [name for name in differences.index.names if name != 'scenario_number']
+    differences_df = differences.rename('difference').reset_index()
+
+    group_size = 2 if antithetic else nested_group_size
+    if group_size > 1:
+        differences_df['scenario_number'] = differences_df['scenario_number'] // group_size
+        differences_df = differences_df.groupby(index_names + ['scenario_number'])['difference'].mean().reset_index()
+
+    grouping = differences_df.groupby(index_names)['difference']
+    comparison_df = pd.DataFrame({'mean_difference': grouping.mean(),
+                                  'sd_difference': grouping.std(),
+                                  'number_of_samples': grouping.count()})
+    comparison_df['standard_error'] = comparison_df['sd_difference'] / np.sqrt(comparison_df['number_of_samples'])
+    return comparison_df
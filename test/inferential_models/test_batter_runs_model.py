@@ -1,5 +1,6 @@
 import pytest
-from inferential_models.batter_runs_models import BatterRunsModel
+import numpy as np
+from inferential_models.batter_runs_models import BatterRunsModel, RANDOM_SEED
 import pymc as pm
 import aesara.tensor as at
 from test.conftest import get_test_cases
@@ -43,3 +44,74 @@ class TestBatterRunsModel:
         assert predicted_batter_runs_outcomes.shape[0] == test_match_state_df.shape[0]
         assert 'batter_runs' in predicted_batter_runs_outcomes.columns
 
+
+
+
+def get_categorical_model(tmp_path):
+    """
+    Returns a BatterRunsModel holding a small categorical model with the same output variables & mutable data as the
+    trained model, along with two posterior points
+    """
+    rng = np.random.default_rng(1234)
+    with pm.Model(coords={'outcomes': np.arange(7)}) as pymc_model:
+        feature_data = pm.MutableData('feature_data', np.zeros(3))
+        outcomes_data = pm.MutableData('outcomes_data', np.zeros(3, dtype=int))
+        alpha = pm.Normal('alpha', 0, 1, dims='outcomes')
+        beta = pm.Normal('beta', 0, 1, dims='outcomes')
+        p = pm.Deterministic('probability_of_batter_runs_outcome',
+                             pm.math.softmax(alpha + beta * feature_data[:, None], axis=1))
+        pm.Categorical('batter_runs_outcome_by_ball_and_innings_rv', p=p, observed=outcomes_data,
+                       shape=feature_data.shape[0])
+
+    model = BatterRunsModel(None, model_directory_path=str(tmp_path), model_type='bayesian_inference')
+    model.pymc_model = pymc_model
+    model.posterior_point_list = [{'alpha': rng.normal(size=7), 'beta': rng.normal(size=7)} for _ in range(2)]
+    return model
+
+
+def set_feature_data(model, feature_data):
+    with model.pymc_model:
+        pm.set_data({'feature_data': feature_data, 'outcomes_data': -1 * np.ones(len(feature_data), dtype=int)})
+
+
+@pytest.mark.parametrize('number_of_balls', [5, 12])
+def test_sample_posterior_predictive_once(tmp_path, number_of_balls):
+    model = get_categorical_model(tmp_path)
+    rng = np.random.default_rng(1234)
+
+    # The compiled sampler is reused across data sizes & restarts from the seeded state on every call
+    for size in [number_of_balls, 3, number_of_balls]:
+        set_feature_data(model, rng.normal(size=size))
+        with model.pymc_model:
+            expected_draws = pm.sample_posterior_predictive(model.posterior_point_list[:1],
+                                                            return_inferencedata=False,
+                                                            random_seed=RANDOM_SEED,
+                                                            progressbar=False)
+        draws = model.sample_posterior_predictive_once()
+        assert draws.shape == (size,)
+        assert (draws == expected_draws['batter_runs_outcome_by_ball_and_innings_rv'][0]).all()
+
+
+def test_sample_batter_runs_outcomes(tmp_path):
+    model = get_categorical_model(tmp_path)
+    rng = np.random.default_rng(1234)
+    feature_data = rng.normal(size=20)
+    uniforms = rng.random(20)
+
+    set_feature_data(model, feature_data)
+    probabilities = model.sample_posterior_predictive_once('probability_of_batter_runs_outcome')
+    draws = model.sample_batter_runs_outcomes(uniforms)
+
+    # Each ball is drawn from its own probabilities with its own uniform
+    cumulative_probabilities = np.cumsum(probabilities, axis=1)
+    assert (draws == np.minimum((cumulative_probabilities <= uniforms[:, None]).sum(axis=1), 6)).all()
+
+    # So the draw of a ball doesn't depend on the other balls predicted with it
+    subset = np.array([3, 17, 8])
+    set_feature_data(model, feature_data[subset])
+    assert (model.sample_batter_runs_outcomes(uniforms[subset]) == draws[subset]).all()
+
+    # & many draws for one ball follow its probabilities
+    set_feature_data(model, np.full(100000, feature_data[0]))
+    draws = model.sample_batter_runs_outcomes(rng.random(100000))
+    assert np.allclose(np.bincount(draws, minlength=7) / len(draws), probabilities[0], atol=0.01)
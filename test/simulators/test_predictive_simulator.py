@@ -1,12 +1,39 @@
 import pytest
+import os
+import copy
 from test.conftest import get_test_cases
 from simulators.perfect_simulator import PerfectSimulator
+from simulators.predictive_simulator import PredictiveSimulator
 from test.data_selection.conftest import prepare_tests, setup_training_and_testing_windows
-from simulators.utils.predictive_utils import PredictiveUtils
+from simulators.utils.predictive_utils import UNIFORMS_PER_BALL
+from simulators.utils.dismissal_kinds import encode_dismissal_kinds, decode_dismissal_kinds, NO_DISMISSAL
+from simulators.utils.outcome_tables import OUTCOME_DISTRIBUTIONS
+from simulators.utils.ball_log import BallLog
+from simulators.utils.samplers import CategoricalSampler
+from simulators.utils.innings_kernel import NUMBA_AVAILABLE
+from simulators.utils.variance_reduction import generate_scenarios_with_common_random_numbers, compare_error_stats
+import numpy as np
 import pandas as pd
 from utils.app_utils import show_stats
 
 
+def get_predictive_simulator_with_fewer_dot_balls(predictive_simulator) -> PredictiveSimulator:
+    """
+    Returns a predictive simulator like predictive_simulator, whose batter runs distribution has 20% less probability
+    of a dot ball - a second model configuration to compare against
+    """
+    predictive_simulator.predictive_utils.setup(False)
+    predictive_utils = copy.copy(predictive_simulator.predictive_utils)
+    probabilities = predictive_utils.batter_runs_distribution.probabilities.copy()
+    probabilities[..., 0] *= 0.8
+    predictive_utils.batter_runs_distribution = CategoricalSampler(probabilities)
+    return PredictiveSimulator(predictive_simulator.data_selection,
+                               predictive_simulator.rewards_configuration,
+                               None,
+                               predictive_simulator.number_of_scenarios,
+                               utils=predictive_utils)
+
+
 @pytest.mark.parametrize(
     'test_case',
     get_test_cases('app_config', 'TestPredictiveSimulator'),
@@ -150,7 +177,7 @@ class TestPredictiveSimulator:
         perfect_df = perfect_simulator_for_testing.get_simulation_evaluation_metrics_by_granularity(True, granularity)
         total_errors_df = pd.DataFrame()
         for scenario in range(0, predictive_simulator.number_of_scenarios):
-            rewards_df = predictive_simulator.perfect_simulators[scenario]\
+            rewards_df = predictive_simulator.get_perfect_simulator(scenario)\
                 .get_simulation_evaluation_metrics_by_granularity(True, granularity)
 
             error_df = perfect_simulator_for_testing.get_error_measures(True, rewards_df, granularity, perfect_df)
@@ -177,3 +204,518 @@ class TestPredictiveSimulator:
         new_error_df = predictive_simulator.get_error_stats(granularity)
         differences = pd.concat([new_error_df.reset_index(), total_errors_df.reset_index()]).drop_duplicates(keep=False)
         assert differences.empty
+
+    def test_apply_outcomes(self, predictive_simulator):
+        prepare_tests(predictive_simulator.data_selection, False)
+        predictive_simulator.predictive_utils.setup(False)
+        predictive_simulator.simulated_matches_df = predictive_simulator.generate_matches()
+        match_state_store = predictive_simulator.initialise_match_state_store()
+
+        state_columns = ['batter', 'non_striker', 'batting_position', 'previous_total', 'previous_num_wickets',
+                         'previous_non_legal_delivery', 'match_complete', 'first_innings_complete']
+
+        for inning in [1, 2]:
+            match_state_store.set_innings(inning)
+            for over in range(0, 4):
+                match_state_store.change_over()
+                for ball in range(0, 6):
+                    positions = match_state_store.get_active_positions()
+                    match_state_df = match_state_store.get_state_df(positions)
+                    uniforms = predictive_simulator.random_streams.random(
+                        match_state_store.scenario_number[positions], UNIFORMS_PER_BALL)
+                    predictive_simulator.predictive_utils.predict_ball_by_ball_outcome(match_state_df, False, uniforms)
+                    fielder_draws = np.random.random(len(positions))
+
+                    # The vectorised update must match the row-wise update of the MatchState view, given the same
+                    # outcomes & random draws
+                    match_states = [match_state_store.get_match_state(position) for position in positions]
+                    expected_fielders = [match_state.update_state(row, fielder_draw) for match_state, row, fielder_draw
+                                         in zip(match_states, match_state_df.to_dict('records'), fielder_draws)]
+                    fielders = match_state_store.apply_outcomes(positions, match_state_df, fielder_draws)
+                    assert fielders.tolist() == expected_fielders
+
+                    for position, expected_match_state in zip(positions, match_states):
+                        match_state = match_state_store.get_match_state(position)
+                        for column in state_columns:
+                            assert getattr(match_state, column) == getattr(expected_match_state, column), column
+
+                    match_state_store.bowl_one_ball()
+
+    def test_apply_outcomes_on_fixed_state(self, predictive_simulator):
+        prepare_tests(predictive_simulator.data_selection, False)
+        predictive_simulator.predictive_utils.setup(False)
+        predictive_simulator.simulated_matches_df = predictive_simulator.generate_matches()
+        match_state_store = predictive_simulator.initialise_match_state_store()
+        match_state_store.set_innings(1)
+        match_state_store.change_over()
+
+        # A dot ball, odd runs, a wide, a catch, a run out of the non-striker & the last wicket of the innings
+        positions = match_state_store.get_active_positions()[:6]
+        match_state_store.previous_num_wickets[positions[5]] = 9
+        outcomes = {'batter_runs': [0, 3, 0, 0, 1, 0],
+                    'extras': [0, 0, 1, 0, 0, 0],
+                    'is_wicket': [0, 0, 0, 1, 1, 1],
+                    'dismissal_kind': ['nan', 'nan', 'nan', 'caught', 'run out', 'bowled'],
+                    'non_striker_dismissed': [0, 0, 0, 0, 1, 0],
+                    'legal_delivery': [True, True, False, True, True, True]}
+        fielder_draws = np.linspace(0, 0.99, len(positions))
+
+        # The vectorised update matches the MatchState view updated one row at a time
+        state_columns = ['batter', 'non_striker', 'batting_position', 'previous_total', 'previous_num_wickets',
+                         'previous_non_legal_delivery', 'match_complete', 'first_innings_complete']
+        match_states = [match_state_store.get_match_state(position) for position in positions]
+        expected_fielders = [match_state.update_state({column: values[i] for column, values in outcomes.items()},
+                                                      fielder_draws[i])
+                             for i, match_state in enumerate(match_states)]
+        fielders = match_state_store.apply_outcomes(positions, outcomes, fielder_draws)
+        assert fielders.tolist() == expected_fielders
+        assert (fielders[:3] == 'nan').all() and (fielders[3:5] != 'nan').all() and (fielders[5] == 'nan')
+        for position, expected_match_state in zip(positions, match_states):
+            match_state = match_state_store.get_match_state(position)
+            for column in state_columns:
+                assert getattr(match_state, column) == getattr(expected_match_state, column), column
+        assert match_state_store.first_innings_complete[positions[5]]
+
+        # The innings which is complete is no longer updated
+        fielders = match_state_store.apply_outcomes(positions[5:], {column: values[5:]
+                                                                    for column, values in outcomes.items()})
+        assert fielders.tolist() == ['']
+
+    def test_predict_outcomes(self, predictive_simulator):
+        prepare_tests(predictive_simulator.data_selection, False)
+        predictive_utils = predictive_simulator.predictive_utils
+        predictive_utils.setup(False)
+        predictive_simulator.simulated_matches_df = predictive_simulator.generate_matches()
+        match_state_store = predictive_simulator.initialise_match_state_store()
+        match_state_store.set_innings(1)
+        match_state_store.change_over()
+
+        positions = match_state_store.get_active_positions()
+        uniforms = np.random.default_rng(1234).random((len(positions), UNIFORMS_PER_BALL))
+        state = match_state_store.get_state_arrays(positions)
+        outcomes = predictive_utils.predict_outcomes(state, uniforms)
+
+        # The DataFrame interface gives the same outcomes, with the dismissal kinds as labels
+        match_state_df = match_state_store.get_state_df(positions)
+        predictive_utils.predict_ball_by_ball_outcome(match_state_df, False, uniforms)
+        for column, values in outcomes.items():
+            if column != 'dismissal_kind':
+                assert (match_state_df[column].values == values).all(), column
+        assert (match_state_df['dismissal_kind'].values == decode_dismissal_kinds(outcomes['dismissal_kind'])).all()
+        assert (encode_dismissal_kinds(match_state_df['dismissal_kind'].values) == outcomes['dismissal_kind']).all()
+        assert ((outcomes['dismissal_kind'] == NO_DISMISSAL) == (outcomes['is_wicket'] == 0)).all()
+
+    def test_outcome_tables(self, predictive_simulator):
+        prepare_tests(predictive_simulator.data_selection, False)
+        predictive_utils = predictive_simulator.predictive_utils
+        predictive_utils.setup(False)
+        outcome_tables = predictive_utils.outcome_tables
+
+        # Every bucket of every distribution is a probability distribution over the categories of the prior
+        for name in OUTCOME_DISTRIBUTIONS:
+            probabilities = outcome_tables.probabilities[name]
+            assert probabilities.shape[0] == outcome_tables.number_of_buckets
+            assert np.allclose(probabilities.sum(axis=1), 1), name
+            assert getattr(predictive_utils, name).is_bucketed
+
+        # Venues get their own buckets, and wickets fall more often at the death with wickets down than in the powerplay
+        # with none
+        venues = np.append(outcome_tables.venues.values, 'unknown venue')
+        powerplay = predictive_utils.get_outcome_buckets(venues, np.zeros(len(venues), dtype=int),
+                                                         np.zeros(len(venues), dtype=int))
+        death = predictive_utils.get_outcome_buckets(venues, np.full(len(venues), 19), np.full(len(venues), 6))
+        assert len(np.unique(powerplay)) == len(venues)
+        wickets = outcome_tables.probabilities['legal_wickets_distribution']
+        assert wickets[death[-1], 1] > wickets[powerplay[-1], 1]
+        assert wickets[death, 1].mean() > wickets[powerplay, 1].mean()
+
+        # Outcomes are drawn from the row of the bucket of each delivery
+        uniforms = np.random.default_rng(1234).random(100000)
+        codes = predictive_utils.batter_runs_distribution.sample(uniforms, np.full(len(uniforms), death[0]))
+        frequencies = np.bincount(codes, minlength=7) / len(codes)
+        assert np.allclose(frequencies, outcome_tables.probabilities['batter_runs_distribution'][death[0]], atol=0.01)
+
+    def test_seeded_scenarios_are_reproducible(self, predictive_simulator):
+        prepare_tests(predictive_simulator.data_selection, False)
+
+        predictive_simulator.requested_seed = 1234
+        first_matches_df, first_innings_df = predictive_simulator.generate_scenario()
+        first_matches_df = first_matches_df.copy()
+        first_innings_df = first_innings_df.copy()
+
+        second_matches_df, second_innings_df = predictive_simulator.generate_scenario()
+        assert predictive_simulator.seed == 1234
+        pd.testing.assert_frame_equal(first_matches_df, second_matches_df)
+        pd.testing.assert_frame_equal(first_innings_df, second_innings_df)
+
+    def test_parallel_scenarios_match_serial_scenarios(self, predictive_simulator):
+        prepare_tests(predictive_simulator.data_selection, False)
+
+        predictive_simulator.requested_seed = 1234
+        serial_matches_df, serial_innings_df = predictive_simulator.generate_scenario()
+        serial_matches_df = serial_matches_df.copy()
+        serial_innings_df = serial_innings_df.copy()
+
+        predictive_simulator.workers = 2
+        parallel_matches_df, parallel_innings_df = predictive_simulator.generate_scenario()
+        pd.testing.assert_frame_equal(serial_matches_df, parallel_matches_df)
+        pd.testing.assert_frame_equal(serial_innings_df.sort_index(), parallel_innings_df.sort_index())
+
+    @pytest.mark.skipif(not NUMBA_AVAILABLE, reason="numba is not installed, so the numba engine falls back to numpy")
+    def test_numba_engine_matches_numpy_engine(self, predictive_simulator):
+        prepare_tests(predictive_simulator.data_selection, False)
+
+        predictive_simulator.requested_seed = 1234
+        predictive_simulator.workers = 1
+        predictive_simulator.engine = 'numpy'
+        numpy_matches_df, numpy_innings_df = predictive_simulator.generate_scenario()
+        numpy_matches_df = numpy_matches_df.copy()
+        numpy_innings_df = numpy_innings_df.copy()
+
+        predictive_simulator.engine = 'numba'
+        numba_matches_df, numba_innings_df = predictive_simulator.generate_scenario()
+        assert predictive_simulator.use_innings_kernel(False)
+        predictive_simulator.engine = 'numpy'
+        pd.testing.assert_frame_equal(numpy_matches_df, numba_matches_df)
+        pd.testing.assert_frame_equal(numpy_innings_df, numba_innings_df)
+
+    def test_over_engine(self, predictive_simulator):
+        prepare_tests(predictive_simulator.data_selection, False)
+
+        predictive_simulator.engine = 'over'
+        matches_df, innings_df = predictive_simulator.generate_scenario()
+        over_outcomes_table = predictive_simulator.predictive_utils.get_over_outcomes_table()
+
+        # Every over drawn is a complete historical over of its phase & wickets in hand
+        over = np.arange(20).repeat(10)
+        wickets = np.tile(np.arange(10), 20)
+        overs = over_outcomes_table.sample(over, wickets, np.random.random(len(over)))
+        assert (over_outcomes_table.deliveries['legal_delivery'][overs].sum(axis=1) == 6).all()
+
+        # The innings are recorded ball by ball like the other engines, so the rewards are calculated in the same way
+        innings_df = innings_df.reset_index()
+        legal_deliveries = innings_df.groupby(['scenario_number', 'match_key', 'inning', 'over'])['legal_delivery'] \
+            .sum()
+        assert (legal_deliveries <= 6).all()
+        assert (legal_deliveries == 6).mean() > 0.9
+        pd.testing.assert_frame_equal(predictive_simulator.get_rewards(0, 'match'),
+                                      predictive_simulator.get_perfect_simulator(0)
+                                      .get_simulation_evaluation_metrics_by_granularity(True, 'match'))
+
+    def test_spilled_scenarios_match_in_memory_scenarios(self, predictive_simulator, tmp_path):
+        prepare_tests(predictive_simulator.data_selection, False)
+
+        predictive_simulator.requested_seed = 1234
+        predictive_simulator.workers = 1
+        predictive_simulator.spill_directory = None
+        matches_df, innings_df = predictive_simulator.generate_scenario()
+        matches_df = matches_df.copy()
+        innings_df = innings_df.copy()
+        rewards_df = predictive_simulator.get_rewards(0, 'match')
+
+        predictive_simulator.spill_directory = str(tmp_path)
+        spilled_matches_df, spilled_innings_df = predictive_simulator.generate_scenario()
+        try:
+            assert spilled_innings_df.empty
+            pd.testing.assert_frame_equal(matches_df, spilled_matches_df)
+            pd.testing.assert_frame_equal(innings_df.sort_index(),
+                                          predictive_simulator.get_simulated_innings().sort_index())
+            pd.testing.assert_frame_equal(rewards_df, predictive_simulator.get_rewards(0, 'match'))
+        finally:
+            predictive_simulator.spill_directory = None
+
+    def test_resume_from_checkpoint(self, predictive_simulator, tmp_path):
+        prepare_tests(predictive_simulator.data_selection, False)
+
+        predictive_simulator.requested_seed = 1234
+        predictive_simulator.workers = 1
+        matches_df, innings_df = predictive_simulator.generate_scenario()
+        matches_df = matches_df.copy()
+        innings_df = innings_df.copy()
+
+        # Interrupt the run after the 2nd checkpoint of the innings
+        predictive_simulator.checkpoint_directory = str(tmp_path)
+        save_innings_checkpoint = predictive_simulator.save_innings_checkpoint
+        number_of_checkpoints = []
+
+        def interrupt_after_checkpoint(*args):
+            save_innings_checkpoint(*args)
+            number_of_checkpoints.append(1)
+            if len(number_of_checkpoints) == 2:
+                raise KeyboardInterrupt()
+
+        predictive_simulator.save_innings_checkpoint = interrupt_after_checkpoint
+        try:
+            with pytest.raises(KeyboardInterrupt):
+                predictive_simulator.generate_scenario()
+        finally:
+            del predictive_simulator.save_innings_checkpoint
+
+        predictive_simulator.requested_seed = None
+        try:
+            resumed_matches_df, resumed_innings_df = predictive_simulator.resume(str(tmp_path))
+        finally:
+            predictive_simulator.checkpoint_directory = None
+        pd.testing.assert_frame_equal(matches_df, resumed_matches_df)
+        pd.testing.assert_frame_equal(innings_df, resumed_innings_df)
+
+    def test_resume_with_different_settings(self, predictive_simulator, tmp_path):
+        prepare_tests(predictive_simulator.data_selection, False)
+
+        predictive_simulator.requested_seed = 1234
+        predictive_simulator.workers = 1
+        predictive_simulator.checkpoint_directory = str(tmp_path)
+        try:
+            predictive_simulator.generate_scenario()
+        finally:
+            predictive_simulator.checkpoint_directory = None
+
+        # Resuming with settings which give different scenarios is rejected
+        for setting, value in [('engine', 'over'), ('antithetic', True), ('nested_group_size', 2),
+                               ('requested_seed', 4321)]:
+            original_value = getattr(predictive_simulator, setting)
+            setattr(predictive_simulator, setting, value)
+            try:
+                with pytest.raises(ValueError):
+                    predictive_simulator.resume(str(tmp_path))
+            finally:
+                setattr(predictive_simulator, setting, original_value)
+
+        predictive_simulator.resume(str(tmp_path))
+
+    def test_scenarios_until_converged(self, predictive_simulator):
+        prepare_tests(predictive_simulator.data_selection, False)
+        predictive_simulator.requested_seed = 1234
+
+        # The batches add up to the same scenarios as generating them in one go
+        convergence_df = predictive_simulator.generate_scenarios_until_converged(tolerance=np.inf,
+                                                                                 batch_size=2,
+                                                                                 max_number_of_scenarios=7)
+        assert predictive_simulator.number_of_scenarios == 4
+        focus_players = predictive_simulator.rewards_configuration.get_focus_players()['player_key']
+        assert set(convergence_df.index) == set(focus_players)
+        assert convergence_df['converged'].all()
+        assert (convergence_df['total_rewards_hdi_width'] >= 0).all()
+        adaptive_matches_df = predictive_simulator.simulated_matches_df.copy()
+        adaptive_innings_df = predictive_simulator.simulated_innings_df.copy()
+
+        matches_df, innings_df = predictive_simulator.generate_scenario()
+        pd.testing.assert_frame_equal(matches_df, adaptive_matches_df)
+        pd.testing.assert_frame_equal(innings_df.sort_index(), adaptive_innings_df.sort_index())
+
+        # Stops at the budget, even part way through a batch
+        predictive_simulator.generate_scenarios_until_converged(tolerance=np.inf,
+                                                                batch_size=3,
+                                                                max_number_of_scenarios=5)
+        assert predictive_simulator.number_of_scenarios == 5
+
+    def test_add_scenarios(self, predictive_simulator):
+        prepare_tests(predictive_simulator.data_selection, False)
+        predictive_simulator.requested_seed = 1234
+        number_of_scenarios = predictive_simulator.number_of_scenarios
+
+        matches_df, innings_df = predictive_simulator.generate_scenario()
+        matches_df = matches_df.copy()
+        innings_df = innings_df.copy()
+        error_df = predictive_simulator.get_error_stats('match').copy()
+
+        # Top up the scenarios, extending the cached error stats
+        predictive_simulator.number_of_scenarios = 2
+        predictive_simulator.generate_scenario()
+        predictive_simulator.get_error_stats('match')
+        predictive_simulator.add_scenarios(number_of_scenarios - 2)
+        assert predictive_simulator.number_of_scenarios == number_of_scenarios
+        pd.testing.assert_frame_equal(predictive_simulator.simulated_matches_df, matches_df)
+        pd.testing.assert_frame_equal(predictive_simulator.simulated_innings_df.sort_index(), innings_df.sort_index())
+        pd.testing.assert_frame_equal(predictive_simulator.get_error_stats('match').sort_index(),
+                                      error_df.sort_index())
+        pd.testing.assert_frame_equal(predictive_simulator.get_rewards(number_of_scenarios - 1, 'match'),
+                                      predictive_simulator.get_perfect_simulator(number_of_scenarios - 1)
+                                      .get_simulation_evaluation_metrics_by_granularity(True, 'match'))
+
+    def test_antithetic_scenarios(self, predictive_simulator):
+        prepare_tests(predictive_simulator.data_selection, False)
+
+        predictive_simulator.antithetic = True
+        other_predictive_simulator = get_predictive_simulator_with_fewer_dot_balls(predictive_simulator)
+        other_predictive_simulator.antithetic = True
+        generate_scenarios_with_common_random_numbers([predictive_simulator, other_predictive_simulator], False,
+                                                      seed=1234)
+
+        # The differences of the two scenarios of an antithetic pair are averaged into one sample
+        comparison_df = compare_error_stats(predictive_simulator.get_error_stats('tournament'),
+                                            other_predictive_simulator.get_error_stats('tournament'),
+                                            'total_rewards_absolute_error',
+                                            antithetic=True)
+        assert comparison_df['mean_difference'].notna().all()
+        assert (comparison_df['number_of_samples'] <= (predictive_simulator.number_of_scenarios + 1) // 2).all()
+
+    def test_common_random_numbers(self, predictive_simulator):
+        prepare_tests(predictive_simulator.data_selection, False)
+
+        other_predictive_simulator = get_predictive_simulator_with_fewer_dot_balls(predictive_simulator)
+        seed = generate_scenarios_with_common_random_numbers([predictive_simulator, other_predictive_simulator],
+                                                             False, seed=1234)
+        assert seed == 1234
+        error_df = predictive_simulator.get_error_stats('tournament')
+        paired_comparison_df = compare_error_stats(error_df,
+                                                   other_predictive_simulator.get_error_stats('tournament'),
+                                                   'total_rewards_absolute_error')
+        assert (paired_comparison_df['mean_difference'] != 0).any()
+
+        # Scenario i of both simulators saw the same random numbers, so their paired differences vary far less than
+        # those against scenarios played from another seed
+        other_predictive_simulator.requested_seed = 4321
+        other_predictive_simulator.generate_scenario()
+        unpaired_comparison_df = compare_error_stats(error_df,
+                                                     other_predictive_simulator.get_error_stats('tournament'),
+                                                     'total_rewards_absolute_error')
+        assert (paired_comparison_df['sd_difference'] ** 2).mean() < \
+               (unpaired_comparison_df['sd_difference'] ** 2).mean()
+
+    def test_nested_scenarios(self, predictive_simulator):
+        prepare_tests(predictive_simulator.data_selection, False)
+
+        predictive_simulator.nested_group_size = 2
+        predictive_simulator.requested_seed = 1234
+        matches_df, innings_df = predictive_simulator.generate_scenario()
+        matches_df = matches_df.copy()
+        innings_df = innings_df.copy()
+
+        # Both scenarios of a group play the same first innings, and their own 2nd innings
+        innings_df = innings_df.reset_index()
+        innings_df['group'] = innings_df['scenario_number'] // 2
+        first_innings_df = innings_df[innings_df['inning'] == 1]
+        first_innings_runs = first_innings_df.groupby(['group', 'match_key', 'scenario_number'])['total_runs'].sum()
+        assert (first_innings_runs.groupby(['group', 'match_key']).nunique() == 1).all()
+        second_innings_df = innings_df[innings_df['inning'] == 2]
+        assert (second_innings_df.groupby(['group', 'match_key', 'over', 'ball'])['total_runs'].nunique() > 1).any()
+
+        predictive_simulator.workers = 2
+        parallel_matches_df, parallel_innings_df = predictive_simulator.generate_scenario()
+        pd.testing.assert_frame_equal(matches_df, parallel_matches_df)
+
+    def test_scenario_views(self, predictive_simulator):
+        prepare_tests(predictive_simulator.data_selection, False)
+        matches_df, innings_df = predictive_simulator.generate_scenario()
+
+        scenario_views = predictive_simulator.scenario_views
+        for scenario in range(0, predictive_simulator.number_of_scenarios):
+            scenario_matches_df = scenario_views.get_matches(scenario)
+            pd.testing.assert_frame_equal(scenario_matches_df.reset_index(drop=True),
+                                          matches_df.xs(scenario, level='scenario_number', drop_level=False)
+                                          .reset_index())
+            assert np.shares_memory(scenario_matches_df['key'].values, scenario_views.matches_df['key'].values)
+            pd.testing.assert_frame_equal(predictive_simulator.get_simulated_innings(scenario),
+                                          innings_df.xs(scenario, level='scenario_number', drop_level=False))
+        assert scenario_views.get_matches(predictive_simulator.number_of_scenarios).empty
+
+        # The perfect simulator of a scenario is reused
+        assert predictive_simulator.get_perfect_simulator(1) is predictive_simulator.get_perfect_simulator(1)
+
+    def test_compact_ball_log(self, predictive_simulator, tmp_path):
+        prepare_tests(predictive_simulator.data_selection, False)
+        matches_df, innings_df = predictive_simulator.generate_scenario()
+        innings_df = innings_df.copy()
+
+        # The balls are held packed, with the players, teams & venues as ids, and decode back to the same dataframe
+        ball_log = BallLog(predictive_simulator.number_of_scenarios, len(matches_df.index))
+        ball_log.append(innings_df)
+        assert ball_log.columns[BallLog.OUTCOME_COLUMN].dtype == np.uint32
+        assert all(values.dtype != object for values in ball_log.columns.values())
+        pd.testing.assert_frame_equal(ball_log.to_dataframe(), innings_df)
+
+        # Only the rows asked for are decoded
+        pd.testing.assert_frame_equal(ball_log.get_balls([0, 5, 3]), innings_df.reset_index().iloc[[0, 5, 3]]
+                                      .reset_index(drop=True))
+        pd.testing.assert_frame_equal(ball_log.to_dataframe(scenario_numbers=[1]),
+                                      innings_df.xs(1, level='scenario_number', drop_level=False))
+
+        # Logs merge with their own key ids, and are spilled to disk in the same encoding
+        spilled_ball_log = BallLog(0, 0, spill_directory=str(tmp_path))
+        spilled_ball_log.append_state(ball_log.get_state())
+        spilled_ball_log.spill()
+        spilled_df = pd.read_parquet(os.path.join(str(tmp_path), "scenario_number=1", "part-00000.parquet"))
+        assert spilled_df[BallLog.OUTCOME_COLUMN].dtype == np.uint32
+        assert all(spilled_df[column].dtype != object for column in spilled_df.columns)
+        pd.testing.assert_frame_equal(spilled_ball_log.to_dataframe(), innings_df)
+
+        # Outcomes which don't fit in their bits are rejected rather than wrapped around
+        with pytest.raises(ValueError):
+            ball_log.append(innings_df.assign(batter_runs=16))
+
+    @pytest.mark.parametrize('engine', ['numpy', 'numba'])
+    def test_accumulated_player_outcomes(self, predictive_simulator, engine):
+        prepare_tests(predictive_simulator.data_selection, False)
+        predictive_simulator.engine = engine
+        predictive_simulator.generate_scenario()
+
+        for scenario in range(0, predictive_simulator.number_of_scenarios):
+            perfect_simulator = predictive_simulator.get_perfect_simulator(scenario)
+            player_outcomes_df = perfect_simulator.get_outcomes_by_player_and_innings(True)
+
+            # The player outcomes derived from the innings
+            perfect_simulator.data_selection.simulated_player_outcomes = None
+            pd.testing.assert_frame_equal(player_outcomes_df,
+                                          perfect_simulator.get_outcomes_by_player_and_innings(True))
+
+    def test_simulated_ball_counts_defect(self, predictive_simulator):
+        # Pins a known defect shared by both ways of getting the player outcomes of simulated innings: the wides &
+        # noballs taken away from the balls are count()ed, but they are logged on every simulated delivery. Update
+        # this test when PerfectSimulator & ScorecardAccumulator are fixed together.
+        prepare_tests(predictive_simulator.data_selection, False)
+        predictive_simulator.generate_scenario()
+        perfect_simulator = predictive_simulator.get_perfect_simulator(0)
+        accumulated_player_outcomes_df = perfect_simulator.get_outcomes_by_player_and_innings(True)
+        perfect_simulator.data_selection.simulated_player_outcomes = None
+        derived_player_outcomes_df = perfect_simulator.get_outcomes_by_player_and_innings(True)
+
+        for player_outcomes_df in [accumulated_player_outcomes_df, derived_player_outcomes_df]:
+            batted = player_outcomes_df['batting_total_runs'].notna()
+            bowled = player_outcomes_df['total_runs'].notna()
+            assert batted.any() and bowled.any()
+            # Every delivery is taken away once from total_balls & twice from the other counts
+            assert (player_outcomes_df.loc[batted, 'total_balls'] == 0).all()
+            assert (player_outcomes_df.loc[batted, 'batting_total_balls'] < 0).all()
+            assert (player_outcomes_df.loc[bowled, 'number_of_bowled_deliveries'] < 0).all()
+            strike_rates = player_outcomes_df.loc[batted, 'strike_rate']
+            assert (np.isinf(strike_rates) | strike_rates.isna()).all()
+
+    def test_error_stats_with_accumulated_player_outcomes(self, predictive_simulator):
+        prepare_tests(predictive_simulator.data_selection, False)
+        predictive_simulator.generate_scenario()
+        error_df = predictive_simulator.get_error_stats('match')
+
+        # The error stats with the player outcomes derived from the innings
+        predictive_simulator.simulated_player_outcomes_df = None
+        predictive_simulator.set_scenario_views()
+        predictive_simulator.error_stats_cache = {}
+        pd.testing.assert_frame_equal(error_df, predictive_simulator.get_error_stats('match'))
+
+    def test_bowling_plans(self, predictive_simulator):
+        prepare_tests(predictive_simulator.data_selection, False)
+        predictive_utils = predictive_simulator.predictive_utils
+        predictive_utils.setup(False)
+        predictive_simulator.simulated_matches_df = predictive_simulator.generate_matches()
+        match_state_store = predictive_simulator.initialise_match_state_store()
+
+        for inning in [1, 2]:
+            match_state_store.set_innings(inning)
+            bowling_plans = match_state_store.bowling_order
+            bowler_ids = np.take_along_axis(match_state_store.bowling_playing_xi_ids, bowling_plans, axis=1)
+
+            # No bowler bowls consecutive overs or more than 4 overs
+            assert (bowling_plans[:, 1:] != bowling_plans[:, :-1]).all()
+            for bowling_plan in bowling_plans:
+                assert np.bincount(bowling_plan).max() <= 4
+            assert (bowling_plans < match_state_store.bowling_playing_xi_size[:, np.newaxis]).all()
+            assert predictive_utils.is_eligible_bowler[bowler_ids].all()
+
+            # The MatchState view reads its bowling order from the plans, also for the next innings
+            match_state = match_state_store.get_match_state(0)
+            assert match_state.bowling_order == [match_state.bowling_playing_xi[i] for i in bowling_plans[0]]
+            if inning == 1:
+                batting_playing_xi = match_state.batting_playing_xi
+                match_state.set_innings(2)
+                assert match_state.bowling_order == [batting_playing_xi[i]
+                                                     for i in match_state_store.bowling_plans[0, 1]]
@@ -4,6 +4,9 @@ from test.data_selection.conftest import setup_training_and_testing_windows
 import pytest
 from test.data_selection.conftest import prepare_tests
 import logging
+import os
+import shutil
+import pandas as pd
 
 logging.basicConfig()
 logging.getLogger().setLevel(logging.DEBUG)
@@ -104,4 +107,17 @@ class TestTournamentSimulator:
 
             assert match_keys == expected_match_keys
 
+    def test_resume_from_checkpoint(self, tournament_simulator, tmp_path):
+        prepare_tests(tournament_simulator.data_selection, False)
+        tournament_simulator.requested_seed = 1234
+        tournament_simulator.checkpoint_directory = str(tmp_path)
+        all_matches_df = tournament_simulator.generate_scenarios()
+        rewards_df = tournament_simulator.get_rewards('match')
+
+        # Pretend the run was interrupted after the first 2 stages
+        shutil.rmtree(os.path.join(tmp_path, 'stage-2'))
+        shutil.rmtree(os.path.join(tmp_path, 'stage-3'))
 
+        resumed_matches_df = tournament_simulator.resume(str(tmp_path))
+        pd.testing.assert_frame_equal(all_matches_df, resumed_matches_df)
+        pd.testing.assert_frame_equal(rewards_df, tournament_simulator.get_rewards('match'))
@@ -0,0 +1,28 @@
+import arviz as az
+import numpy as np
+import pandas as pd
+
+from simulators.utils.convergence import RewardsConvergenceTracker, HDI_PROB
+
+
+def test_rewards_convergence_tracker():
+    tracker = RewardsConvergenceTracker(['a', 'b'], tolerance=1)
+    rewards = np.random.default_rng(1234).normal(100, 10, (4000, 2))
+
+    def add_scenarios(scenario_rewards):
+        for player_rewards in scenario_rewards:
+            tracker.add_scenario(pd.DataFrame({'player_key': ['a', 'b'], 'total_rewards': player_rewards}))
+
+    # The first check has nothing to compare the HDI widths with
+    add_scenarios(rewards[:2000])
+    assert not tracker.has_converged()
+    summary_df = tracker.get_summary()
+    assert np.allclose(summary_df.loc['a', ['total_rewards_hdi_lower', 'total_rewards_hdi_upper']].astype(float),
+                       az.hdi(rewards[:2000, 0], hdi_prob=HDI_PROB))
+
+    # More draws from the same distribution barely change the HDI widths, unlike draws from a wider one
+    add_scenarios(rewards[2000:])
+    assert tracker.has_converged()
+    assert tracker.get_summary()['converged'].all()
+    add_scenarios(rewards[:2000] * 2)
+    assert not tracker.has_converged()
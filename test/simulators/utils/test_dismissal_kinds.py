@@ -0,0 +1,30 @@
+import numpy as np
+
+from simulators.utils.ball_encoding import OUTCOME_FIELDS, pack_outcomes, unpack_outcomes
+from simulators.utils.dismissal_kinds import encode_dismissal_kinds, decode_dismissal_kinds, is_run_out, \
+    needs_fielder, DISMISSAL_KINDS, LEGAL_WICKET_TYPES, NON_LEGAL_WICKET_TYPES, NON_LEGAL_DISMISSAL_OFFSET, \
+    FIELDING_DISMISSAL_KINDS, NO_DISMISSAL
+
+
+def test_dismissal_kind_codes():
+    codes = np.append(np.arange(len(DISMISSAL_KINDS)), NO_DISMISSAL)
+    labels = decode_dismissal_kinds(codes)
+    assert labels.tolist() == DISMISSAL_KINDS + ['nan']
+
+    # Labels round trip through their codes, with the kinds which are both legal & non-legal getting the legal code
+    encoded_codes = encode_dismissal_kinds(labels)
+    assert (decode_dismissal_kinds(encoded_codes) == labels).all()
+    assert (encoded_codes[:NON_LEGAL_DISMISSAL_OFFSET] == codes[:NON_LEGAL_DISMISSAL_OFFSET]).all()
+    assert encoded_codes[-1] == NO_DISMISSAL
+    for label in NON_LEGAL_WICKET_TYPES:
+        assert encode_dismissal_kinds([label])[0] == LEGAL_WICKET_TYPES.index(label)
+
+    # Unknown labels are not dismissals, and only the codes of dismissals are run outs or need a fielder
+    assert encode_dismissal_kinds(['nan', 'retired hurt']).tolist() == [NO_DISMISSAL, NO_DISMISSAL]
+    assert is_run_out(codes).tolist() == [label == 'run out' for label in labels]
+    assert needs_fielder(codes).tolist() == [label in FIELDING_DISMISSAL_KINDS for label in labels]
+
+    # The codes survive being packed into the outcome of a ball
+    columns = {column: np.zeros(len(codes), dtype=int) for column, _ in OUTCOME_FIELDS}
+    columns['dismissal_kind'] = codes
+    assert (unpack_outcomes(pack_outcomes(columns))['dismissal_kind'] == codes).all()
@@ -0,0 +1,39 @@
+import numpy as np
+
+from simulators.utils.predictive_utils import PredictiveUtils
+
+
+def test_generate_bowling_plans():
+    # The bowling plans only need the eligible bowlers, not the historical data or the batter runs model
+    predictive_utils = PredictiveUtils(None, None)
+    predictive_utils.is_eligible_bowler = np.isin(np.arange(40), [5, 6, 7, 8, 9, 10, 18, 19, 20, 21])
+
+    # A full playing xi with 6 eligible bowlers, one with only 4 (who can't bowl all the overs) & a padded one of 6
+    # players without any eligible bowler
+    playing_xi_ids = np.full((3, 12), -1)
+    playing_xi_ids[0, :11] = np.arange(11)
+    playing_xi_ids[1, :11] = np.arange(11, 22)
+    playing_xi_ids[2, :6] = np.arange(30, 36)
+    playing_xi_size = np.array([11, 11, 6])
+    uniforms = np.random.default_rng(1234).random((3, 20))
+    uniforms[0, ::2] = 0.9999999
+
+    bowling_plans = predictive_utils.generate_bowling_plans(playing_xi_ids, playing_xi_size, uniforms)
+    assert bowling_plans.shape == (3, 20)
+
+    # No bowler bowls consecutive overs or more than 4 overs, and the padding is never picked
+    assert (bowling_plans[:, 1:] != bowling_plans[:, :-1]).all()
+    for bowling_plan in bowling_plans:
+        assert np.bincount(bowling_plan).max() <= 4
+    assert (bowling_plans < playing_xi_size[:, np.newaxis]).all()
+
+    # Only eligible bowlers bowl, unless none of them can bowl the over
+    is_eligible = predictive_utils.is_eligible_bowler[np.take_along_axis(playing_xi_ids, bowling_plans, axis=1)]
+    assert is_eligible[0].all()
+    for over in np.flatnonzero(~is_eligible[1]):
+        overs_bowled = np.bincount(bowling_plans[1, :over], minlength=11)
+        for bowler in [7, 8, 9, 10]:
+            assert (overs_bowled[bowler] == 4) or (bowling_plans[1, over - 1] == bowler)
+
+    # Without eligible bowlers, the overs fall back to the last players of the playing xi who can bowl them
+    assert bowling_plans[2].tolist() == [5, 4] * 4 + [3, 2] * 4 + [1, 0] * 2
@@ -0,0 +1,40 @@
+import numpy as np
+
+from simulators.utils.predictive_utils import UNIFORMS_PER_BALL
+from simulators.utils.random_streams import ScenarioRandomStreams, BOWLING_STREAM
+
+
+def test_scenario_random_streams():
+    draws = ScenarioRandomStreams(1234).random(np.array([0, 1, 0, 2, 1]), 3)
+
+    # The draws of a scenario only depend on the seed & the scenario - not on the other scenarios drawn alongside,
+    # or the order the scenarios are drawn in
+    random_streams = ScenarioRandomStreams(1234)
+    assert np.array_equal(random_streams.random(np.array([2]), 3), draws[[3]])
+    assert np.array_equal(random_streams.random(np.array([1, 1]), 3), draws[[1, 4]])
+    assert np.array_equal(random_streams.random(np.array([0, 0]), 3), draws[[0, 2]])
+
+    # A scenario's stream is the matching child of the master seed sequence
+    spawned_generator = np.random.default_rng(np.random.SeedSequence(1234).spawn(3)[2].spawn(1)[0])
+    assert np.array_equal(spawned_generator.random(3), draws[3])
+
+    # The scenarios & the streams of a scenario are independent of each other
+    assert len(np.unique(draws)) == draws.size
+    bowling_draws = ScenarioRandomStreams(1234).random(np.array([0, 1, 0, 2, 1]), 3, stream=BOWLING_STREAM)
+    assert not np.isin(bowling_draws, draws).any()
+
+    # Without a seed, fresh entropy is drawn & recorded, so the run can be reproduced
+    random_streams = ScenarioRandomStreams()
+    unseeded_draws = random_streams.random(np.array([5]), 2)
+    assert np.array_equal(ScenarioRandomStreams(random_streams.seed).random(np.array([5]), 2), unseeded_draws)
+    assert not np.array_equal(ScenarioRandomStreams().random(np.array([5]), 2), unseeded_draws)
+
+
+def test_antithetic_streams():
+    random_streams = ScenarioRandomStreams(1234, antithetic=True)
+    uniforms = random_streams.random(np.array([0, 1, 2, 3, 0, 1]), (3, UNIFORMS_PER_BALL))
+
+    # The odd scenario of each pair mirrors the uniforms of the even one, and the pairs are independent
+    assert np.allclose(uniforms[[1, 3, 5]], 1 - uniforms[[0, 2, 4]])
+    assert not np.allclose(uniforms[2], uniforms[0])
+    assert random_streams.is_antithetic_scenario(1) and not random_streams.is_antithetic_scenario(2)
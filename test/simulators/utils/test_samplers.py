@@ -0,0 +1,14 @@
+import numpy as np
+
+from simulators.utils.samplers import CategoricalSampler
+
+
+def test_categorical_sampler():
+    # The prior of the batter runs on a legal delivery
+    distribution = CategoricalSampler([0.4, 0.35, 0.075, 0.006, 0.125, 0.004, 0.04])
+    codes = distribution.sample(np.random.default_rng(1234).random(100000))
+
+    assert codes.min() >= 0
+    assert codes.max() < distribution.number_of_categories
+    frequencies = np.bincount(codes, minlength=distribution.number_of_categories) / len(codes)
+    assert np.allclose(frequencies, distribution.probabilities, atol=0.01)
@@ -0,0 +1,27 @@
+import numpy as np
+import pytest
+
+from simulators.utils.scenario_keys import encode_scenario_keys, decode_scenario_keys, get_scenario_numbers
+
+
+def test_scenario_keys():
+    # Match keys of the size of the cricsheet match ids
+    match_keys = np.repeat(np.arange(1082591, 1082641), 10000)
+    scenario_numbers = np.tile(np.arange(10000), 50)
+    scenario_keys = encode_scenario_keys(match_keys, scenario_numbers)
+
+    assert len(np.unique(scenario_keys)) == len(scenario_keys)
+    assert (decode_scenario_keys(scenario_keys) == match_keys).all()
+    assert (get_scenario_numbers(scenario_keys) == scenario_numbers).all()
+
+    # The tournament simulator's match keys are encoded with the tournament scenario, and encoded again with the
+    # scenario of the predictive simulator when calculating the error stats
+    tournament_keys = encode_scenario_keys(match_keys, scenario_numbers)
+    double_encoded_keys = encode_scenario_keys(tournament_keys, 7)
+    assert (get_scenario_numbers(double_encoded_keys) == 7).all()
+    assert (decode_scenario_keys(double_encoded_keys) == tournament_keys).all()
+    assert (decode_scenario_keys(decode_scenario_keys(double_encoded_keys)) == match_keys).all()
+
+    # Keys which would overflow are rejected rather than wrapped around
+    with pytest.raises(ValueError):
+        encode_scenario_keys(double_encoded_keys, 0)